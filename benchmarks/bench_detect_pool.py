@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from raiv.detection import DetectionEngine
+from raiv.detect_pool import DetectionPool
+
+# --- DETECTION POOL SCALING ---
+# Detections/s for N simulated DETECT cameras fed as fast as they can be
+# analysed: in-process threads (GIL) vs the process pool at 1..cores workers.
+# Usage: python -m benchmarks.bench_detect_pool [cameras] [seconds]
+
+SHAPE = (240, 320, 3)
+
+
+def make_frames(n):
+    rng = np.random.default_rng(2)
+    return [cv2.GaussianBlur(rng.integers(0, 255, SHAPE, dtype=np.uint8), (0, 0), 1.5) for _ in range(n)]
+
+
+def run_threads(frames, cams, seconds):
+    count = [0] * cams
+    stop = time.time() + seconds
+
+    def loop(c):
+        eng = DetectionEngine()
+        i = 0
+        while time.time() < stop:
+            eng.analyse(frames[i % len(frames)])
+            # Python-side work the real DETECT stage does per frame
+            np.mean(frames[i % len(frames)][::8, ::8])
+            count[c] += 1; i += 1
+
+    ts = [threading.Thread(target=loop, args=(c,)) for c in range(cams)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return sum(count) / seconds
+
+
+def run_pool(frames, cams, workers, seconds):
+    pool = DetectionPool(workers, cams, SHAPE)
+    time.sleep(0.5)  # let workers import cv2
+    # Warm up every worker once so import time isn't counted
+    for c in range(cams): pool.submit(c, frames[0], 0, 0.0)
+    while pool.completed < cams: time.sleep(0.01)
+
+    start_done = pool.completed
+    t0 = time.time()
+    i = 0
+    while time.time() - t0 < seconds:
+        submitted = False
+        for c in range(cams):
+            if pool.submit(c, frames[i % len(frames)], i, time.time()): submitted = True
+        i += 1
+        if not submitted: time.sleep(0.0002)
+    rate = (pool.completed - start_done) / (time.time() - t0)
+    pool.close()
+    return rate
+
+
+if __name__ == '__main__':
+    cams = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    cv2.setNumThreads(1)
+    frames = make_frames(8)
+    cores = os.cpu_count() or 1
+
+    base = run_threads(frames, cams, seconds)
+    print(f"{cams} cameras, {cores} cores, {seconds:.0f}s per run")
+    print(f"{'threads (1 process)':<22} {base:9.0f} det/s  x1.00")
+    for w in range(1, min(cores, cams) + 1):
+        rate = run_pool(frames, cams, w, seconds)
+        print(f"{f'pool, {w} worker(s)':<22} {rate:9.0f} det/s  x{rate / base:.2f}")
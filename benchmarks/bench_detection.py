@@ -0,0 +1,77 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from raiv.detection import DetectionEngine, reference_scores
+
+# --- DETECTION BENCHMARK ---
+# Per-frame CPU time of the old code vs DetectionEngine at several settings,
+# and how far each setting's scores are from the old ones.
+# Usage: python -m benchmarks.bench_detection [video_file] [frames]
+
+FRAMES = 300
+SHAPE = (240, 320, 3)
+CONFIGS = [
+    ("full frame", dict()),
+    ("rail ROI", dict(roi=(0.2, 0.35, 0.6, 0.65))),
+    ("scale 0.5 area", dict(scale=0.5)),
+    ("scale 0.5 stride", dict(scale=0.5, mode="stride")),
+    ("ROI + 0.5 stride", dict(roi=(0.2, 0.35, 0.6, 0.65), scale=0.5, mode="stride")),
+]
+
+
+def synthetic_frames(n):
+    # Textured track-like scene with a red block drifting across it
+    rng = np.random.default_rng(1)
+    base = cv2.GaussianBlur(rng.integers(0, 255, SHAPE, dtype=np.uint8), (0, 0), 2)
+    for i in range(n):
+        f = base.copy()
+        x = (i * 3) % SHAPE[1]
+        cv2.rectangle(f, (x, 80), (x + 60 + i % 40, 200), (0, 0, 200 + i % 50), -1)
+        f = cv2.convertScaleAbs(f, alpha=0.4 + (i % 60) / 60.0)
+        yield f
+
+
+def video_frames(path, n):
+    cap = cv2.VideoCapture(path)
+    while n > 0:
+        ok, f = cap.read()
+        if not ok: break
+        n -= 1
+        yield cv2.resize(f, (SHAPE[1], SHAPE[0]))
+
+
+def timed(fn, frames):
+    out = []
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for f in frames: out.append(fn(f))
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    return np.array(out), cpu * 1000 / len(frames), wall * 1000 / len(frames)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else FRAMES
+    frames = list(video_frames(sys.argv[1], n) if len(sys.argv) > 1 else synthetic_frames(n))
+    cv2.setNumThreads(1)  # per-frame cost on one core, like one camera thread
+
+    ref, ref_cpu, ref_wall = timed(reference_scores, frames)
+    print(f"{'setting':<18} {'cpu ms/f':>9} {'wall ms/f':>9} {'speedup':>8} "
+          f"{'blur x':>7} {'bright dmax':>11} {'red dmax %':>10}")
+    print(f"{'reference':<18} {ref_cpu:9.3f} {ref_wall:9.3f} {1.0:8.2f}")
+
+    for name, kw in CONFIGS:
+        eng = DetectionEngine(**kw)
+        got, cpu, wall = timed(eng.analyse, frames)
+        blur_ratio = np.median(got[:, 0] / np.maximum(ref[:, 0], 1e-9))
+        d_bright = np.abs(got[:, 1] - ref[:, 1]).max()
+        d_red = np.abs(got[:, 2] - ref[:, 2]).max()
+        print(f"{name:<18} {cpu:9.3f} {wall:9.3f} {ref_cpu / max(cpu, 1e-9):8.2f} "
+              f"{blur_ratio:7.2f} {d_bright:11.3f} {d_red:10.3f}")
+        if not kw:
+            # Same pixels as the old code: must agree to rounding
+            assert np.allclose(got[:, 0], ref[:, 0], rtol=1e-4), "blur mismatch"
+            assert np.allclose(got[:, 1], ref[:, 1], atol=1e-6), "brightness mismatch"
+            assert np.allclose(got[:, 2], ref[:, 2], atol=1e-9), "red mismatch"
+            print(f"{'':<18} full-frame scores match reference")
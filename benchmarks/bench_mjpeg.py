@@ -0,0 +1,187 @@
+import argparse
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from raiv.adaptive_stream import TieredHub
+from raiv.frame_hub import MJPEG_MIMETYPE
+
+# --- MJPEG SERVER LOAD TEST ---
+# Starts a stream server in a child process (4 cameras of synthetic raw
+# frames at 25 FPS through TieredHub, one q35 tier, ~5 KB parts), opens N
+# viewers against it from one selector loop and reports, per viewer count:
+# delivered FPS per viewer, total throughput and the SERVER's CPU %, RSS and
+# thread count (Linux /proc).
+#
+#   python -m benchmarks.bench_mjpeg --server waitress --viewers 1,10,25,50
+#   python -m benchmarks.bench_mjpeg --server dev        # Flask threaded=True, for comparison
+#   python -m benchmarks.bench_mjpeg --server asgi       # async_stream.py (uvicorn or built-in)
+#
+# With waitress every viewer holds a worker thread: viewers past --threads
+# get nothing (min fps 0), which is the point of sizing wsgi_server.THREADS.
+
+PART_MARK = b'--frame\r\nContent-Type: image/jpeg'
+TIERS = [(35, 320, 240, 25)]
+
+
+# --- SERVER (child process) ---
+def make_app(hubs):
+    from flask import Flask, Response
+    app = Flask(__name__)
+    for i, hub in enumerate(hubs):
+        app.add_url_rule(f"/video{i + 1}", f"video{i + 1}",
+                         lambda hub=hub: Response(hub.stream(), mimetype=MJPEG_MIMETYPE))
+    return app
+
+
+def make_asgi_app(hubs):
+    import asyncio
+    from raiv.async_stream import AsyncHub, send_mjpeg, send_body
+    ahubs = []
+    async def app(scope, receive, send):
+        if not ahubs: ahubs.extend(AsyncHub(h, asyncio.get_running_loop()) for h in hubs)
+        path = scope["path"]
+        if path.startswith("/video") and path[6:].isdigit() and 0 < int(path[6:]) <= len(hubs):
+            await send_mjpeg(ahubs[int(path[6:]) - 1], receive, send)
+        else:
+            await send_body(send, "not found", status=404)
+    return app
+
+
+def publisher(hubs, fps):
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), (0, 0), 2)
+    frame = np.empty_like(base)
+    n = 0
+    while True:
+        np.copyto(frame, base)
+        x = (n * 8) % 320
+        cv2.rectangle(frame, (x, 60), (x + 50, 200), (0, 0, 220), -1)
+        for hub in hubs:
+            if hub.has_viewers(): hub.publish_raw(frame)
+        n += 1
+        time.sleep(1.0 / fps)
+
+
+def run_server(kind, port, cams, fps, threads):
+    hubs = [TieredHub(f"CAM{i}", TIERS, 0) for i in range(cams)]
+    t = threading.Thread(target=publisher, args=(hubs, fps))
+    t.daemon = True
+    t.start()
+    if kind == "asgi":
+        import asyncio
+        from raiv.async_stream import serve_asgi
+        asyncio.run(serve_asgi(make_asgi_app(hubs), host='127.0.0.1', port=port))
+        return
+    app = make_app(hubs)
+    if kind == "dev":
+        app.run(host='127.0.0.1', port=port, threaded=True)
+    else:
+        from raiv import wsgi_server
+        wsgi_server.serve(app, host='127.0.0.1', port=port, threads=threads)
+
+
+# --- CLIENT SIDE ---
+def proc_stats(pid):
+    # -> (cpu seconds, rss MB, threads) of another process, Linux only
+    try:
+        with open(f"/proc/{pid}/stat") as f: fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        status = dict(line.split(":", 1) for line in open(f"/proc/{pid}/status") if ":" in line)
+        return cpu, int(status["VmRSS"].split()[0]) / 1024.0, int(status["Threads"])
+    except (OSError, KeyError, IndexError, ValueError):
+        return None
+
+
+class Viewer(object):
+    def __init__(self, port, path):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.sendall(f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+        self.sock.setblocking(False)
+        self.tail = b''
+        self.parts = 0
+        self.bytes = 0
+
+    def on_readable(self):
+        data = self.sock.recv(262144)
+        if not data: return False
+        self.bytes += len(data)
+        buf = self.tail + data
+        self.parts += buf.count(PART_MARK)
+        self.tail = buf[-(len(PART_MARK) - 1):]
+        return True
+
+
+def measure(port, pid, cams, n, seconds):
+    sel = selectors.DefaultSelector()
+    viewers = [Viewer(port, f"/video{i % cams + 1}") for i in range(n)]
+    for v in viewers: sel.register(v.sock, selectors.EVENT_READ, v)
+
+    def pump(until):
+        while time.perf_counter() < until:
+            for key, _ in sel.select(0.1):
+                if not key.data.on_readable(): sel.unregister(key.fileobj)
+
+    pump(time.perf_counter() + 1.0)          # warm-up, connections settle
+    for v in viewers: v.parts, v.bytes = 0, 0
+    s0, t0 = proc_stats(pid), time.perf_counter()
+    pump(t0 + seconds)
+    s1, wall = proc_stats(pid), time.perf_counter() - t0
+    sel.close()
+    for v in viewers: v.sock.close()
+    fps = [v.parts / wall for v in viewers]
+    out = {"viewers": n, "fps_avg": sum(fps) / n, "fps_min": min(fps),
+           "mbit": sum(v.bytes for v in viewers) * 8 / wall / 1e6}
+    if s0 and s1:
+        out.update(cpu_pct=(s1[0] - s0[0]) / wall * 100, rss_mb=s1[1], threads=s1[2])
+    return out
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="RAIV MJPEG server load test")
+    ap.add_argument("--server", default="waitress", choices=["waitress", "dev", "asgi"])
+    ap.add_argument("--viewers", default="1,10,25,50")
+    ap.add_argument("--cams", type=int, default=4)
+    ap.add_argument("--fps", type=float, default=25)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--port", type=int, default=5077)
+    ap.add_argument("--threads", type=int, default=128, help="waitress worker threads (>= viewers)")
+    ap.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)  # child process
+    args = ap.parse_args()
+
+    if args.serve:
+        run_server(args.server, args.port, args.cams, args.fps, args.threads)
+        sys.exit()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    child = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_mjpeg", "--serve", "--server", args.server,
+                              "--port", str(args.port), "--cams", str(args.cams), "--fps", str(args.fps),
+                              "--threads", str(args.threads)],
+                             cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", args.port), 0.2).close()
+                break
+            except OSError:
+                if time.time() > deadline: sys.exit("server did not start")
+                time.sleep(0.1)
+        print(f"server={args.server}, {args.cams} cams @ {args.fps:g} FPS, {args.seconds:g}s per step")
+        print(f"{'viewers':>7} {'fps/viewer':>10} {'min fps':>8} {'Mbit/s':>8} {'cpu %':>7} {'rss MB':>7} {'threads':>7}")
+        for n in [int(v) for v in args.viewers.split(",")]:
+            r = measure(args.port, child.pid, args.cams, n, args.seconds)
+            extra = (f"{r['cpu_pct']:7.1f} {r['rss_mb']:7.1f} {r['threads']:7d}" if "cpu_pct" in r
+                     else f"{'-':>7} {'-':>7} {'-':>7}")
+            print(f"{n:7d} {r['fps_avg']:10.1f} {r['fps_min']:8.1f} {r['mbit']:8.1f} {extra}")
+            time.sleep(0.5)
+    finally:
+        child.terminate()
+        child.wait()
@@ -0,0 +1,127 @@
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from raiv.adaptive_stream import TieredHub
+from raiv.archiver import ImageArchiver
+from raiv.frame_ring import FrameRing, JpegRing, RingStage
+from raiv.frame_source import SyntheticSource, _Paced
+
+from .bench_pipeline import thread_cpu
+
+# --- MJPEG PASSTHROUGH BENCHMARK ---
+# CPU per CAPTURE camera, decoded vs passthrough, on the same camera JPEGs:
+#
+#   decoded      cap.read() decodes the camera's MJPEG to BGR (what OpenCV
+#                does with CONVERT_RGB=1), the stream re-encodes it, the
+#                archive encodes it again at q90
+#   passthrough  read_jpeg() hands over the bytes (CONVERT_RGB=0); stream and
+#                archive send / write them as they are
+#
+# The camera is emulated by SyntheticSource's pre-encoded JPEG cycle, so the
+# numbers are the host's share only (the camera compresses either way).
+# CPU = per-thread CPU clocks (Linux/macOS) of capture, stream stage, viewers
+# and archive workers, % of one core.
+#
+#   python -m benchmarks.bench_passthrough                       # 320x240 @ 30, 1 viewer
+#   python -m benchmarks.bench_passthrough --size 640x480 --viewers 3 --tier 3
+
+
+class EmulatedCamera(SyntheticSource):
+    # MJPG camera: read() = decode of the camera's JPEG, read_jpeg() = the bytes
+    def __init__(self, width, height, fps, quality):
+        SyntheticSource.__init__(self, width, height, fps, True, 0, passthrough=True)
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self.jpegs = [cv2.imencode('.jpg', self._draw(i), params)[1].tobytes() for i in range(len(self.jpegs))]
+
+    def read(self, image=None):
+        ok, jpeg = self.read_jpeg()
+        img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if image is None: return True, img
+        np.copyto(image, img)
+        return True, image
+
+
+def capture_loop(src, ring, passthrough, stop):
+    while not stop.is_set():
+        if passthrough: ok, frame = src.read_jpeg()
+        else: ok, frame = src.read(ring.next_slot())
+        ring.commit(time.time(), frame)
+
+
+def viewer_loop(hub, tier, stop):
+    gen = hub.stream(lo=tier, hi=tier)
+    for _ in gen:
+        if stop.is_set(): break
+    gen.close()
+
+
+def run(args, passthrough):
+    w, h = args.size
+    # Tier 0 is the native tier: passthrough sends the camera's JPEG as is
+    tiers = [(60, w, h, args.fps), (45, w, h, args.fps), (35, w, h, args.fps),
+             (30, w * 3 // 4, h * 3 // 4, args.fps), (25, w // 2, h // 2, args.fps)]
+    src = EmulatedCamera(w, h, args.fps, args.camera_quality)
+    ring = (JpegRing if passthrough else FrameRing)((h, w, 3))
+    hub = TieredHub("bench", tiers, args.tier)
+    tmpdir = tempfile.mkdtemp(prefix="raiv_passthrough_")
+    archiver = ImageArchiver(tmpdir, args.archive_interval)
+    stop = threading.Event()
+
+    def stream(seq, stamp, frame):
+        if passthrough: hub.publish_jpeg(frame, (w, h), stamp)
+        else: hub.publish_raw(frame, stamp)
+
+    def archive(seq, stamp, frame):
+        if not archiver.due(0, stamp): return
+        if passthrough: archiver.submit_jpeg(0, frame, stamp)
+        else: archiver.submit(0, frame, stamp)
+
+    threads = [threading.Thread(target=capture_loop, args=(src, ring, passthrough, stop)),
+               RingStage(ring, "STREAM", stream, args.fps), RingStage(ring, "ARCHIVE", archive, 5)]
+    threads += [threading.Thread(target=viewer_loop, args=(hub, args.tier, stop)) for _ in range(args.viewers)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    threads += archiver.threads
+    try:
+        time.sleep(args.warmup)
+        c0, saved0, t0 = [thread_cpu(t) for t in threads], archiver.saved, time.perf_counter()
+        time.sleep(args.seconds)
+        c1, wall = [thread_cpu(t) for t in threads], time.perf_counter() - t0
+        saved = archiver.saved - saved0
+    finally:
+        stop.set()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    if None in c0 or None in c1: return None, saved
+    return sum(b - a for a, b in zip(c0, c1)) / wall * 100, saved
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="RAIV MJPEG passthrough CPU benchmark")
+    ap.add_argument("--size", default="320x240", type=lambda s: tuple(int(v) for v in s.split("x")))
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--camera-quality", type=int, default=80, help="JPEG quality the emulated camera sends")
+    ap.add_argument("--tier", type=int, default=0, help="viewer tier: 0 native (camera JPEG), 1-2 camera size re-encoded, 3-4 scaled down")
+    ap.add_argument("--viewers", type=int, default=1)
+    ap.add_argument("--archive-interval", type=float, default=1.0)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--warmup", type=float, default=1.0)
+    ap.add_argument("--cv-threads", type=int, default=1)
+    args = ap.parse_args()
+    cv2.setNumThreads(args.cv_threads)
+
+    print(f"1 CAPTURE camera {args.size[0]}x{args.size[1]} @ {args.fps} FPS (camera q{args.camera_quality}), "
+          f"{args.viewers} viewer(s) on tier {args.tier}, archive every {args.archive_interval:g}s")
+    results = {}
+    for name, passthrough in (("decoded", False), ("passthrough", True)):
+        cpu, saved = results[name] = run(args, passthrough)
+        cpu_s = f"{cpu:6.1f} % of a core" if cpu is not None else "  (no per-thread CPU clocks here)"
+        print(f"{name:<12} {cpu_s}   archived {saved}")
+    a, b = results["decoded"][0], results["passthrough"][0]
+    if a and b is not None: print(f"saving       {a - b:6.1f} % of a core per camera ({(1 - b / a) * 100:.0f}% less)")
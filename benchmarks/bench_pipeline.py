@@ -0,0 +1,220 @@
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from raiv.adaptive_stream import TieredHub
+from raiv.archiver import ImageArchiver
+from raiv.detection import DetectionEngine
+from raiv.frame_ring import FrameRing, RingStage
+from raiv.frame_source import open_source
+
+# --- VISION PIPELINE BENCHMARK ---
+# Builds the same per-camera pipeline as raiv/vision.py (capture -> ring -> detect /
+# stream / archive) on replayed or synthetic frames, so it runs on any Linux
+# box without cameras, and reports per stage: FPS, p50/p99 latency and CPU.
+#
+#   python -m benchmarks.bench_pipeline                              # 4 synthetic cams, realtime
+#   python -m benchmarks.bench_pipeline --source file:run.mp4@max    # recorded video, unthrottled
+#   python -m benchmarks.bench_pipeline --json now.json --baseline before.json
+#
+# Latency = capture time -> stage done (capture itself: time in read()).
+# CPU = per-thread CPU clocks (Linux/macOS), % of one core.
+
+ROLES = ["CAPTURE", "DETECT", "DETECT", "CAPTURE"]
+STAGES = ["capture", "detect", "encode", "archive", "stream"]
+SHAPE = (240, 320, 3)
+STREAM_TIERS = [(35, 320, 240, 25)]
+
+
+class Probe(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lat = []
+        self.count = 0
+        self.threads = []
+
+    def add(self, ms):
+        with self.lock:
+            self.lat.append(ms)
+            self.count += 1
+
+    def reset(self):
+        with self.lock:
+            self.lat = []
+            self.count = 0
+
+
+def thread_cpu(t):
+    try: return time.clock_gettime(time.pthread_getcpuclockid(t.ident))
+    except (AttributeError, OSError, TypeError): return None
+
+
+def cpu_snapshot(probes):
+    return {name: [thread_cpu(t) for t in p.threads] for name, p in probes.items()}
+
+
+class TimedHub(TieredHub):
+    # Same hub as the server; records the time of every real (non-cached) encode
+    def __init__(self, probe):
+        TieredHub.__init__(self, "bench", STREAM_TIERS, 0)
+        self.probe = probe
+
+    def variant(self, tier):
+        before, t0 = self.encodes, time.perf_counter()
+        out = TieredHub.variant(self, tier)
+        if self.encodes != before: self.probe.add((time.perf_counter() - t0) * 1000)
+        return out
+
+
+class IndexProbe(object):
+    # Plugs into ImageArchiver's index hook: called once a file is on disk
+    def __init__(self, probe): self.probe = probe
+    def add(self, mission, cam, dist, stamp, path): self.probe.add((time.time() - stamp) * 1000)
+    def drop_mission(self, mission): pass
+
+
+def capture_loop(src, ring, probe, stop):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        ok, frame = src.read(ring.next_slot())
+        if not ok:
+            time.sleep(0.01)
+            continue
+        probe.add((time.perf_counter() - t0) * 1000)
+        ring.commit(time.time(), frame)
+
+
+def viewer_loop(hub, probe, stop):
+    gen = hub.stream(lo=0, hi=0)
+    for part in gen:
+        probe.add((time.time() - hub.stamp) * 1000)
+        if stop.is_set(): break
+    gen.close()
+
+
+def build(args, probes, stop, tmpdir):
+    archiver = ImageArchiver(tmpdir, args.archive_interval, index=IndexProbe(probes["archive"]))
+    probes["archive"].threads += archiver.threads
+    for cam in range(args.cams):
+        role = ROLES[cam % len(ROLES)]
+        src = open_source(args.source if args.source != "synthetic" else f"synthetic:{cam}"
+                          + ("@max" if args.unlimited else ""), SHAPE[1], SHAPE[0], args.fps)
+        ring = FrameRing(SHAPE)
+
+        t = threading.Thread(target=capture_loop, args=(src, ring, probes["capture"], stop))
+        t.daemon = True
+        probes["capture"].threads.append(t)
+        stages = []
+
+        if role == "DETECT":
+            engine = DetectionEngine()
+            det_probe = probes["detect"]
+            def detect(seq, stamp, frame, engine=engine, det_probe=det_probe):
+                engine.analyse(frame)
+                det_probe.add((time.time() - stamp) * 1000)
+            stages.append(RingStage(ring, f"CAM{cam} DETECT", detect))
+            probes["detect"].threads.append(stages[-1])
+        else:
+            def archive(seq, stamp, frame, cam=cam):
+                if archiver.due(cam, stamp): archiver.submit(cam, frame, stamp)
+            stages.append(RingStage(ring, f"CAM{cam} ARCHIVE", archive, 5))
+            probes["archive"].threads.append(stages[-1])
+
+        hub = TimedHub(probes["encode"])
+        stages.append(RingStage(ring, f"CAM{cam} STREAM", lambda seq, stamp, frame, hub=hub: hub.publish_raw(frame, stamp), 25))
+        probes["stream"].threads.append(stages[-1])
+        for _ in range(args.viewers):
+            v = threading.Thread(target=viewer_loop, args=(hub, probes["stream"], stop))
+            v.daemon = True
+            probes["encode"].threads.append(v)  # viewer threads do the encoding
+            stages.append(v)
+
+        t.start()
+        for s in stages: s.start()
+
+
+def pct(xs, p):
+    if not xs: return float('nan')
+    return float(np.percentile(np.asarray(xs), p))
+
+
+def run(args):
+    cv2.setNumThreads(args.cv_threads)
+    probes = {name: Probe() for name in STAGES}
+    stop = threading.Event()
+    tmpdir = tempfile.mkdtemp(prefix="raiv_bench_")
+    try:
+        build(args, probes, stop, tmpdir)
+        time.sleep(args.warmup)
+        for p in probes.values(): p.reset()
+        cpu0, t0 = cpu_snapshot(probes), time.perf_counter()
+        time.sleep(args.seconds)
+        cpu1, wall = cpu_snapshot(probes), time.perf_counter() - t0
+        with_lat = {name: (p.count, list(p.lat)) for name, p in probes.items()}
+        stop.set()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report = {}
+    for name in STAGES:
+        count, lat = with_lat[name]
+        cpu = None
+        pairs = [(a, b) for a, b in zip(cpu0[name], cpu1[name]) if a is not None and b is not None]
+        if pairs: cpu = sum(b - a for a, b in pairs) / wall * 100
+        report[name] = {"fps": count / wall, "p50_ms": pct(lat, 50), "p99_ms": pct(lat, 99), "cpu_pct": cpu}
+    return report
+
+
+def print_report(report, args):
+    print(f"{args.cams} cams, source={args.source}{'@max' if args.unlimited else ''}, "
+          f"{args.viewers} viewer(s)/cam, {args.seconds:.0f}s")
+    print(f"{'stage':<9} {'fps':>8} {'p50 ms':>8} {'p99 ms':>8} {'cpu %':>7}")
+    for name, r in report.items():
+        cpu = f"{r['cpu_pct']:7.1f}" if r['cpu_pct'] is not None else f"{'-':>7}"
+        print(f"{name:<9} {r['fps']:8.1f} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {cpu}")
+
+
+def compare(report, baseline, tol):
+    # Regression = throughput down or p99 up by more than `tol`
+    bad = []
+    for name, b in baseline.items():
+        r = report.get(name)
+        if not r: continue
+        if b["fps"] > 0 and r["fps"] < b["fps"] * (1 - tol):
+            bad.append(f"{name}: fps {b['fps']:.1f} -> {r['fps']:.1f}")
+        if b["p99_ms"] == b["p99_ms"] and r["p99_ms"] > b["p99_ms"] * (1 + tol) + 1.0:
+            bad.append(f"{name}: p99 {b['p99_ms']:.2f} -> {r['p99_ms']:.2f} ms")
+    return bad
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="RAIV vision pipeline benchmark")
+    ap.add_argument("--source", default="synthetic", help="synthetic | file:<video> | camera index")
+    ap.add_argument("--unlimited", action="store_true", help="replay as fast as possible")
+    ap.add_argument("--cams", type=int, default=4)
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--viewers", type=int, default=1, help="simulated MJPEG viewers per camera")
+    ap.add_argument("--archive-interval", type=float, default=1.0)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--warmup", type=float, default=1.0)
+    ap.add_argument("--cv-threads", type=int, default=1)
+    ap.add_argument("--json", help="write the report here")
+    ap.add_argument("--baseline", help="previous --json report to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    args = ap.parse_args()
+
+    report = run(args)
+    print_report(report, args)
+    if args.json:
+        with open(args.json, "w") as f: json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f: bad = compare(report, json.load(f), args.tolerance)
+        for line in bad: print(f"REGRESSION {line}")
+        sys.exit(1 if bad else 0)
@@ -0,0 +1,113 @@
+import argparse
+import csv
+
+import numpy as np
+
+from raiv.tracker import make_filter
+
+# --- STOP FILTER REPLAY ---
+# Replays danger traces (one bool per frame + whether an obstacle was really
+# there) through each stop filter and reports false stops per hour of clean
+# running and onset -> stop latency, at several camera frame rates.
+#
+#   python -m benchmarks.bench_tracker                       # synthetic traces, 10/15/30/60 FPS
+#   python -m benchmarks.bench_tracker --trace run.csv       # stamp,danger,obstacle rows
+#
+# Synthetic traces: frame periods jitter +-20 % with occasional dropped
+# frames; clean stretches get --blips bursts of false danger per second, each
+# 20-100 ms long (glare, a dark sleeper - a duration, not a frame count), and
+# obstacles are detected on only --hit of their frames.
+#
+# "bound" is worst_case_ms() at the nominal FPS, i.e. for an obstacle seen on
+# every frame (--hit 1); missed detections and frame jitter push past it.
+
+CONFIGS = [
+    ("4 frames (old)", "frames", dict(frames=4)),
+    ("ema 50ms/0.9", "ema", dict(tau_ms=50, threshold=0.9)),
+    ("ema 80ms/0.9", "ema", dict(tau_ms=80, threshold=0.9)),
+    ("window 150/0.75", "window", dict(window_ms=150, ratio=0.75)),
+]
+
+
+def synthetic_trace(fps, seconds, rng, blips=0.5, hit=0.85, events=40):
+    # -> stamps, danger, obstacle  (numpy arrays, one entry per frame)
+    stamps, danger, obstacle = [], [], []
+    t = 0.0
+    starts = np.sort(rng.uniform(2.0, seconds - 4.0, events))
+    ends = starts + rng.uniform(1.0, 3.0, events)
+    glare = np.sort(rng.uniform(0.0, seconds, int(blips * seconds)))
+    glare_end = glare + rng.uniform(0.02, 0.1, len(glare))
+    while t < seconds:
+        t += (1.0 / fps) * rng.uniform(0.8, 1.2)
+        if rng.random() < 0.02: t += 1.0 / fps   # dropped frame
+        inside = bool(np.any((starts <= t) & (t < ends)))
+        if inside: d = rng.random() < hit
+        else:
+            i = np.searchsorted(glare, t) - 1
+            d = i >= 0 and t < glare_end[i]
+        stamps.append(t)
+        danger.append(d)
+        obstacle.append(inside)
+    return np.array(stamps), np.array(danger), np.array(obstacle)
+
+
+def read_trace(path):
+    rows = list(csv.DictReader(open(path)))
+    return (np.array([float(r["stamp"]) for r in rows]),
+            np.array([r["danger"] not in ("0", "", "False") for r in rows]),
+            np.array([r["obstacle"] not in ("0", "", "False") for r in rows]))
+
+
+def replay(filt, stamps, danger, obstacle):
+    # Like CameraThread: reset after each stop; one stop per obstacle counts
+    false_stops, latencies, missed = 0, [], 0
+    onset, stopped = None, False
+    for t, d, o in zip(stamps, danger, obstacle):
+        if o and onset is None: onset, stopped = t, False
+        elif not o and onset is not None:
+            if not stopped: missed += 1
+            onset = None
+        if filt.update(bool(d), t):
+            filt.reset()
+            if onset is None: false_stops += 1
+            elif not stopped:
+                latencies.append((t - onset) * 1000)
+                stopped = True
+    if onset is not None and not stopped: missed += 1
+    clean_s = float(np.sum(np.diff(stamps, prepend=stamps[0])[~obstacle]))
+    return false_stops, clean_s, latencies, missed
+
+
+def report(name, fps, filt, results):
+    fs, clean, lat, missed = results
+    per_h = fs / clean * 3600 if clean > 0 else float('nan')
+    p50 = np.percentile(lat, 50) if lat else float('nan')
+    p99 = np.percentile(lat, 99) if lat else float('nan')
+    worst = max(lat) if lat else float('nan')
+    bound = f"{filt.worst_case_ms(fps):7.0f}" if fps else f"{'-':>7}"
+    print(f"{name:<17} {fps or '-':>4} {per_h:9.1f} {p50:7.0f} {p99:7.0f} {worst:7.0f} {bound} {missed:6d}")
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="RAIV stop filter replay")
+    ap.add_argument("--trace", help="CSV with stamp,danger,obstacle columns")
+    ap.add_argument("--fps", default="10,15,30,60")
+    ap.add_argument("--seconds", type=float, default=600.0, help="synthetic trace length")
+    ap.add_argument("--blips", type=float, default=0.5, help="false danger bursts per second")
+    ap.add_argument("--hit", type=float, default=0.85, help="detected fraction of obstacle frames")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{'filter':<17} {'fps':>4} {'false/h':>9} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'bound':>7} {'missed':>6}")
+    if args.trace:
+        trace = read_trace(args.trace)
+        for name, kind, kw in CONFIGS:
+            filt = make_filter(kind, **kw)
+            report(name, None, filt, replay(filt, *trace))
+    else:
+        for fps in [int(f) for f in args.fps.split(",")]:
+            trace = synthetic_trace(fps, args.seconds, np.random.default_rng(args.seed), args.blips, args.hit)
+            for name, kind, kw in CONFIGS:
+                filt = make_filter(kind, **kw)
+                report(name, fps, filt, replay(filt, *trace))
+            print()
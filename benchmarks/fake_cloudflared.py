@@ -0,0 +1,131 @@
+import argparse
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+# --- FAKE CLOUDFLARED ---
+# Stands in for `cloudflared tunnel --url http://127.0.0.1:<port>` when testing
+# raiv/tunnel.py: logs like cloudflared (a lot, to prove the pipe is drained),
+# prints a "public" URL and forwards it to the local server over plain TCP.
+# Failure modes on demand:
+#
+#   --delay 3         URL after 3 s
+#   --die-after 20    exits after 20 s (tunnel process crash)
+#   --hang-after 20   keeps running and logging, but stops forwarding
+#                     (tunnel up, URL dead: only the health check notices)
+#   --log-rate 200    log lines per second
+#
+# The URL is http://127.0.0.1:<proxy port>, so point the supervisor at it:
+#   "tunnel": {"command": ["python", "-m", "benchmarks.fake_cloudflared", "--hang-after", "20"],
+#              "url_pattern": "http://127\\.0\\.0\\.1:[0-9]+", "health_s": 2}
+
+
+def log(level, msg):
+    stamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    print(f"{stamp} {level} {msg}", flush=True)
+
+
+def pump(src, dst):
+    try:
+        while True:
+            data = src.recv(65536)
+            if not data: break
+            dst.sendall(data)
+    except OSError:
+        pass
+    finally:
+        for s in (src, dst):
+            try: s.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+
+
+class Proxy(object):
+    def __init__(self, target):
+        self.target = target
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.port = self.listener.getsockname()[1]
+        self.open = []
+        self.alive = True
+
+    def serve(self):
+        while self.alive:
+            try: client, _ = self.listener.accept()
+            except OSError: break
+            if not self.alive:
+                client.close()
+                break
+            try: upstream = socket.create_connection(self.target, 5)
+            except OSError:
+                client.close()
+                continue
+            self.open += [client, upstream]
+            for a, b in ((client, upstream), (upstream, client)):
+                t = threading.Thread(target=pump, args=(a, b))
+                t.daemon = True
+                t.start()
+
+    def hang(self):
+        # Connections are accepted by nobody and the open ones go silent
+        self.alive = False
+        for s in self.open:
+            try: s.close()
+            except OSError: pass
+        self.listener.close()
+        # Still "listening" from the client's point of view: accept nothing
+        dead = socket.socket()
+        dead.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            dead.bind(("127.0.0.1", self.port))
+            dead.listen(1)
+        except OSError:
+            pass
+        self.dead = dead
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="cloudflared stand-in for the tunnel supervisor")
+    ap.add_argument("sub", nargs="?", help="'tunnel', as cloudflared is called")
+    ap.add_argument("--url", required=True, help="local origin")
+    ap.add_argument("--delay", type=float, default=1.0)
+    ap.add_argument("--die-after", type=float)
+    ap.add_argument("--hang-after", type=float)
+    ap.add_argument("--log-rate", type=float, default=50.0)
+    args = ap.parse_args()
+
+    origin = urlparse(args.url)
+    proxy = Proxy((origin.hostname, origin.port or 80))
+    t = threading.Thread(target=proxy.serve)
+    t.daemon = True
+    t.start()
+
+    started = time.time()
+    log("INF", "Thank you for trying Cloudflare Tunnel. (fake)")
+    log("INF", "Requesting new quick Tunnel on trycloudflare.com...")
+    time.sleep(args.delay)
+    url = f"http://127.0.0.1:{proxy.port}"
+    log("INF", "+" + "-" * 90 + "+")
+    log("INF", "|  Your quick Tunnel has been created! Visit it at (it may take some time to be reachable):  |")
+    log("INF", f"|  {url:<86}  |")
+    log("INF", "+" + "-" * 90 + "+")
+
+    hung = False
+    n = 0
+    while True:
+        now = time.time() - started
+        if args.die_after is not None and now >= args.die_after:
+            log("ERR", "fake: exiting (--die-after)")
+            sys.exit(1)
+        if args.hang_after is not None and now >= args.hang_after and not hung:
+            log("ERR", "fake: connection to edge lost, no longer forwarding (--hang-after)")
+            proxy.hang()
+            hung = True
+        n += 1
+        log("INF", f"Registered tunnel connection connIndex={n % 4} connection={random.getrandbits(64):016x} "
+                   f"event=0 ip=198.41.200.{n % 250} location=sin{n % 20:02d} protocol=quic " + "." * 60)
+        time.sleep(1.0 / args.log_rate)
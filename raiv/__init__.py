@@ -0,0 +1,3 @@
+# RAIV vision system: cameras, obstacle stop, streaming, archive.
+# Entry point: python -m raiv (see launcher.py). Importing the package is
+# cheap; OpenCV / Flask are only loaded by the modules that need them.
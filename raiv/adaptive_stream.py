@@ -0,0 +1,216 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .frame_hub import FrameHub, mjpeg_part
+from .frame_source import reduced_decode, jpeg_quality
+from .metrics import REGISTRY
+
+# --- ADAPTIVE MJPEG (per-client quality / resolution / FPS) ---
+# Each /videoN connection measures how long its own socket write blocks (the
+# time between yielding a part and being resumed by the WSGI server). A client
+# whose writes back up steps DOWN a tier, one whose writes return instantly
+# steps back UP. Variants are encoded once per (frame, tier) and shared.
+#
+# Passthrough cameras publish the camera's JPEG instead (publish_jpeg). The
+# best tier (0) is then the native tier: the camera's bytes untouched, at the
+# camera's size and quality, whatever the tier's own settings (its FPS still
+# paces the viewer). Lower tiers at the camera's resolution whose quality is
+# at least the camera's (read from its quantization table) share those bytes;
+# every other tier decodes on demand (libjpeg's 1/2, 1/4 scaled decode when
+# it fits) and encodes as usual, so stepping down a tier still sheds bytes.
+
+# (jpeg quality, width, height, max fps) - best first; tier 0 is native on passthrough cameras
+NATIVE_TIER = 0
+DEFAULT_TIERS = [
+    (60, 320, 240, 25),
+    (45, 320, 240, 20),
+    (35, 320, 240, 15),
+    (30, 240, 180, 10),
+    (25, 160, 120, 5),
+]
+DEFAULT_START_TIER = 2
+
+DOWN_PRESSURE = 0.5   # blocked for >50% of the frame interval -> worse tier
+UP_PRESSURE = 0.1     # blocked for <10% ...
+UP_AFTER = 3.0        # ... for this long -> better tier
+DOWN_AFTER = 0.5      # min seconds between two downgrades
+
+ENCODE_SECONDS = REGISTRY.histogram("raiv_encode_seconds", "JPEG encode (+resize) time per variant", ["cam", "tier"])
+ENCODE_BYTES = REGISTRY.counter("raiv_encode_bytes_total", "JPEG bytes produced", ["cam", "tier"])
+PASSTHROUGH_FRAMES = REGISTRY.counter("raiv_stream_passthrough_total", "Camera JPEGs streamed without re-encoding", ["cam"])
+SENT_BYTES = REGISTRY.counter("raiv_stream_bytes_total", "MJPEG bytes sent to viewers", ["cam"])
+SENT_FRAMES = REGISTRY.counter("raiv_stream_frames_total", "MJPEG parts sent to viewers", ["cam", "tier"])
+BLOCKED_SECONDS = REGISTRY.histogram("raiv_stream_blocked_seconds", "Time a viewer's socket write blocked", ["cam"])
+
+
+class BackpressureController(object):
+    def __init__(self, n_tiers, start=DEFAULT_START_TIER, lo=0, hi=None):
+        self.lo = lo
+        self.hi = n_tiers - 1 if hi is None else hi
+        self.tier = min(max(start, self.lo), self.hi)
+        self.pressure = 0.0
+        self.changed_at = time.time()
+        self.calm_since = None
+
+    def update(self, blocked, interval):
+        # blocked: seconds spent in the socket write, interval: target frame period
+        ratio = blocked / interval if interval > 0 else 0.0
+        self.pressure += (ratio - self.pressure) * 0.3
+        now = time.time()
+
+        if self.pressure > DOWN_PRESSURE and self.tier < self.hi and now - self.changed_at > DOWN_AFTER:
+            self._move(+1, now)
+        elif self.pressure < UP_PRESSURE and self.tier > self.lo:
+            if self.calm_since is None: self.calm_since = now
+            elif now - self.calm_since > UP_AFTER and now - self.changed_at > UP_AFTER:
+                self._move(-1, now)
+        else:
+            self.calm_since = None
+        return self.tier
+
+    def _move(self, step, now):
+        self.tier += step
+        self.changed_at = now
+        self.calm_since = None
+        self.pressure = (DOWN_PRESSURE + UP_PRESSURE) / 2  # don't judge the new tier on old samples
+
+
+class TieredHub(FrameHub):
+    # Producer publishes RAW frames; JPEG variants are made on demand per tier
+    def __init__(self, name="", tiers=DEFAULT_TIERS, start_tier=DEFAULT_START_TIER):
+        FrameHub.__init__(self, name)
+        self.tiers = tiers
+        self.start_tier = start_tier
+        self.raw = None
+        self.jpeg = None                 # newest camera JPEG (passthrough), else None
+        self.jpeg_size = None
+        self.jpeg_quality = None         # camera's JPEG quality (estimated once per size)
+        self.raw_seq = 0                 # seq that self.raw holds (decoded lazily)
+        self.raw_reduce = 1              # ... decoded at 1/raw_reduce size
+        self.raw_lock = threading.Lock()
+        self.variant_seq = 0
+        self.variants = {}               # tier -> mjpeg part for variant_seq
+        self.scaled = [None] * len(tiers)  # preallocated resize targets
+        self.tier_locks = [threading.Lock() for _ in tiers]
+        self.encodes = 0
+
+    def publish_raw(self, frame, stamp=None):
+        with self.raw_lock:
+            if self.raw is None or self.raw.shape != frame.shape:
+                self.raw = np.empty_like(frame)
+            np.copyto(self.raw, frame)
+            self.jpeg = None
+            self._bump(stamp)
+            self.raw_seq, self.raw_reduce = self.seq, 1
+        for fn in self.listeners: fn(self.seq)
+
+    def publish_jpeg(self, jpeg, size, stamp=None):
+        # jpeg: bytes straight from the camera, size: its (width, height)
+        with self.raw_lock:
+            if self.jpeg_quality is None or self.jpeg_size != tuple(size):
+                self.jpeg_quality = jpeg_quality(jpeg) or 100   # unknown: never pass through
+            self.jpeg = jpeg
+            self.jpeg_size = tuple(size)
+            self._bump(stamp)
+        for fn in self.listeners: fn(self.seq)
+
+    def _bump(self, stamp):
+        with self.cond:
+            self.seq += 1
+            self.stamp = stamp if stamp is not None else time.time()
+            self.cond.notify_all()
+
+    def _pixels(self, w, h):
+        # raw_lock held: decoded newest frame, at least (w, h) when scaled decode fits
+        if self.jpeg is None: return self.raw
+        flag, reduce = reduced_decode(self.jpeg_size, (w, h))
+        if self.raw_seq != self.seq or self.raw_reduce > reduce:
+            img = cv2.imdecode(np.frombuffer(self.jpeg, np.uint8), flag)
+            if img is None: return None
+            self.raw, self.raw_seq, self.raw_reduce = img, self.seq, reduce
+        return self.raw
+
+    def variant(self, tier):
+        # -> (seq, mjpeg_part) of the newest frame at this tier, encoded at most once.
+        # Pixels are taken under raw_lock, resize + encode run outside it so
+        # publishers and other tiers never wait for an encode.
+        quality, w, h, _ = self.tiers[tier]
+        with self.tier_locks[tier]:      # one encode per tier at a time; scaled[tier] is its buffer
+            with self.raw_lock:
+                seq = self.seq
+                if seq != self.variant_seq:
+                    self.variant_seq = seq
+                    self.variants = {}
+                part = self.variants.get(tier)
+                if part is not None: return seq, part
+                if self.jpeg is not None and (tier == NATIVE_TIER or
+                                              (w, h) == self.jpeg_size and quality >= self.jpeg_quality):
+                    # Native tier, or native size no better than the camera: its own JPEG, shared
+                    part = self.variants.get("native")
+                    if part is None:
+                        part = self.variants["native"] = mjpeg_part(self.jpeg)
+                        PASSTHROUGH_FRAMES.labels(cam=self.name).inc()
+                    self.variants[tier] = part
+                    return seq, part
+                img = self._pixels(w, h)
+                if img is None: return seq, None
+                t0 = time.perf_counter()
+                # publish_raw overwrites self.raw in place: copy (or resize) it
+                # into this tier's buffer; decoded frames are replaced, never written
+                shared = self.jpeg is not None
+                if not shared: img = self._scale(tier, img, w, h, copy=True)
+            if shared: img = self._scale(tier, img, w, h)
+            ok, buf = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+            if not ok: return seq, None
+            part = mjpeg_part(buf)
+            with self.raw_lock:
+                if self.variant_seq == seq: self.variants[tier] = part
+                self.encodes += 1
+            ENCODE_SECONDS.labels(cam=self.name, tier=tier).observe(time.perf_counter() - t0)
+            ENCODE_BYTES.labels(cam=self.name, tier=tier).inc(len(buf))
+            return seq, part
+
+    def _scale(self, tier, img, w, h, copy=False):
+        # img at (w, h) in this tier's preallocated buffer (tier lock held)
+        if (w, h) == (img.shape[1], img.shape[0]) and not copy: return img
+        dst = self.scaled[tier]
+        if dst is None or dst.shape != (h, w) + img.shape[2:] or dst.dtype != img.dtype:
+            dst = self.scaled[tier] = np.empty((h, w) + img.shape[2:], img.dtype)
+        if (w, h) == (img.shape[1], img.shape[0]): np.copyto(dst, img)
+        else: cv2.resize(img, (w, h), dst=dst, interpolation=cv2.INTER_AREA)
+        return dst
+
+    def stream(self, timeout=1.0, lo=0, hi=None):
+        ctl = BackpressureController(len(self.tiers), self.start_tier, lo, hi)
+        m_bytes = SENT_BYTES.labels(cam=self.name)
+        m_blocked = BLOCKED_SECONDS.labels(cam=self.name)
+        with self.cond:
+            self.viewers += 1
+            self.cond.notify_all()
+        try:
+            last = 0
+            while True:
+                started = time.time()
+                got = self.wait_newer(last, timeout)
+                if got is None: continue
+                last, part = self.variant(ctl.tier)
+                if part is None: continue
+
+                t0 = time.time()
+                yield part
+                blocked = time.time() - t0
+                m_bytes.inc(len(part))
+                m_blocked.observe(blocked)
+                SENT_FRAMES.labels(cam=self.name, tier=ctl.tier).inc()
+
+                interval = 1.0 / self.tiers[ctl.tier][3]
+                ctl.update(blocked, interval)
+                # Pace to this client's tier FPS
+                spare = interval - (time.time() - started)
+                if spare > 0: time.sleep(spare)
+        finally:
+            with self.cond:
+                self.viewers -= 1
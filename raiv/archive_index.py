@@ -0,0 +1,127 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+# --- ODOMETRY-INDEXED ARCHIVE ---
+# Every archived frame gets a row (mission, cam, distance, time, path) in one
+# SQLite file next to the pictures, with an index on (mission, cam, dist), so
+# "CAM0/CAM3 between 12.0 m and 14.5 m on mission X" is an index range scan
+# instead of a directory walk. Inserts are batched on one writer thread.
+
+INDEX_NAME = "archive_index.sqlite"
+BATCH_EVERY = 0.5   # seconds between commits
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id      INTEGER PRIMARY KEY,
+    mission TEXT    NOT NULL,
+    cam     INTEGER NOT NULL,
+    dist    REAL,
+    stamp   REAL    NOT NULL,
+    path    TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_by_dist ON frames (mission, cam, dist);
+"""
+
+
+class Odometer(object):
+    # /telemetry arrives ~1 Hz; extrapolate prog_dist with speed in between
+    def __init__(self):
+        self.dist = None
+        self.speed = 0.0   # m/s
+        self.target = None
+        self.stamp = 0.0
+
+    def update(self, telemetry, now=None):
+        if not isinstance(telemetry, dict): return
+        self.stamp = now or time.time()
+        self.dist = telemetry.get("prog_dist")
+        self.target = telemetry.get("targ_dist")
+        try: self.speed = float(telemetry.get("speed") or 0) / 3.6  # firmware sends km/h
+        except (TypeError, ValueError): self.speed = 0.0
+
+    def at(self, t):
+        if self.dist is None: return None
+        d = self.dist + self.speed * max(0.0, t - self.stamp)
+        if self.target is not None: d = min(d, self.target)
+        return round(d, 3)
+
+
+class ArchiveIndex(object):
+    def __init__(self, root, name=INDEX_NAME):
+        self.root = root
+        self.path = os.path.join(root, name)
+        self.pending = queue.Queue()
+        self.indexed = 0
+        with self._connect() as db: db.executescript(SCHEMA)
+        t = threading.Thread(target=self._writer)
+        t.daemon = True
+        t.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5.0)
+        db.execute("PRAGMA journal_mode=WAL")     # readers don't block the writer
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # --- WRITE (any thread) ---
+    def add(self, mission, cam, dist, stamp, path):
+        self.pending.put(("add", (mission, cam, dist, stamp, os.path.relpath(path, self.root))))
+
+    def drop_mission(self, mission):
+        self.pending.put(("drop", (mission,)))
+
+    def _writer(self):
+        db = self._connect()
+        while True:
+            ops = [self.pending.get()]
+            deadline = time.time() + BATCH_EVERY
+            while time.time() < deadline:
+                try: ops.append(self.pending.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty: break
+            try:
+                with db:
+                    rows = [args for op, args in ops if op == "add"]
+                    if rows:
+                        db.executemany("INSERT INTO frames (mission, cam, dist, stamp, path) VALUES (?,?,?,?,?)", rows)
+                    for op, args in ops:
+                        if op == "drop": db.execute("DELETE FROM frames WHERE mission = ?", args)
+                self.indexed += len(rows)
+            except sqlite3.Error as e:
+                print(f"[INDEX] write failed: {e}")
+
+    # --- QUERY ---
+    def query(self, mission, d0, d1, cams=None):
+        # -> [(cam, dist, stamp, absolute_path)] ordered by distance
+        sql = "SELECT cam, dist, stamp, path FROM frames WHERE mission = ? AND cam = ? AND dist BETWEEN ? AND ?"
+        out = []
+        with self._connect() as db:
+            if cams is None:
+                cams = [r[0] for r in db.execute("SELECT DISTINCT cam FROM frames WHERE mission = ?", (mission,))]
+            for cam in cams:  # one index range per camera
+                out.extend(db.execute(sql, (mission, cam, d0, d1)).fetchall())
+        out.sort(key=lambda r: (r[1], r[0]))
+        return [(c, d, s, os.path.join(self.root, p)) for c, d, s, p in out]
+
+    def missions(self):
+        with self._connect() as db:
+            return db.execute("SELECT mission, COUNT(*), MIN(stamp), MAX(dist) FROM frames "
+                              "GROUP BY mission ORDER BY MIN(stamp)").fetchall()
+
+
+if __name__ == '__main__':
+    # python -m raiv.archive_index <save_dir>                          -> list missions
+    # python -m raiv.archive_index <save_dir> <mission> <d0> <d1> [cams e.g. 0,3]
+    idx = ArchiveIndex(sys.argv[1])
+    if len(sys.argv) < 5:
+        for m, n, t0, dmax in idx.missions(): print(f"{m}  {n:6d} frames  up to {dmax or 0:.2f} m")
+        sys.exit()
+    cams = [int(c) for c in sys.argv[5].split(',')] if len(sys.argv) > 5 else None
+    t = time.perf_counter()
+    rows = idx.query(sys.argv[2], float(sys.argv[3]), float(sys.argv[4]), cams)
+    ms = (time.perf_counter() - t) * 1000
+    for cam, dist, stamp, path in rows: print(f"CAM{cam} {dist:8.3f} m  {path}")
+    print(f"{len(rows)} frames in {ms:.2f} ms")
@@ -0,0 +1,198 @@
+import itertools
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# --- ASYNC IMAGE ARCHIVER ---
+# submit() copies the frame into a preallocated buffer and returns at once;
+# background workers JPEG-encode and write it. When the disk can't keep up
+# the frame is DROPPED and counted - the capture loop never waits.
+# submit_jpeg() takes a passthrough camera's JPEG as is: no copy into the
+# pool, no encode, the worker only writes the bytes.
+#
+# Layout: <root>/<mission>/CAM<n>_<YYYYmmdd_HHMMSS>_<ms>_<counter>.jpg
+# The counter is global and monotonic, so names never collide or reorder.
+# With an ArchiveIndex, every written frame is also indexed by track distance.
+#
+# The quota only counts and deletes folders named like the archiver's own
+# missions (MISSION_RE): anything else under root belongs to the operator.
+
+QUEUE_SIZE = 8
+WORKERS = 2
+QUOTA_BYTES = 20 * 1024 ** 3   # oldest missions are deleted past this
+JPEG_QUALITY = 90
+MISSION_FORMAT = "M%Y%m%d_%H%M%S"
+MISSION_RE = re.compile(r"M\d{8}_\d{6}$")
+
+
+def _tree_size(path):
+    size = 0
+    for dp, _, fs in os.walk(path):
+        for f in fs:
+            try: size += os.path.getsize(os.path.join(dp, f))
+            except OSError: pass
+    return size
+
+
+class ImageArchiver(object):
+    def __init__(self, root, interval=1.0, workers=WORKERS, queue_size=QUEUE_SIZE,
+                 quota_bytes=QUOTA_BYTES, quality=JPEG_QUALITY, index=None):
+        self.root = root
+        self.index = index
+        self.interval = interval
+        self.quota = quota_bytes
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self.jobs = queue.Queue(queue_size)
+        self.free = queue.Queue()     # pool of reusable frame buffers
+        for _ in range(queue_size + workers): self.free.put(None)
+
+        self.lock = threading.Lock()
+        self.room_lock = threading.Lock()
+        self.counter = itertools.count(1)
+        self.last_save = {}           # cam -> time of last accepted frame
+        self.mission = None
+        self.mission_dir = None
+        self.used_bytes = None
+        self.over_quota = False       # set by workers when nothing is left to delete
+        self.saved = 0
+        self.dropped_busy = 0
+        self.dropped_quota = 0
+        self.errors = 0
+        self.new_mission()
+
+        self.threads = []
+        for _ in range(workers):
+            t = threading.Thread(target=self._worker)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    # --- PUBLIC ---
+    def new_mission(self, mission_id=None):
+        # The folder is made by the first frame written to it: a start-up or a
+        # mission without frames leaves no empty folder in History / the quota
+        mission_id = mission_id or datetime.now().strftime(MISSION_FORMAT)
+        path = os.path.join(self.root, mission_id)
+        with self.lock:
+            self.mission, self.mission_dir = mission_id, path
+            self.over_quota = False  # the previous mission may be deletable now
+        return mission_id
+
+    def due(self, cam, now=None):
+        now = now or time.time()
+        return now - self.last_save.get(cam, 0.0) >= self.interval
+
+    def submit(self, cam, frame, stamp=None, dist=None):
+        # Non-blocking. Returns the file name it will be written to, or None if dropped.
+        # dist: track distance (m) of this frame, for the index
+        stamp = stamp or time.time()
+        slot = self._reserve(cam, stamp, pooled=True)
+        if slot is None: return None
+        buf, path, mission = slot
+        if buf is None or buf.shape != frame.shape: buf = np.empty_like(frame)
+        np.copyto(buf, frame)
+        return self._queue(path, buf, mission, cam, dist, stamp)
+
+    def submit_jpeg(self, cam, jpeg, stamp=None, dist=None):
+        # Same, for bytes that are already a JPEG (kept by reference, immutable)
+        stamp = stamp or time.time()
+        slot = self._reserve(cam, stamp, pooled=False)
+        if slot is None: return None
+        return self._queue(slot[1], jpeg, slot[2], cam, dist, stamp)
+
+    def _reserve(self, cam, stamp, pooled):
+        # -> (pool buffer, path, mission) or None if not due / dropped
+        buf = None
+        with self.lock:
+            if not self.due(cam, stamp): return None
+            self.last_save[cam] = stamp
+            if self.over_quota:
+                self.dropped_quota += 1
+                return None
+            if pooled:
+                try: buf = self.free.get_nowait()
+                except queue.Empty:
+                    self.dropped_busy += 1
+                    return None
+            n = next(self.counter)
+            mission, mission_dir = self.mission, self.mission_dir
+        ts = datetime.fromtimestamp(stamp)
+        name = f"CAM{cam}_{ts:%Y%m%d_%H%M%S}_{ts.microsecond // 1000:03d}_{n:06d}.jpg"
+        return buf, os.path.join(mission_dir, name), mission
+
+    def _queue(self, path, buf, mission, cam, dist, stamp):
+        try: self.jobs.put_nowait((path, buf, mission, cam, dist, stamp))
+        except queue.Full:
+            if not isinstance(buf, bytes): self.free.put(buf)
+            with self.lock: self.dropped_busy += 1
+            return None
+        return path
+
+    def stats(self):
+        return (f"saved {self.saved} | dropped busy {self.dropped_busy} quota {self.dropped_quota} "
+                f"| errors {self.errors} | queue {self.jobs.qsize()}")
+
+    # --- INTERNALS ---
+    def _worker(self):
+        self._scan_usage()
+        while True:
+            path, buf, mission, cam, dist, stamp = self.jobs.get()
+            try:
+                if isinstance(buf, bytes): ok, jpeg = True, np.frombuffer(buf, np.uint8)
+                else: ok, jpeg = cv2.imencode('.jpg', buf, self.params)
+                if ok:
+                    try: f = open(path, 'wb')
+                    except FileNotFoundError:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)   # first frame of the mission
+                        f = open(path, 'wb')
+                    with f: f.write(jpeg.data)
+                    if self.index: self.index.add(mission, cam, dist, stamp, path)
+                    with self.lock:
+                        self.saved += 1
+                        if self.used_bytes is not None: self.used_bytes += jpeg.nbytes
+                    if self.used_bytes is not None and self.used_bytes > self.quota:
+                        with self.room_lock: self.over_quota = not self._make_room()
+            except OSError as e:
+                with self.lock: self.errors += 1
+                print(f"[ARCHIVE] write failed {path}: {e}")
+            finally:
+                if not isinstance(buf, bytes): self.free.put(buf)
+
+    def _missions(self):
+        # Mission folders under root, oldest first (the names sort by time)
+        try: return sorted(d for d in os.listdir(self.root)
+                           if MISSION_RE.match(d) and os.path.isdir(os.path.join(self.root, d)))
+        except OSError: return []
+
+    def _scan_usage(self):
+        # Done once, off the capture path; afterwards the total is tracked.
+        # Only mission folders: bytes the quota could never free don't count
+        with self.lock:
+            if self.used_bytes is not None: return
+            self.used_bytes = 0
+        total = sum(_tree_size(os.path.join(self.root, d)) for d in self._missions())
+        with self.lock: self.used_bytes += total
+
+    def _make_room(self):
+        # Worker side: delete whole missions, oldest first, never the current one
+        with self.lock: current = self.mission
+        missions = [d for d in self._missions() if d != current]
+        while self.used_bytes > self.quota and missions:
+            name = missions.pop(0)
+            victim = os.path.join(self.root, name)
+            size = _tree_size(victim)
+            shutil.rmtree(victim, ignore_errors=True)
+            with self.lock: self.used_bytes -= size
+            if self.index: self.index.drop_mission(name)
+            print(f"[ARCHIVE] quota: removed {victim} ({size / 1024 ** 2:.0f} MB)")
+        if self.used_bytes > self.quota and not self.over_quota:
+            print(f"[ARCHIVE] quota: current mission {current} alone is over {self.quota / 1024 ** 3:.1f} GB, "
+                  f"dropping frames until the next mission")
+        return self.used_bytes <= self.quota
@@ -0,0 +1,236 @@
+import asyncio
+import time
+from urllib.parse import unquote
+
+from .adaptive_stream import BackpressureController, SENT_BYTES, SENT_FRAMES, BLOCKED_SECONDS
+from .frame_hub import MJPEG_MIMETYPE, tagged_part
+from .metrics import count_error
+
+# --- ASYNCIO MJPEG (ASGI) ---
+# Viewers are coroutines on one event loop instead of one thread each.
+# Capture threads keep publishing raw frames into their TieredHub; AsyncHub
+# turns each publish into ONE wake-up on the loop (a shared future every
+# waiting viewer awaits), encodes each (frame, tier) once in the default
+# executor and every viewer of that tier sends the same part. Backpressure is
+# the time `await send()` waits for the socket buffer to drain, fed to the same
+# per-viewer BackpressureController as the threaded server.
+#
+# serve_asgi() runs any ASGI app on uvicorn if it is installed, else on the
+# small built-in HTTP/1.1 server below (enough for MJPEG + simple GETs).
+
+OUTBUF_HIGH = 256 * 1024   # bytes queued for one client before `await send()` blocks
+HEAD_TIMEOUT = 10.0
+
+
+class AsyncHub(object):
+    def __init__(self, hub, loop=None):
+        self.hub = hub
+        self.loop = loop or asyncio.get_running_loop()
+        self.seq = hub.seq
+        self.new_frame = self.loop.create_future()
+        self.encoding = {}   # tier -> (seq, future of (seq, part))
+        hub.listeners.append(self._on_publish)
+
+    def _on_publish(self, seq):
+        # Capture thread -> loop
+        self.loop.call_soon_threadsafe(self._wake, seq)
+
+    def _wake(self, seq):
+        if seq <= self.seq: return
+        self.seq = seq
+        fut, self.new_frame = self.new_frame, self.loop.create_future()
+        fut.set_result(seq)
+
+    async def wait_newer(self, after_seq, timeout=None):
+        if self.seq > after_seq: return self.seq
+        try: return await asyncio.wait_for(asyncio.shield(self.new_frame), timeout)
+        except asyncio.TimeoutError: return None
+
+    async def variant(self, tier):
+        # -> (seq, mjpeg_part); the first viewer of a (frame, tier) encodes it
+        seq = self.seq
+        pending = self.encoding.get(tier)
+        if pending is None or pending[0] != seq:
+            pending = self.encoding[tier] = (seq, self.loop.run_in_executor(None, self.hub.variant, tier))
+        return await pending[1]
+
+    def _viewers(self, n):
+        with self.hub.cond:
+            self.hub.viewers += n
+            self.hub.cond.notify_all()
+
+    async def stream(self, send, timeout=1.0, lo=0, hi=None):
+        # Sends MJPEG parts forever; cancelled when the client goes away
+        hub = self.hub
+        ctl = BackpressureController(len(hub.tiers), hub.start_tier, lo, hi)
+        m_bytes = SENT_BYTES.labels(cam=hub.name)
+        m_blocked = BLOCKED_SECONDS.labels(cam=hub.name)
+        self._viewers(+1)
+        try:
+            last = 0
+            while True:
+                started = time.time()
+                if await self.wait_newer(last, timeout) is None: continue
+                last, part = await self.variant(ctl.tier)
+                if part is None: continue
+
+                t0 = time.time()
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+                blocked = time.time() - t0
+                m_bytes.inc(len(part))
+                m_blocked.observe(blocked)
+                SENT_FRAMES.labels(cam=hub.name, tier=ctl.tier).inc()
+
+                interval = 1.0 / hub.tiers[ctl.tier][3]
+                ctl.update(blocked, interval)
+                spare = interval - (time.time() - started)
+                if spare > 0: await asyncio.sleep(spare)
+        finally:
+            self._viewers(-1)
+
+
+async def stream_multiplex(ahubs, cams, send, tier=None, timeout=1.0):
+    # mosaic.Multiplex on the loop: each camera's AsyncHub variant, tagged
+    # with X-Camera, paced per camera, one backpressure controller per client
+    hubs = [a.hub for a in ahubs]
+    ctl = BackpressureController(len(hubs[0].tiers), hubs[0].start_tier if tier is None else tier)
+    m_bytes = SENT_BYTES.labels(cam="MULTIPLEX")
+    m_blocked = BLOCKED_SECONDS.labels(cam="MULTIPLEX")
+    last = {c: 0 for c in cams}
+    due = {c: 0.0 for c in cams}
+    for c in cams: ahubs[c]._viewers(+1)
+    try:
+        while True:
+            now = time.time()
+            ready = [c for c in cams if ahubs[c].seq > last[c] and now >= due[c]]
+            if not ready:
+                waits = [asyncio.shield(ahubs[c].new_frame) for c in cams if ahubs[c].seq <= last[c]]
+                pause = min([due[c] - now for c in cams if due[c] > now] or [timeout])
+                if waits and len(waits) == len(cams): await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                else: await asyncio.sleep(pause)
+                continue
+            for c in ready:
+                last[c], part = await ahubs[c].variant(ctl.tier)
+                if part is None: continue
+                part = tagged_part(c, part)
+                t0 = time.time()
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+                blocked = time.time() - t0
+                m_bytes.inc(len(part))
+                m_blocked.observe(blocked)
+                interval = 1.0 / hubs[c].tiers[ctl.tier][3]
+                due[c] = now + interval
+                ctl.update(blocked, interval / len(cams))
+    finally:
+        for c in cams: ahubs[c]._viewers(-1)
+
+
+async def until_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect": pass
+
+
+async def send_mjpeg(ahub, receive, send, **kw):
+    # Whole /videoN response: headers, then parts until the client disconnects
+    await send_stream(ahub.stream(send, **kw), receive, send)
+
+
+async def send_stream(stream, receive, send):
+    # Any part-sending coroutine as a multipart response (/videoN, /mosaic)
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", MJPEG_MIMETYPE.encode()), (b"cache-control", b"no-cache, no-store")]})
+    tasks = [asyncio.ensure_future(stream), asyncio.ensure_future(until_disconnect(receive))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            if not t.cancelled() and t.exception() and not isinstance(t.exception(), (ConnectionError, OSError)):
+                count_error("asgi_stream", t.exception())
+    finally:
+        for t in tasks: t.cancel()
+
+
+async def send_body(send, body, content_type="text/plain; charset=utf-8", status=200):
+    if isinstance(body, str): body = body.encode()
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+# --- BUILT-IN SERVER (no uvicorn) ---
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+async def _handle(app, reader, writer):
+    writer.transport.set_write_buffer_limits(high=OUTBUF_HIGH)
+    started = False
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEAD_TIMEOUT)
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = []
+        for line in lines[1:]:
+            if ":" in line:
+                k, _, v = line.partition(":")
+                headers.append((k.strip().lower().encode(), v.strip().encode("latin-1")))
+        path, _, query = target.partition("?")
+        body_len = int(dict(headers).get(b"content-length", b"0") or 0)
+        body = await reader.readexactly(body_len) if body_len else b""
+        peer = writer.get_extra_info("peername") or ("", 0)
+        sock = writer.get_extra_info("sockname") or ("", 0)
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+                 "scheme": "http", "path": unquote(path), "raw_path": path.encode(), "root_path": "",
+                 "query_string": query.encode(), "headers": headers,
+                 "client": tuple(peer[:2]), "server": tuple(sock[:2])}
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, ConnectionError):
+        writer.close()
+        return
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await reader.read()   # anything after the request, then EOF = client gone
+        return {"type": "http.disconnect"}
+
+    async def send(msg):
+        nonlocal started
+        if msg["type"] == "http.response.start":
+            started = True
+            status = msg["status"]
+            out = [f"HTTP/1.1 {status} {REASONS.get(status, '')}".encode()]
+            out += [k + b": " + v for k, v in msg.get("headers", [])]
+            out += [b"Connection: close", b"", b""]
+            writer.write(b"\r\n".join(out))
+        elif msg["type"] == "http.response.body":
+            writer.write(msg.get("body", b""))
+            await writer.drain()   # waits while > OUTBUF_HIGH is queued
+
+    try:
+        await app(scope, receive, send)
+    except (ConnectionError, OSError):
+        pass
+    except Exception as e:
+        count_error("asgi_app", e)
+        if not started:
+            try: await send_body(send, "internal error", status=500)
+            except (ConnectionError, OSError): pass
+    finally:
+        writer.close()
+
+
+async def serve_asgi(app, host="0.0.0.0", port=5000):
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    if uvicorn:
+        print(f"--- SERVING ON {host}:{port} (uvicorn, asyncio) ---")
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off")
+        await uvicorn.Server(config).serve()
+        return
+    print(f"--- SERVING ON {host}:{port} (built-in asyncio server) ---")
+    server = await asyncio.start_server(lambda r, w: _handle(app, r, w), host, port, backlog=256)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,152 @@
+import copy
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from .metrics import REGISTRY, count_error
+
+# --- BLACK BOX (pre/post-trigger clips) ---
+# Every camera keeps its last pre_s + post_s seconds as JPEG bytes in memory,
+# with the detection scores of each frame; /telemetry updates go into one
+# shared log. trigger() (every emergency stop) only queues the trigger time:
+# the writer thread waits until post_s has been recorded, cuts
+# [trigger - pre_s, trigger + post_s] out of the rings and writes
+#
+#   <root>/<mission>/blackbox/<clip>_CAM<n>.mjpeg   concatenated JPEGs
+#                                                   (ffplay -f mjpeg, VLC)
+#   <root>/<mission>/blackbox/<clip>.json           reason, state at the stop,
+#                                                   per-frame time / offset /
+#                                                   size / scores, telemetry
+#
+# Passthrough cameras ring the camera's own JPEG. Pixel cameras (DETECT) are
+# encoded once per kept frame at `fps` on their own ring stage, never on the
+# detection thread. Triggers inside a clip still being recorded join it.
+
+CLIPS = REGISTRY.counter("raiv_blackbox_clips_total", "Black-box clips", ["result"])
+CLIP_SECONDS = REGISTRY.histogram("raiv_blackbox_write_seconds", "Cut + write of one clip",
+                                  buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+
+class ClipRing(object):
+    # (stamp, jpeg, scores) for the last `span` seconds, at most max_bytes
+    def __init__(self, span, max_bytes):
+        self.span = span
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.frames = deque()
+        self.bytes = 0
+
+    def add(self, stamp, jpeg, scores=None):
+        with self.lock:
+            self.frames.append((stamp, jpeg, scores))
+            self.bytes += len(jpeg)
+            while self.frames and (self.frames[0][0] < stamp - self.span or self.bytes > self.max_bytes):
+                self.bytes -= len(self.frames.popleft()[1])
+
+    def between(self, t0, t1):
+        with self.lock: return [f for f in self.frames if t0 <= f[0] <= t1]
+
+
+class BlackBox(object):
+    def __init__(self, root, cams, pre_s=10.0, post_s=5.0, quality=50, max_mb=16):
+        self.root = root
+        self.pre = pre_s
+        self.post = post_s
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self.rings = {cam: ClipRing(pre_s + post_s, int(max_mb * 1024 ** 2)) for cam in cams}
+        self.telemetry = deque()
+        self.tel_lock = threading.Lock()
+        self.mission = None
+        self.triggers = queue.Queue()
+        self.written = 0
+        self.writer = threading.Thread(target=self._writer)
+        self.writer.daemon = True
+        self.writer.start()
+
+    # --- INPUT (any thread) ---
+    def new_mission(self, mission):
+        self.mission = mission
+
+    def add(self, cam, stamp, frame, scores=None):
+        # frame: JPEG bytes as-is, or pixels (encoded here, on the caller's stage thread)
+        if not isinstance(frame, bytes):
+            ok, buf = cv2.imencode('.jpg', frame, self.params)
+            if not ok: return
+            frame = buf.tobytes()
+        self.rings[cam].add(stamp, frame, scores)
+
+    def on_telemetry(self, telemetry):
+        if not isinstance(telemetry, dict): return
+        now = time.time()
+        with self.tel_lock:
+            self.telemetry.append((now, copy.deepcopy(telemetry)))
+            while self.telemetry[0][0] < now - self.pre - self.post: self.telemetry.popleft()
+
+    def trigger(self, reason, cam=None, state=None):
+        # Non-blocking: the clip is cut and written post_s later on the writer thread
+        self.triggers.put((time.time(), reason, cam, dict(state or {}), self.mission))
+
+    # --- WRITER ---
+    def _writer(self):
+        while True:
+            t, reason, cam, state, mission = self.triggers.get()
+            events = [{"t": t, "reason": reason, "cam": cam}]
+            end = t + self.post
+            # Later triggers while this clip is still recording join it
+            while True:
+                wait = end - time.time()
+                if wait <= 0: break
+                try: more = self.triggers.get(timeout=wait)
+                except queue.Empty: break
+                events.append({"t": more[0], "reason": more[1], "cam": more[2]})
+            try:
+                with CLIP_SECONDS.time(): self.write_clip(t, events, state, mission)
+                CLIPS.labels(result="ok").inc()
+            except Exception as e:
+                # Any failure costs this clip only: the writer must outlive it
+                CLIPS.labels(result="failed").inc()
+                count_error("blackbox_write", e)
+
+    def write_clip(self, t, events, state, mission=None):
+        t0, t1 = t - self.pre, t + self.post
+        ts = datetime.fromtimestamp(t)
+        clip = f"STOP_{ts:%Y%m%d_%H%M%S}_{ts.microsecond // 1000:03d}"
+        folder = os.path.join(self.root, mission or f"{ts:M%Y%m%d_%H%M%S}", "blackbox")
+        os.makedirs(folder, exist_ok=True)
+        meta = {"clip": clip, "mission": mission, "trigger": t, "reason": events[0]["reason"],
+                "cam": events[0]["cam"], "events": events, "state": state,
+                "pre_s": self.pre, "post_s": self.post, "cameras": {}}
+        for cam, ring in self.rings.items():
+            frames = ring.between(t0, t1)
+            if not frames: continue
+            name = f"{clip}_CAM{cam}.mjpeg"
+            sizes = [len(f[1]) for f in frames]
+            with open(os.path.join(folder, name), "wb") as f: f.write(b"".join(f[1] for f in frames))
+            offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).tolist()
+            entry = {"file": name, "t": [round(f[0], 3) for f in frames], "offset": offsets, "size": sizes}
+            if any(f[2] is not None for f in frames):
+                entry["scores"] = [[round(v, 2) for v in f[2]] if f[2] is not None else None for f in frames]
+            meta["cameras"][str(cam)] = entry
+        with self.tel_lock: meta["telemetry"] = [[round(s, 3), d] for s, d in self.telemetry if t0 <= s <= t1]
+        tmp = os.path.join(folder, clip + ".json.tmp")
+        with open(tmp, "w") as f: json.dump(meta, f, default=repr)   # state / telemetry may hold anything
+        os.replace(tmp, os.path.join(folder, clip + ".json"))
+        self.written += 1
+        print(f"[BLACKBOX] {clip}: {len(meta['cameras'])} cameras, {events[0]['reason']} -> {folder}")
+        return os.path.join(folder, clip + ".json")
+
+
+def read_clip(meta_path, cam):
+    # -> [(t, jpeg bytes, scores)] of one camera in a written clip
+    with open(meta_path) as f: meta = json.load(f)
+    entry = meta["cameras"][str(cam)]
+    with open(os.path.join(os.path.dirname(meta_path), entry["file"]), "rb") as f: data = f.read()
+    scores = entry.get("scores") or [None] * len(entry["t"])
+    return [(t, data[o:o + n], s) for t, o, n, s in zip(entry["t"], entry["offset"], entry["size"], scores)]
@@ -0,0 +1,196 @@
+import copy
+import json
+import os
+
+# --- CONFIGURATION ---
+# Everything that used to be hardcoded at the top of ai.py / auto_run.py /
+# stream.py. A JSON file (raiv.json, or --config / RAIV_CONFIG) is merged over
+# DEFAULTS key by key, so it only needs what differs. "cameras" is replaced as
+# a whole list; each camera is merged over CAMERA_DEFAULTS.
+#
+#   python -m raiv --print-config          # effective settings
+#   RAIV_SOURCES=synthetic,synthetic:1,...  # override camera sources (no hardware)
+#
+# This module only uses the standard library: the launcher reads it before
+# any heavy import.
+
+CONFIG_ENV = "RAIV_CONFIG"
+DEFAULT_FILE = "raiv.json"
+
+CAMERA_DEFAULTS = {
+    "source": 0,          # index, "file:run.mp4[@max]" or "synthetic[:seed][@max]"
+    "role": "CAPTURE",    # CAPTURE (archive + stream), DETECT (stop logic + stream), STREAM
+    "width": 320,
+    "height": 240,
+    "fps": 30,
+    "backend": None,      # None = MSMF on Windows / V4L2 on Linux, or "dshow", "msmf", "v4l2", "any"
+    "lazy": False,        # open only when the first viewer connects (STREAM role)
+    "passthrough": False, # CAPTURE / STREAM: keep the camera's MJPEG bytes, decode only on demand
+    # DETECT role only
+    "view": None,         # "FRONT" / "BACK", used in logs
+    "stops_when": None,   # vehicle direction this camera guards: "FWD" / "BWD"
+    "safe_score": 1000,   # Blur/Sharpness. Lower = Blurry/Blocked. If below this, STOP.
+    "red_pct": 70.0,      # Red area %. Higher = More Red. If above this, STOP.
+    "brightness": 50.0,   # Lower = Darker. If below this (e.g. covered camera), STOP.
+}
+
+DEFAULTS = {
+    "port": 5000,
+    # "asyncio": viewers are coroutines, no cap. "waitress" (falls back to the Flask
+    # dev server): every /videoN viewer holds one of server_threads until it leaves
+    "server": "asyncio",
+    "server_threads": 48,
+    "debug_profile": False,        # /debug/profile sampling profiler (local requests only, never via the tunnel)
+    "cameras": [
+        {"source": 0, "role": "CAPTURE", "passthrough": True},
+        {"source": 1, "role": "DETECT", "view": "BACK", "stops_when": "BWD", "safe_score": 500},
+        {"source": 2, "role": "DETECT", "view": "FRONT", "stops_when": "FWD", "safe_score": 1000},
+        {"source": 3, "role": "CAPTURE", "passthrough": True},
+    ],
+    "firebase": {
+        "base_url": "https://mpm-raiv-default-rtdb.asia-southeast1.firebasedatabase.app",
+        "auth": None,
+    },
+    # See raiv/tunnel.py: cloudflared supervised, URL health-checked, restarted with backoff
+    "tunnel": {
+        "enabled": True,
+        "command": "cloudflared",   # or a list, e.g. ["python", "-m", "benchmarks.fake_cloudflared"]
+        "url_pattern": r"https://[a-zA-Z0-9-]+\.trycloudflare\.com",
+        "health_s": 15,             # public URL check period (0 = only watch the process)
+        "health_timeout_s": 10,
+        "fail_after": 3,            # failed checks in a row -> restart
+        "url_timeout_s": 60,        # start -> healthy URL, else restart
+        "retry_min_s": 2,
+        "retry_max_s": 120,
+    },
+    # See raiv/rtdb_gateway.py: local RTDB on the vehicle LAN, synced to firebase.base_url.
+    # When enabled this process (and anything pointed at host:port) talks to the gateway.
+    "gateway": {
+        "enabled": False,
+        "host": "0.0.0.0",
+        "port": 9000,
+        "paths": ["command", "telemetry", "cam_url"],   # streamed down from the cloud
+        "urgent": ["command"],                          # synced at once, not batched
+        "sync_ms": 100,                                 # batch window for everything else
+    },
+    "detection": {
+        # ROI as [x, y, w, h] fractions of the frame, null = whole frame.
+        # scale < 1.0 analyses a downscaled copy (re-tune safe_score with
+        # benchmarks/bench_detection.py). workers > 0 = worker processes.
+        "roi": None,
+        "scale": 1.0,
+        "mode": "area",
+        "workers": 0,
+    },
+    # See raiv/detect_schedule.py: analysis rate from /telemetry status + /command direction
+    "detect_schedule": {
+        "enabled": True,
+        "watchdog_fps": 2,    # DETECT camera facing away from travel
+        "standby_fps": 0,     # every DETECT camera while not moving (0 = no analysis)
+        "arm_s": 10.0,        # after a move command, full rate this long without MOVING
+    },
+    # See raiv/tracker.py: "ema" (tau_ms, threshold), "window" (window_ms, ratio), "frames" (frames)
+    "stop_filter": {"kind": "ema", "tau_ms": 50, "threshold": 0.9, "max_gap_ms": 100},
+    "stream": {
+        # (JPEG quality, width, height, max FPS) - best first, per viewer. On
+        # passthrough cameras tier 0 sends the camera's own JPEG (native size/quality)
+        "tiers": [[60, 320, 240, 25], [45, 320, 240, 25], [35, 320, 240, 25], [30, 240, 180, 12], [25, 160, 120, 6]],
+        "start_tier": 2,
+        "fps": 25,
+    },
+    # See raiv/mosaic.py: /mosaic (all cameras tiled) and /mosaic?mode=cams (tagged parts)
+    "mosaic": {
+        "enabled": True,
+        "layout": [2, 2],     # columns, rows
+        "tile": [320, 240],   # per camera, in the mosaic
+        "cams": None,         # camera index per tile (null = in order, -1 = empty tile)
+        "fps": 10,
+        "quality": 50,
+        "labels": True,       # camera name in the tile's corner
+    },
+    # See raiv/recorder.py: raw telemetry + vision scores per mission
+    "recorder": {
+        "enabled": True,
+        "dir": None,          # null = archive.dir (same mission folders as the pictures)
+        "rate_hz": 10,        # rows between telemetry updates
+        "flush_s": 1.0,
+    },
+    # See raiv/ride_quality.py: ISO 2631-1 ride quality -> /ride_quality
+    "ride_quality": {
+        "enabled": True,
+        "fs": 100,            # /telemetry/accel sample rate when the batch has no "fs"
+        "segment_m": 10.0,    # one summary per this much prog_dist
+        "segment_s": 10.0,    # ... or per this long when the distance is unknown
+    },
+    # See raiv/devices.py: hot-plug watcher, reconnect backoff, blind-camera stop
+    "devices": {
+        "watcher": "auto",      # "auto", "udev" (pyudev), "v4l2" (poll /dev/video*) or "none"
+        "poll_ms": 250,
+        "tick_ms": 25,
+        "blind_after_ms": 250,  # no frame for this long = blind
+        "blind_stop_ms": 500,   # a DETECT camera blind this long stops the vehicle (null = never)
+        "retry_min_ms": 50,     # reconnect backoff, jittered
+        "retry_max_ms": 1000,
+        "read_fail_ms": 500,    # read() failing this long = close and reconnect
+    },
+    # See raiv/blackbox.py: clip of every camera around each emergency stop
+    "blackbox": {
+        "enabled": True,
+        "dir": None,          # null = recorder / archive dir (<mission>/blackbox)
+        "pre_s": 10.0,        # kept before the stop
+        "post_s": 5.0,        # recorded after it
+        "fps": 10,            # frames kept per camera per second
+        "quality": 50,        # JPEG quality for pixel (non-passthrough) cameras
+        "max_mb": 16,         # per camera cap on the in-memory ring
+    },
+    "archive": {
+        "dir": r"C:\Users\Shukri\Documents\RAIV\Saved Pictures",
+        "interval": 1.0,      # seconds between saved frames, per camera
+        "quota_gb": 20,       # oldest mission folders are deleted past this
+        "fps": 5,
+    },
+}
+
+
+def _merge(base, over):
+    out = copy.deepcopy(base)
+    for k, v in over.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict): out[k] = _merge(out[k], v)
+        else: out[k] = copy.deepcopy(v)
+    return out
+
+
+def load(path=None):
+    # -> effective config dict. path None: $RAIV_CONFIG, else ./raiv.json if present
+    path = path or os.environ.get(CONFIG_ENV)
+    if path is None and os.path.exists(DEFAULT_FILE): path = DEFAULT_FILE
+    cfg = copy.deepcopy(DEFAULTS)
+    if path:
+        with open(path) as f: cfg = _merge(cfg, json.load(f))
+        cfg["_path"] = os.path.abspath(path)
+    cfg["cameras"] = [_merge(CAMERA_DEFAULTS, cam) for cam in cfg["cameras"]]
+    sources = os.environ.get("RAIV_SOURCES")
+    if sources:
+        for cam, src in zip(cfg["cameras"], sources.split(",")): cam["source"] = src
+    for i, cam in enumerate(cfg["cameras"]):
+        if cam["role"] not in ("CAPTURE", "DETECT", "STREAM"):
+            raise ValueError(f"camera {i}: unknown role {cam['role']!r}")
+        if cam["passthrough"] and cam["role"] == "DETECT":
+            raise ValueError(f"camera {i}: DETECT needs pixels every frame, passthrough is for CAPTURE / STREAM")
+    return cfg
+
+
+_current = None
+
+
+def current():
+    # The config the running process was started with (loaded on first use)
+    global _current
+    if _current is None: _current = load()
+    return _current
+
+
+def use(cfg):
+    global _current
+    _current = cfg
+    return cfg
@@ -0,0 +1,187 @@
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .metrics import count_error
+
+# --- DETECTION PROCESS POOL ---
+# Runs DetectionEngine in worker processes so the NumPy/Python parts of the
+# DETECT path stop sharing one GIL with capture, streaming and Firebase.
+#
+#   main process                          worker processes
+#   submit(cam, frame) --copy--> frames shm [cam] --> analyse()
+#     (cam, gen) --------------> jobs queue            |
+#   collector thread <-- done queue (w, cam, gen) <-- scores shm [w, cam]
+#
+# Every worker writes only its own score rows, so each row has a single
+# writer. Rows are guarded by a seqlock (version odd while writing), readers
+# never take a lock. Each job carries the camera's generation (bumped per
+# submit); a worker skips the write once its job is no longer current and
+# the collector drops any result whose generation is not, so a job given up
+# on below can never be read as the current scores.
+#
+# A job not back within deadline_s (worker died or hung) is given up: the
+# camera is freed, the error counted, and usable() sends frames back to
+# inline detection for RETRY_S (for good once no worker is alive), so a
+# broken pool never silently stops a DETECT camera's scores.
+
+DEADLINE_S = 1.0
+RETRY_S = 5.0
+
+# Score table columns
+VERSION, GEN, SEQ, STAMP, BLUR, BRIGHT, RED, DONE = range(8)
+N_COLS = 8
+
+
+def _views(buf, workers, n_cams):
+    # scores shm -> (table [worker, cam, col], current generation per cam)
+    table = np.ndarray((workers, n_cams, N_COLS), np.float64, buffer=buf)
+    gens = np.ndarray((n_cams,), np.int64, buffer=buf, offset=table.nbytes)
+    return table, gens
+
+
+def _worker(index, frames_name, scores_name, shape, workers, n_cams, jobs, done, engine, engine_kw):
+    import cv2
+    if engine is None: from .detection import DetectionEngine as engine
+    cv2.setNumThreads(1)  # one core per worker, the pool does the scaling
+
+    f_shm = shared_memory.SharedMemory(name=frames_name)
+    s_shm = shared_memory.SharedMemory(name=scores_name)
+    frames = np.ndarray((n_cams,) + shape, np.uint8, buffer=f_shm.buf)
+    table, gens = _views(s_shm.buf, workers, n_cams)
+    engines = {}
+    try:
+        while True:
+            job = jobs.get()
+            if job is None: break
+            cam, gen, seq, stamp = job
+            eng = engines.get(cam)
+            if eng is None: eng = engines[cam] = engine(**engine_kw)
+            blur, bright, red = eng.analyse(frames[cam])
+            if gens[cam] != gen: continue   # given up on meanwhile: frames[cam] may be a newer frame
+
+            row = table[index, cam]
+            row[VERSION] += 1           # odd: write in progress
+            row[GEN] = gen; row[SEQ] = seq; row[STAMP] = stamp
+            row[BLUR] = blur; row[BRIGHT] = bright; row[RED] = red
+            row[DONE] = time.time()
+            row[VERSION] += 1           # even: consistent
+            done.put((index, cam, gen))
+    finally:
+        del frames, table, gens
+        f_shm.close(); s_shm.close()
+
+
+class DetectionPool(object):
+    # on_result(cam, seq, stamp, blur, brightness, red_pct) runs on the collector thread
+    # engine: DetectionEngine-like class the workers run (default DetectionEngine)
+    def __init__(self, workers, n_cams, shape=(240, 320, 3), on_result=None, deadline_s=DEADLINE_S,
+                 engine=None, **engine_kw):
+        self.shape = tuple(shape)
+        self.deadline = deadline_s
+        self.n_cams = n_cams
+        self.on_result = on_result
+        ctx = mp.get_context("spawn")  # same behaviour on Windows and Linux
+
+        self._frames_shm = shared_memory.SharedMemory(create=True, size=n_cams * int(np.prod(self.shape)))
+        self._scores_shm = shared_memory.SharedMemory(create=True, size=(max(1, workers) * N_COLS + 1) * n_cams * 8)
+        self.frames = np.ndarray((n_cams,) + self.shape, np.uint8, buffer=self._frames_shm.buf)
+        self.table, self.gens = _views(self._scores_shm.buf, max(1, workers), n_cams)
+        self.table[:] = 0
+        self.gens[:] = 0
+
+        self.jobs = ctx.Queue()
+        self.done = ctx.Queue()
+        self.busy = [False] * n_cams
+        self.busy_since = [0.0] * n_cams
+        self.down_until = 0.0         # inline detection until then (a job timed out)
+        self.timeouts = 0
+        self.late = 0                 # results of given-up jobs, dropped
+        self.dead = False             # no worker left
+        self.submitted = 0
+        self.completed = 0
+        self.procs = []
+        for i in range(workers):
+            p = ctx.Process(target=_worker, args=(i, self._frames_shm.name, self._scores_shm.name, self.shape,
+                                                  max(1, workers), n_cams, self.jobs, self.done, engine, engine_kw))
+            p.daemon = True
+            p.start()
+            self.procs.append(p)
+
+        self.collector = threading.Thread(target=self._collect)
+        self.collector.daemon = True
+        self.collector.start()
+
+    def usable(self, cam, frame):
+        # False -> analyse this frame inline: wrong shape, no live worker, or
+        # a job timed out less than RETRY_S ago
+        if frame.shape != self.shape: return False
+        now = time.perf_counter()
+        if self.busy[cam] and now - self.busy_since[cam] > self.deadline: self._expire(cam, now)
+        if not any(p.is_alive() for p in self.procs):
+            if not self.dead:
+                self.dead = True
+                count_error("detect_pool", RuntimeError("every worker process exited; detecting inline"))
+            return False
+        return now >= self.down_until
+
+    def _expire(self, cam, now):
+        self.gens[cam] += 1             # the job's result, if it ever comes, is stale
+        self.busy[cam] = False
+        self.timeouts += 1
+        self.down_until = now + RETRY_S
+        alive = sum(p.is_alive() for p in self.procs)
+        count_error("detect_pool", TimeoutError(f"CAM{cam} job not back after {self.deadline:.1f}s, "
+                                                f"{alive}/{len(self.procs)} workers alive; detecting inline"))
+
+    def submit(self, cam, frame, seq, stamp):
+        # Non-blocking; False = the previous frame for this camera is still being analysed
+        if self.busy[cam]: return False
+        if frame.shape != self.shape: return False
+        np.copyto(self.frames[cam], frame)
+        self.gens[cam] += 1
+        self.busy_since[cam] = time.perf_counter()
+        self.busy[cam] = True
+        self.submitted += 1
+        self.jobs.put((cam, int(self.gens[cam]), seq, stamp))
+        return True
+
+    def read(self, worker, cam):
+        # Seqlock read -> (gen, seq, stamp, blur, brightness, red_pct, done_time)
+        row = self.table[worker, cam]
+        while True:
+            v = row[VERSION]
+            if v % 2 == 0:
+                vals = row[GEN:].copy()
+                if row[VERSION] == v: return tuple(vals.tolist())
+            time.sleep(0)
+
+    def _collect(self):
+        while True:
+            msg = self.done.get()
+            if msg is None: break
+            worker, cam, gen = msg
+            scores = self.read(worker, cam)
+            if gen != self.gens[cam] or int(scores[0]) != gen:
+                self.late += 1          # a job given up on: busy belongs to its successor
+                continue
+            self.busy[cam] = False
+            self.completed += 1
+            if self.on_result:
+                _, seq, stamp, blur, bright, red, _ = scores
+                try: self.on_result(cam, int(seq), stamp, blur, bright, red)
+                except Exception as e: print(f"[DETECT POOL] callback error: {e}")
+
+    def close(self):
+        for _ in self.procs: self.jobs.put(None)
+        for p in self.procs: p.join(2)
+        self.done.put(None)
+        self.collector.join(2)          # done reading the table before it goes away
+        del self.frames, self.table, self.gens
+        for shm in (self._frames_shm, self._scores_shm):
+            shm.close()
+            try: shm.unlink()
+            except FileNotFoundError: pass
@@ -0,0 +1,152 @@
+import threading
+import time
+
+from .metrics import REGISTRY
+
+# --- DIRECTION-AWARE DETECTION SCHEDULE ---
+# Only the DETECT camera facing the direction of travel can stop the vehicle
+# (request_stop checks stops_when), so only that one needs every frame:
+#
+#   FULL      every frame: moving (or a move command just arrived) and this
+#             camera guards the direction, or the direction / the camera's
+#             stops_when is unknown
+#   WATCHDOG  watchdog_fps: moving the other way; scores stay fresh for the
+#             dashboard, recorder and black box
+#   STANDBY   standby_fps (0 = no analysis): not moving and no move command
+#
+# A move command (/command with a direction) switches to FULL before the
+# vehicle reports MOVING: RingStage.set_fps wakes the detect stage, which
+# analyses the newest frame right away, so the ramp-up costs at most the
+# frame already in the ring. Without MOVING within arm_s it falls back.
+#
+# Frames not analysed because of the schedule are counted per camera and
+# mode; times the stage's per-frame cost, that is the CPU saved. With
+# detection.workers > 0 the stage only submits, so the seconds estimate
+# undercounts (the frame counts are exact).
+
+FULL, WATCHDOG, STANDBY = "full", "watchdog", "standby"
+MODES = (FULL, WATCHDOG, STANDBY)
+
+SWITCHES = REGISTRY.counter("raiv_detect_schedule_switches_total", "Detection rate changes", ["cam", "mode"])
+
+
+class DetectScheduler(object):
+    def __init__(self, cams, watchdog_fps=2, standby_fps=0, arm_s=10.0):
+        # cams: DETECT CameraThreads; each attach()es its detect stage on start
+        self.cams = {c.index: c for c in cams}
+        self.stages = {}
+        self.fps = {FULL: None, WATCHDOG: watchdog_fps, STANDBY: standby_fps}
+        self.arm_s = arm_s
+        self.lock = threading.Lock()
+        self.status = "STANDBY"
+        self.direction = "UNKNOWN"
+        self.armed_until = 0.0
+        self.timer = None
+        self.mode = {i: None for i in self.cams}
+        self.since = {i: time.perf_counter() for i in self.cams}
+        self.last_seq = {i: 0 for i in self.cams}
+        self.saved = {i: {m: 0 for m in MODES} for i in self.cams}       # frames
+        self.saved_s = {i: 0.0 for i in self.cams}                       # estimated CPU seconds
+        self.mode_s = {i: {m: 0.0 for m in MODES} for i in self.cams}
+        self.update()
+
+    # --- INPUTS (RTDB stream thread) ---
+    def on_command(self, direction):
+        # direction from parse_direction(): "FWD" / "BWD", None for STOP etc.
+        with self.lock:
+            if direction:
+                self.direction = direction
+                self.armed_until = time.time() + self.arm_s
+                self._arm_timer()
+            else: self.armed_until = 0.0
+        self.update()
+
+    def on_status(self, status):
+        with self.lock:
+            if status != "MOVING" and self.status == "MOVING": self.armed_until = 0.0
+            self.status = status
+        self.update()
+
+    def _arm_timer(self):
+        # Re-evaluates once the arm window is over (command but never MOVING)
+        if self.timer: self.timer.cancel()
+        self.timer = threading.Timer(self.arm_s + 0.01, self.update)
+        self.timer.daemon = True
+        self.timer.start()
+
+    # --- SCHEDULE ---
+    def mode_for(self, cam):
+        active = self.status == "MOVING" or time.time() < self.armed_until
+        if not active: return STANDBY
+        guards = cam.cam["stops_when"]
+        if guards is None or self.direction not in ("FWD", "BWD") or guards == self.direction: return FULL
+        return WATCHDOG
+
+    def update(self):
+        with self.lock:
+            for i, cam in self.cams.items():
+                mode = self.mode_for(cam)
+                if mode == self.mode[i]: continue
+                self._settle(i)
+                now = time.perf_counter()
+                if self.mode[i] is not None: self.mode_s[i][self.mode[i]] += now - self.since[i]
+                self.mode[i], self.since[i] = mode, now
+                if i in self.stages: self.stages[i].set_fps(self.fps[mode])
+                SWITCHES.labels(cam=str(i), mode=mode).inc()
+
+    def attach(self, i, stage):
+        # CameraThread.run(): the detect stage starts at the current rate
+        with self.lock:
+            self.stages[i] = stage
+            stage.set_fps(self.fps[self.mode[i]])
+
+    # --- ACCOUNTING ---
+    def _charge(self, i, upto):
+        # Frames after the last analysed one up to `upto` were skipped:
+        # charged to the current mode unless that is FULL (too slow, not saved)
+        missed = upto - self.last_seq[i]
+        if missed <= 0: return
+        self.last_seq[i] = upto
+        mode = self.mode[i]
+        if mode is None or mode == FULL: return
+        self.saved[i][mode] += missed
+        if i in self.stages: self.saved_s[i] += missed * self.stages[i].stats.busy_ms / 1000.0
+
+    def _settle(self, i):
+        # Up to the frame before the newest one, which the stage may still take
+        self._charge(i, self.cams[i].ring.seq - 1)
+
+    def analysed(self, i, seq):
+        # Called by the detect stage for every frame it analyses
+        with self.lock:
+            self._charge(i, seq - 1)
+            self.last_seq[i] = max(seq, self.last_seq[i])
+
+    def stats(self):
+        with self.lock:
+            for i in self.cams: self._settle(i)
+            return " | ".join(f"CAM{i} {self.mode[i]} saved {sum(self.saved[i].values())} frames ~{self.saved_s[i]:.1f}s CPU"
+                              for i in self.cams)
+
+
+def collect_schedule(sched):
+    now = time.perf_counter()
+    sched.stats()   # settles the frames missed so far
+    cams = sched.cams
+    yield ("raiv_detect_mode", "gauge", "1 for the detection rate each DETECT camera runs at",
+           [({"cam": str(i), "mode": m}, int(sched.mode[i] == m)) for i in cams for m in MODES])
+    yield ("raiv_detect_mode_seconds_total", "counter", "Time spent at each detection rate",
+           [({"cam": str(i), "mode": m}, sched.mode_s[i][m] + (now - sched.since[i] if sched.mode[i] == m else 0.0))
+            for i in cams for m in MODES])
+    yield ("raiv_detect_frames_saved_total", "counter", "Captured frames not analysed because of the schedule",
+           [({"cam": str(i), "mode": m}, sched.saved[i][m]) for i in cams for m in (WATCHDOG, STANDBY)])
+    yield ("raiv_detect_cpu_saved_seconds_total", "counter", "Frames saved x the detect stage's per-frame time",
+           [({"cam": str(i)}, sched.saved_s[i]) for i in cams])
+
+
+def start(cfg, cams):
+    # vision.start_cameras(): after the camera threads exist, before they run
+    s = cfg["detect_schedule"]
+    sched = DetectScheduler(cams, s["watchdog_fps"], s["standby_fps"], s["arm_s"])
+    REGISTRY.add_collector(lambda: collect_schedule(sched))
+    return sched
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+# --- OBSTACLE DETECTION ENGINE ---
+# Blur (Laplacian variance), brightness and red coverage for one frame, using
+# buffers allocated once per camera instead of ~6 new arrays per frame.
+#
+# roi:   (x, y, w, h) as fractions of the frame, e.g. (0.2, 0.4, 0.6, 0.6) for
+#        the rail area. None = whole frame.
+# scale: analysis resolution relative to the ROI (1.0 = full, 0.5 = half).
+#        NOTE: the Laplacian variance grows as the image shrinks, so blur
+#        thresholds must be re-tuned for anything other than 1.0 / full ROI
+#        (benchmarks/bench_detection.py prints the factor).
+# mode:  "area" = proper downscale, "stride" = nearest neighbour (plain
+#        subsampling, cheapest).
+
+RED_LOWER_1 = np.array([0, 100, 100], np.uint8)
+RED_UPPER_1 = np.array([10, 255, 255], np.uint8)
+RED_LOWER_2 = np.array([160, 100, 100], np.uint8)
+RED_UPPER_2 = np.array([180, 255, 255], np.uint8)
+
+
+class DetectionEngine(object):
+    def __init__(self, roi=None, scale=1.0, mode="area"):
+        self.roi = roi
+        self.scale = scale
+        self.interp = cv2.INTER_NEAREST if mode == "stride" else cv2.INTER_AREA
+        self.frame_shape = None
+
+    def _alloc(self, shape):
+        fh, fw = shape[:2]
+        if self.roi:
+            x, y, w, h = self.roi
+            x0, y0 = int(round(x * fw)), int(round(y * fh))
+            x1, y1 = min(fw, x0 + int(round(w * fw))), min(fh, y0 + int(round(h * fh)))
+        else:
+            x0, y0, x1, y1 = 0, 0, fw, fh
+        self.window = (slice(y0, y1), slice(x0, x1))
+        rw, rh = x1 - x0, y1 - y0
+        self.size = (max(1, int(rw * self.scale)), max(1, int(rh * self.scale)))
+        w, h = self.size
+
+        self.small = np.empty((h, w, 3), np.uint8) if self.size != (rw, rh) else None
+        self.gray = np.empty((h, w), np.uint8)
+        self.lap = np.empty((h, w), np.float32)
+        self.hsv = np.empty((h, w, 3), np.uint8)
+        self.mask = np.empty((h, w), np.uint8)
+        self.mask2 = np.empty((h, w), np.uint8)
+        self.pixels = w * h
+        self.frame_shape = shape
+
+    def analyse(self, frame):
+        # -> (blur_score, mean_brightness, red_pct)
+        if frame.shape != self.frame_shape: self._alloc(frame.shape)
+
+        src = frame[self.window]
+        if self.small is not None:
+            src = cv2.resize(src, self.size, dst=self.small, interpolation=self.interp)
+
+        # 1. SAFE SCORE & BRIGHTNESS (float32 Laplacian is exact for 8-bit input)
+        cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.Laplacian(self.gray, cv2.CV_32F, dst=self.lap)
+        _, std = cv2.meanStdDev(self.lap)
+        blur = float(std[0, 0]) ** 2
+        brightness = cv2.mean(self.gray)[0]
+
+        # 2. RED COVERAGE (OR the two hue bands, no uint8 '+' wrap-around)
+        cv2.cvtColor(src, cv2.COLOR_BGR2HSV, dst=self.hsv)
+        cv2.inRange(self.hsv, RED_LOWER_1, RED_UPPER_1, dst=self.mask)
+        cv2.inRange(self.hsv, RED_LOWER_2, RED_UPPER_2, dst=self.mask2)
+        cv2.bitwise_or(self.mask, self.mask2, dst=self.mask)
+        red_pct = cv2.countNonZero(self.mask) * 100.0 / self.pixels
+
+        return blur, brightness, red_pct
+
+
+def reference_scores(frame):
+    # The original per-frame code from CameraThread.run, kept for comparison
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    blur = cv2.Laplacian(gray, cv2.CV_64F).var()
+    mean_brightness = np.mean(gray)
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    lower1 = np.array([0, 100, 100]); upper1 = np.array([10, 255, 255])
+    lower2 = np.array([160, 100, 100]); upper2 = np.array([180, 255, 255])
+    mask = cv2.inRange(hsv, lower1, upper1) + cv2.inRange(hsv, lower2, upper2)
+    red_pct = (cv2.countNonZero(mask) / (frame.shape[0] * frame.shape[1])) * 100
+    return blur, mean_brightness, red_pct
@@ -0,0 +1,258 @@
+import glob
+import random
+import select
+import sys
+import threading
+import time
+
+from .config import DEFAULTS as CONFIG_DEFAULTS
+from .metrics import REGISTRY, count_error
+
+# --- DEVICE MANAGER ---
+# One thread watches every camera: device add/remove (udev or a /dev/video*
+# poll on Linux, nothing elsewhere), and "blind" time = no frame committed for
+# longer than blind_after_ms, whatever the cause (unplugged, read failures,
+# a driver hung inside read()).
+#
+# CameraThread asks its Device how long to wait before the next open:
+#   - jittered exponential backoff, retry_min_ms .. retry_max_ms, so four
+#     cameras on one hub do not retry in lockstep
+#   - a device known to be absent is not opened at all (MSMF/V4L2 opens of a
+#     missing index can block for seconds); the wait ends early the moment the
+#     watcher sees it come back
+#
+# on_blind(device, seconds) is called every tick while a device is blind past
+# blind_stop_ms; vision.py turns that into a safety stop for DETECT cameras.
+
+DEFAULTS = CONFIG_DEFAULTS["devices"]  # see config.py
+
+BLIND_SECONDS = REGISTRY.histogram("raiv_camera_blind_episode_seconds", "Length of each blind episode", ["cam"],
+                                   buckets=(0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0))
+RECONNECTS = REGISTRY.counter("raiv_camera_reconnects_total", "Camera open attempts", ["cam", "result"])
+DEVICE_EVENTS = REGISTRY.counter("raiv_device_events_total", "Hot-plug events seen by the watcher", ["event"])
+
+
+def device_key(source):
+    # Frame source spec -> device node it depends on, or None (files, synthetic,
+    # or a platform where indexes do not map to nodes)
+    if not sys.platform.startswith('linux'): return None
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return f"/dev/video{int(source)}"
+    return None
+
+
+class Backoff(object):
+    # "Full jitter": uniform(0, min(hi, lo * 2**n)), never below lo
+    def __init__(self, lo=0.05, hi=1.0, rng=None):
+        self.lo = lo
+        self.hi = hi
+        self.n = 0
+        self.rng = rng or random.Random()
+
+    def next(self):
+        cap = min(self.hi, self.lo * (2 ** self.n))
+        self.n = min(self.n + 1, 32)
+        return max(self.lo, self.rng.uniform(0, cap))
+
+    def reset(self): self.n = 0
+
+
+# --- WATCHERS ---
+# changes(timeout) -> [("add" | "remove", key), ...]; blocks at most timeout.
+# present() -> set of keys right now, or None if the watcher cannot tell.
+
+class NullWatcher(object):
+    def present(self): return None
+
+    def changes(self, timeout):
+        time.sleep(timeout)
+        return []
+
+
+class V4L2PollWatcher(object):
+    # Diffs the /dev/video* listing; one readdir per poll_ms
+    def __init__(self, poll_ms=250, pattern="/dev/video*"):
+        self.poll = poll_ms / 1000.0
+        self.pattern = pattern
+        self.known = self.present()
+        self.next_poll = 0.0
+
+    def present(self): return set(glob.glob(self.pattern))
+
+    def changes(self, timeout):
+        time.sleep(timeout)
+        now = time.perf_counter()
+        if now < self.next_poll: return []
+        self.next_poll = now + self.poll
+        seen = self.present()
+        out = [("add", k) for k in sorted(seen - self.known)] + [("remove", k) for k in sorted(self.known - seen)]
+        self.known = seen
+        return out
+
+
+class UdevWatcher(object):
+    # Kernel events through pyudev (optional dependency), no polling
+    def __init__(self):
+        import pyudev
+        self.context = pyudev.Context()
+        self.monitor = pyudev.Monitor.from_netlink(self.context)
+        self.monitor.filter_by(subsystem="video4linux")
+        self.monitor.start()
+
+    def present(self):
+        return {d.device_node for d in self.context.list_devices(subsystem="video4linux") if d.device_node}
+
+    def changes(self, timeout):
+        r, _, _ = select.select([self.monitor], [], [], timeout)
+        out = []
+        while r:
+            dev = self.monitor.poll(timeout=0)
+            if dev is None: break
+            if dev.action in ("add", "remove") and dev.device_node: out.append((dev.action, dev.device_node))
+        return out
+
+
+def make_watcher(kind="auto", poll_ms=250):
+    if kind == "none" or not sys.platform.startswith('linux'): return NullWatcher()
+    if kind in ("auto", "udev"):
+        try: return UdevWatcher()
+        except Exception as e:
+            if kind == "udev": count_error("udev_watcher", e)
+    return V4L2PollWatcher(poll_ms)
+
+
+# --- PER-CAMERA STATE ---
+class Device(object):
+    def __init__(self, name, key=None, settings=None, label=None):
+        s = dict(DEFAULTS, **(settings or {}))
+        label = name if label is None else label
+        self.name = name
+        self.key = key
+        self.present = True       # unknown = assume present
+        self.wake = threading.Event()
+        self.backoff = Backoff(s["retry_min_ms"] / 1000.0, s["retry_max_ms"] / 1000.0)
+        self.blind_after = s["blind_after_ms"] / 1000.0
+        self.read_fail = s["read_fail_ms"] / 1000.0
+        self.last_frame = None    # perf_counter of the last committed frame
+        self.opened = False
+        self.armed = False        # lazy cameras are not blind before their first viewer
+        self.blind_since = None
+        self.blind_total = 0.0    # finished episodes, seconds
+        self.episodes = 0
+        self.m_blind = BLIND_SECONDS.labels(cam=label)
+        self.m_ok = RECONNECTS.labels(cam=label, result="ok")
+        self.m_fail = RECONNECTS.labels(cam=label, result="failed")
+        self.m_absent = RECONNECTS.labels(cam=label, result="absent")
+
+    # --- CAPTURE THREAD SIDE ---
+    def arm(self):
+        # Called once the camera is meant to be delivering: blind until the first frame
+        self.blind_since = time.perf_counter()
+        self.episodes += 1
+        self.armed = True
+
+    def frame(self):
+        # One attribute write per frame; the manager does the bookkeeping
+        self.last_frame = time.perf_counter()
+
+    def opened_ok(self, ok):
+        self.opened = ok
+        (self.m_ok if ok else self.m_fail).inc()
+        if ok: self.backoff.reset()
+
+    def wait_retry(self):
+        # Sleep before the next open; ends early on a hot-plug add.
+        # -> False if the device is known absent (skip this open)
+        self.wake.clear()
+        if not self.present:
+            self.m_absent.inc()
+            self.wake.wait(self.backoff.hi)
+            return self.present
+        self.wake.wait(self.backoff.next())
+        return self.present
+
+    def failing_for(self, first_fail):
+        return first_fail is not None and time.perf_counter() - first_fail >= self.read_fail
+
+    # --- MANAGER SIDE ---
+    def blind_for(self, now=None):
+        return 0.0 if self.blind_since is None else (now or time.perf_counter()) - self.blind_since
+
+    def blind_seconds(self, now=None):
+        # Total blind time including the current episode
+        return self.blind_total + self.blind_for(now)
+
+    def check(self, now):
+        # -> True while blind
+        if not self.armed: return False
+        last = self.last_frame
+        if last is not None and now - last < self.blind_after:
+            if self.blind_since is not None:
+                # Episode over: counts from the last good frame (or thread start)
+                self.blind_total += last - self.blind_since
+                self.m_blind.observe(last - self.blind_since)
+                self.blind_since = None
+            return False
+        if self.blind_since is None:
+            self.blind_since = last if last is not None else now
+            self.episodes += 1
+        return True
+
+
+class DeviceManager(threading.Thread):
+    def __init__(self, settings=None, on_blind=None, on_change=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.settings = dict(DEFAULTS, **(settings or {}))
+        self.on_blind = on_blind      # (device, seconds_blind)
+        self.on_change = on_change    # (device, "add" | "remove")
+        self.devices = []
+        self.tick = self.settings["tick_ms"] / 1000.0
+        self.blind_stop = self.settings["blind_stop_ms"]
+        if self.blind_stop is not None: self.blind_stop /= 1000.0
+        self.watcher = make_watcher(self.settings["watcher"], self.settings["poll_ms"])
+
+    def add(self, name, source, label=None):
+        dev = Device(name, device_key(source), self.settings, label)
+        self.devices.append(dev)
+        return dev
+
+    def probe(self):
+        # Presence of every watched node in one listing, before any open
+        seen = self.watcher.present()
+        if seen is None: return
+        for dev in self.devices:
+            if dev.key is None: continue
+            dev.present = dev.key in seen
+            if not dev.present: print(f"[DEVICES] {dev.name}: {dev.key} not present, waiting for hot-plug")
+
+    def run(self):
+        while True:
+            try: events = self.watcher.changes(self.tick)
+            except Exception as e:
+                count_error("device_watcher", e)
+                time.sleep(self.tick)
+                events = []
+            for action, key in events:
+                DEVICE_EVENTS.labels(event=action).inc()
+                for dev in self.devices:
+                    if dev.key != key: continue
+                    dev.present = action == "add"
+                    print(f"[DEVICES] {dev.name}: {key} {action}")
+                    dev.wake.set()
+                    if self.on_change:
+                        try: self.on_change(dev, action)
+                        except Exception as e: count_error("device_change", e)
+            now = time.perf_counter()
+            for dev in self.devices:
+                if dev.check(now) and self.on_blind and self.blind_stop is not None:
+                    blind = dev.blind_for(now)
+                    if blind >= self.blind_stop:
+                        # The callback (vision's blind stop) must not kill the watcher
+                        try: self.on_blind(dev, blind)
+                        except Exception as e: count_error("device_blind", e)
+
+    def stats(self, now=None):
+        now = now or time.perf_counter()
+        return " | ".join(f"{d.name} {'BLIND %.1fs' % d.blind_for(now) if d.blind_since is not None else 'ok'}"
+                          f" ({d.blind_seconds(now):.1f}s total)" for d in self.devices)
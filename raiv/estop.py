@@ -0,0 +1,130 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import REGISTRY, FB_SECONDS
+
+# --- EMERGENCY STOP CHANNEL ---
+# A connection reserved for stops: its own Session (requests.Session is not
+# thread-safe, so it must not be shared with network_worker), TLS warmed up
+# at start and kept warm, ONE idempotent stop value per trigger, and retries
+# only until that value is confirmed at the database.
+#
+# Confirmed = the PUT came back 200 with our value, OR a read-back / the RTDB
+# stream shows our exact value at /command (a stale "STOP" does not count).
+# With the on-vehicle gateway on, the channel still talks to the hosted
+# database (channel_for): the gateway would confirm a stop the ESP32 never sees.
+
+WARM_EVERY = 20.0        # keep the TLS connection alive between stops
+PUT_TIMEOUT = 0.5
+RETRY_EVERY = 0.1
+RETRY_FOR = 10.0         # keep trying this long before declaring the stop lost
+
+ACK_SECONDS = REGISTRY.histogram("raiv_estop_ack_seconds", "Emergency stop trigger -> confirmed at RTDB",
+                                 buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+STOPS = REGISTRY.counter("raiv_estop_total", "Emergency stops by outcome", ["result"])
+
+
+class EmergencyChannel(threading.Thread):
+    def __init__(self, base_url, path="command", auth=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.url = f"{base_url.rstrip('/')}/{path}.json"
+        self.params = {'auth': auth} if auth else None
+
+        self.session = requests.Session()
+        # One pooled connection, no silent urllib3 retries: we retry ourselves
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.cond = threading.Condition()
+        self.pending = None      # (stop_id, trigger_time, reason)
+        self.confirmed_id = None
+        self.seen_command = None
+        self.latency = ACK_SECONDS
+        self.sent = 0
+        self.confirmed = 0
+        self.lost = 0
+        self.last_warm = 0.0
+
+    # --- PUBLIC ---
+    def trigger(self, reason=""):
+        # Non-blocking; a trigger while a stop is in flight joins that stop
+        with self.cond:
+            if self.pending is None:
+                STOPS.labels(result="triggered").inc()
+                stop_id = f"STOP_EMERGENCY_{int(time.time() * 1000)}"
+                self.pending = (stop_id, time.perf_counter(), reason)
+                self.cond.notify_all()
+            return self.pending[0]
+
+    def on_command(self, cmd):
+        # Feed /command values from the RTDB stream (confirms without a GET)
+        with self.cond:
+            self.seen_command = cmd
+            self.cond.notify_all()
+
+    def warm(self):
+        try:
+            with FB_SECONDS.labels(op="estop_warm").time():
+                self.session.get(self.url, params=self.params, timeout=2.0)
+            self.last_warm = time.time()
+        except requests.RequestException: pass
+
+    # --- WORKER ---
+    def run(self):
+        self.warm()
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending is not None, timeout=WARM_EVERY)
+                job = self.pending
+            if job is None:
+                if time.time() - self.last_warm >= WARM_EVERY: self.warm()
+                continue
+            self._deliver(*job)
+            with self.cond:
+                self.pending = None
+
+    def _deliver(self, stop_id, t0, reason):
+        deadline = t0 + RETRY_FOR
+        with self.cond: self.seen_command = None
+        while time.perf_counter() < deadline:
+            try:
+                self.sent += 1
+                with FB_SECONDS.labels(op="estop_put").time():
+                    r = self.session.put(self.url, params=self.params, json=stop_id, timeout=PUT_TIMEOUT)
+                if r.status_code == 200 and r.json() == stop_id:
+                    return self._ack(stop_id, t0, "put")
+            except (requests.RequestException, ValueError): pass
+
+            # Unknown outcome: the stream or a read-back may still prove it landed
+            with self.cond:
+                if self.cond.wait_for(lambda: self.seen_command == stop_id, timeout=RETRY_EVERY):
+                    return self._ack(stop_id, t0, "stream")
+            try:
+                with FB_SECONDS.labels(op="estop_readback").time():
+                    r = self.session.get(self.url, params=self.params, timeout=PUT_TIMEOUT)
+                if r.status_code == 200 and r.json() == stop_id:
+                    return self._ack(stop_id, t0, "readback")
+            except (requests.RequestException, ValueError): pass
+
+        self.lost += 1
+        STOPS.labels(result="lost").inc()
+        print(f"[⛔ ESTOP] {stop_id} NOT CONFIRMED after {RETRY_FOR:g}s ({reason})")
+
+    def _ack(self, stop_id, t0, via):
+        ms = (time.perf_counter() - t0) * 1000
+        self.latency.observe(ms / 1000)
+        STOPS.labels(result="confirmed_" + via).inc()
+        self.confirmed += 1
+        self.confirmed_id = stop_id
+        self.last_warm = time.time()
+        print(f"[⛔ ESTOP] {stop_id} confirmed via {via} in {ms:.0f}ms")
+
+
+def channel_for(fb):
+    # fb: config "firebase" section; cloud_url is set when rtdb_gateway took base_url
+    return EmergencyChannel(fb.get("cloud_url") or fb["base_url"], auth=fb.get("cloud_auth", fb["auth"]))
@@ -0,0 +1,351 @@
+import asyncio
+import copy
+import http.client
+import json
+import random
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit, urlencode
+
+from .metrics import count_error
+
+# --- FIREBASE RTDB STREAM (Server-Sent Events) ---
+# Holds ONE long-lived GET with "Accept: text/event-stream" and applies the
+# put/patch deltas to a local mirror, instead of polling every 0.5s.
+# Protocol: https://firebase.google.com/docs/reference/rest/database#section-streaming
+
+KEEPALIVE_TIMEOUT = 75.0   # RTDB sends keep-alive every ~30s, give up after this
+BACKOFF_MIN = 0.25
+BACKOFF_MAX = 8.0
+
+
+def parse_direction(cmd):
+    # Same rules the old poller used on /command
+    if not cmd or not isinstance(cmd, str): return None
+    if "FWD" in cmd or "FORWARD" in cmd: return "FWD"
+    if "BWD" in cmd or "BACKWARD" in cmd: return "BWD"
+    return None
+
+
+def _split(path):
+    return [p for p in path.split('/') if p]
+
+
+def apply_put(tree, path, data):
+    # Returns the new root (a put on "/" replaces everything)
+    keys = _split(path)
+    if not keys: return data if isinstance(data, dict) else ({} if data is None else data)
+    node = tree
+    for k in keys[:-1]:
+        nxt = node.get(k)
+        if not isinstance(nxt, dict):
+            if data is None: return tree
+            nxt = node[k] = {}
+        node = nxt
+    if data is None: node.pop(keys[-1], None)
+    else: node[keys[-1]] = data
+    return tree
+
+
+def apply_patch(tree, path, data):
+    if not isinstance(data, dict): return apply_put(tree, path, data)
+    base = path.rstrip('/')
+    for k, v in data.items():
+        tree = apply_put(tree, f"{base}/{k}", v)
+    return tree
+
+
+def parse_event(payload, count=True):
+    # put / patch payload -> {"path": ..., "data": ...}, None (counted) when malformed:
+    # one bad event is dropped, the stream stays up
+    try: msg = json.loads(payload)
+    except ValueError as e: msg = e
+    if isinstance(msg, dict) and isinstance(msg.get('path', '/'), str): return msg
+    if count:
+        err = msg if isinstance(msg, ValueError) else ValueError(f"not an event object: {payload[:80]!r}")
+        count_error("fb_stream_event", err)
+    return None
+
+
+class RTDBMirror(object):
+    # State shared by the threaded and the asyncio stream: the local mirror and
+    # the put/patch event handling
+    def __init__(self, base_url, path="/", watch=None, on_change=None, auth=None,
+                 backoff_min=BACKOFF_MIN, backoff_max=BACKOFF_MAX, timeout=KEEPALIVE_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.path = '/' + '/'.join(_split(path))
+        self.watch = set(watch) if watch else None
+        self.on_change = on_change
+        self.auth = auth
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.lock = threading.Lock()
+        self.mirror = {}
+        self.connected = threading.Event()
+        self.ready = threading.Event()   # set after the first full snapshot
+        self.reconnects = 0
+        self.events = 0
+        self.last_event_time = 0.0
+        self._halt = threading.Event()
+        self._event, self._data = None, []
+
+    # --- PUBLIC ---
+    def get(self, *keys, default=None):
+        with self.lock:
+            node = self.mirror
+            for k in keys:
+                if not isinstance(node, dict) or k not in node: return default
+                node = node[k]
+            return node
+
+    def snapshot(self):
+        # Frozen copy with the same get(): for handlers that run after the next event
+        snap = RTDBMirror(self.base_url, self.path)
+        with self.lock: snap.mirror = copy.deepcopy(self.mirror)
+        return snap
+
+    # --- INTERNALS ---
+    def _url(self):
+        url = f"{self.base_url}{self.path.rstrip('/')}/.json"
+        if self.auth: url += '?' + urlencode({'auth': self.auth})
+        return url
+
+    def _sse_line(self, line):
+        # One decoded line of the event stream (without the newline)
+        if not line:
+            event, data = self._event, self._data
+            self._event, self._data = None, []
+            if event: self._dispatch(event, '\n'.join(data))
+        elif line.startswith('event:'):
+            self._event = line[6:].strip()
+        elif line.startswith('data:'):
+            self._data.append(line[5:].lstrip())
+
+    def _dispatch(self, event, payload):
+        if event == 'keep-alive':
+            self.last_event_time = time.time()
+            return
+        if event in ('cancel', 'auth_revoked'):
+            raise ConnectionError(event)
+        if event not in ('put', 'patch'): return
+
+        msg = parse_event(payload)
+        if msg is None: return
+        # Rebase the event path onto the database root
+        path = self.path.rstrip('/') + '/' + msg.get('path', '/').lstrip('/')
+        body = msg.get('data')
+
+        keys = _split(path)
+        if keys:
+            roots = {keys[0]}
+        elif isinstance(body, dict):
+            roots = set(body.keys())
+        else:
+            roots = set()
+        if self.watch is not None:
+            roots &= self.watch
+            if not keys and isinstance(body, dict):
+                body = {k: v for k, v in body.items() if k in self.watch}
+            elif not roots:
+                return
+
+        with self.lock:
+            if event == 'put': self.mirror = apply_put(self.mirror, path, body)
+            else: self.mirror = apply_patch(self.mirror, path, body)
+            if not isinstance(self.mirror, dict): self.mirror = {}
+        self.events += 1
+        self.last_event_time = time.time()
+        self.ready.set()
+
+        if self.on_change and roots:
+            try: self.on_change(roots, self)
+            except Exception as e: print(f"[FB STREAM] callback error: {e}")
+
+
+class RTDBStream(RTDBMirror, threading.Thread):
+    # base_url: https://<db>.firebasedatabase.app   path: subtree to stream
+    # watch: top-level children to keep in the mirror (None = keep all)
+    # on_change(changed_roots, mirror) runs on this thread, keep it short
+    def __init__(self, base_url, path="/", watch=None, on_change=None, **kw):
+        threading.Thread.__init__(self)
+        RTDBMirror.__init__(self, base_url, path, watch, on_change, **kw)
+        self.daemon = True
+        self._conn = None
+
+    def stop(self):
+        self._halt.set()
+        conn = self._conn
+        if conn:
+            try: conn.sock and conn.sock.close()
+            except: pass
+
+    def run(self):
+        delay = self.backoff_min
+        while not self._halt.is_set():
+            try:
+                self._listen()
+                delay = self.backoff_min  # clean close (server rotated us)
+            except Exception as e:
+                if self._halt.is_set(): break
+                print(f"[FB STREAM] reconnect in {delay:.2f}s ({type(e).__name__}: {e})")
+            self.connected.clear()
+            if self._halt.is_set(): break
+            self.reconnects += 1
+            # Full jitter keeps several clients from reconnecting in lockstep
+            self._halt.wait(random.uniform(self.backoff_min, delay))
+            delay = min(delay * 2, self.backoff_max)
+
+    def _open(self, url, hops=5):
+        # RTDB may 307 us to the node that owns the namespace
+        for _ in range(hops):
+            u = urlsplit(url)
+            Conn = http.client.HTTPSConnection if u.scheme == 'https' else http.client.HTTPConnection
+            conn = Conn(u.netloc, timeout=self.timeout)
+            target = u.path + ('?' + u.query if u.query else '')
+            conn.request('GET', target, headers={'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'})
+            resp = conn.getresponse()
+            if resp.status in (301, 302, 307, 308):
+                url = resp.getheader('Location')
+                conn.close()
+                continue
+            if resp.status != 200:
+                conn.close()
+                raise ConnectionError(f"HTTP {resp.status}")
+            return conn, resp
+        raise ConnectionError("too many redirects")
+
+    def _listen(self):
+        conn, resp = self._open(self._url())
+        self._conn = conn
+        self.connected.set()
+        self._event, self._data = None, []
+        try:
+            while not self._halt.is_set():
+                raw = resp.readline()
+                if not raw: return  # server closed
+                self._sse_line(raw.decode('utf-8').rstrip('\r\n'))
+        finally:
+            self._conn = None
+            conn.close()
+
+
+# --- ASYNCIO VARIANT ---
+# Same protocol on an event loop (server_async.py), on plain asyncio streams so it
+# needs no extra packages.
+
+async def http_open(method, url, headers=None, body=None, timeout=10.0, hops=5):
+    # -> (reader, writer, status, headers) with the body still unread; follows redirects
+    for _ in range(hops):
+        u = urlsplit(url)
+        tls = u.scheme == 'https'
+        port = u.port or (443 if tls else 80)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(
+            u.hostname, port, ssl=ssl.create_default_context() if tls else None), timeout)
+        target = (u.path or '/') + ('?' + u.query if u.query else '')
+        head = [f"{method} {target} HTTP/1.1", f"Host: {u.netloc}", "Connection: close"]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        if body is not None: head.append(f"Content-Length: {len(body)}")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + (body or b''))
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        parts = status_line.split()
+        if len(parts) < 2:
+            writer.close()
+            raise ConnectionError("bad HTTP response")
+        status, resp_headers = int(parts[1]), {}
+        while True:
+            line = (await asyncio.wait_for(reader.readline(), timeout)).decode('latin-1').rstrip('\r\n')
+            if not line: break
+            k, _, v = line.partition(':')
+            resp_headers[k.strip().lower()] = v.strip()
+        if status in (301, 302, 307, 308) and 'location' in resp_headers:
+            writer.close()
+            url = resp_headers['location']
+            continue
+        return reader, writer, status, resp_headers
+    raise ConnectionError("too many redirects")
+
+
+class _BodyLines(object):
+    # readline() over a response body, plain or chunked
+    def __init__(self, reader, headers):
+        self.reader = reader
+        self.chunked = 'chunked' in headers.get('transfer-encoding', '').lower()
+        self.buf = b''
+
+    async def readline(self):
+        if not self.chunked: return await self.reader.readline()
+        while b'\n' not in self.buf:
+            size = int((await self.reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0: return b''
+            self.buf += await self.reader.readexactly(size)
+            await self.reader.readline()  # CRLF after the chunk
+        line, _, self.buf = self.buf.partition(b'\n')
+        return line + b'\n'
+
+
+async def request_json(method, url, data=None, timeout=5.0):
+    # Small REST call for the event loop (PUT cam_url etc.) -> decoded JSON
+    body = json.dumps(data).encode() if data is not None or method in ('PUT', 'POST', 'PATCH') else None
+    reader, writer, status, headers = await http_open(method, url, {'Content-Type': 'application/json'}, body, timeout)
+    try:
+        if 'content-length' in headers:
+            raw = await asyncio.wait_for(reader.readexactly(int(headers['content-length'])), timeout)
+        else:
+            lines, raw = _BodyLines(reader, headers), b''
+            while True:
+                line = await asyncio.wait_for(lines.readline(), timeout)
+                if not line: break
+                raw += line
+    finally:
+        writer.close()
+    if status >= 300: raise ConnectionError(f"HTTP {status}")
+    return json.loads(raw) if raw.strip() else None
+
+
+class AsyncRTDBStream(RTDBMirror):
+    # RTDBStream for an event loop: asyncio.create_task(stream.run()).
+    # on_change runs on the loop, so it must not block.
+    def __init__(self, *args, **kw):
+        RTDBMirror.__init__(self, *args, **kw)
+        self._writer = None
+
+    def stop(self):
+        self._halt.set()
+        if self._writer: self._writer.close()
+
+    async def run(self):
+        delay = self.backoff_min
+        while not self._halt.is_set():
+            try:
+                await self._listen()
+                delay = self.backoff_min
+            except Exception as e:
+                if self._halt.is_set(): break
+                print(f"[FB STREAM] reconnect in {delay:.2f}s ({type(e).__name__}: {e})")
+            self.connected.clear()
+            if self._halt.is_set(): break
+            self.reconnects += 1
+            await asyncio.sleep(random.uniform(self.backoff_min, delay))
+            delay = min(delay * 2, self.backoff_max)
+
+    async def _listen(self):
+        reader, writer, status, headers = await http_open(
+            'GET', self._url(), {'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'}, timeout=self.timeout)
+        self._writer = writer
+        try:
+            if status != 200: raise ConnectionError(f"HTTP {status}")
+            self.connected.set()
+            self._event, self._data = None, []
+            body = _BodyLines(reader, headers)
+            while not self._halt.is_set():
+                raw = await asyncio.wait_for(body.readline(), self.timeout)
+                if not raw: return
+                self._sse_line(raw.decode('utf-8').rstrip('\r\n'))
+        finally:
+            self._writer = None
+            writer.close()
@@ -0,0 +1,84 @@
+import threading
+import time
+
+# --- PER-CAMERA BROADCAST HUB ---
+# One producer encodes each frame ONCE into a sequence-numbered slot; every
+# MJPEG viewer blocks on the condition until a newer frame exists, so N viewers
+# cost one encode and nobody is ever sent the same frame twice.
+
+BOUNDARY = b'frame'
+MJPEG_MIMETYPE = 'multipart/x-mixed-replace; boundary=frame'
+
+
+def mjpeg_part(jpeg):
+    # The whole multipart part (boundary, headers with Content-Length, JPEG,
+    # CRLF) is built ONCE per encoded frame and the same immutable bytes go to
+    # every viewer: no per-client copy, one socket write per frame per client.
+    return b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%b\r\n' % (len(jpeg), jpeg)
+
+
+def tagged_part(cam, part):
+    # Same part with an X-Camera header, for streams that carry several cameras
+    return b'--frame\r\nX-Camera: %d\r\n%b' % (cam, part[len(BOUNDARY) + 4:])
+
+
+class FrameHub(object):
+    def __init__(self, name=""):
+        self.name = name
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.frame = None
+        self.part = None
+        self.stamp = 0.0
+        self.viewers = 0
+        self.wanted = False   # frames needed without a viewer here (e.g. the mosaic)
+        self.listeners = []   # fn(seq) after each publish, e.g. async_stream.AsyncHub
+
+    # --- PRODUCER ---
+    def publish(self, jpeg, stamp=None):
+        part = mjpeg_part(jpeg)
+        with self.cond:
+            self.seq += 1
+            self.frame = jpeg
+            self.part = part
+            self.stamp = stamp if stamp is not None else time.time()
+            self.cond.notify_all()
+        for fn in self.listeners: fn(self.seq)
+
+    def has_viewers(self):
+        return self.viewers > 0
+
+    def wait_for_viewers(self, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.viewers > 0 or self.wanted, timeout)
+
+    def want(self):
+        # Wake a lazy camera for a consumer that reads its ring directly
+        with self.cond:
+            self.wanted = True
+            self.cond.notify_all()
+
+    # --- SUBSCRIBERS ---
+    def wait_newer(self, after_seq, timeout=None):
+        # -> (seq, mjpeg_part) or None on timeout
+        with self.cond:
+            if self.seq <= after_seq:
+                if not self.cond.wait_for(lambda: self.seq > after_seq, timeout): return None
+            return self.seq, self.part
+
+    def stream(self, timeout=1.0):
+        # Generator for Flask: Response(hub.stream(), mimetype=MJPEG_MIMETYPE)
+        with self.cond:
+            self.viewers += 1
+            self.cond.notify_all()
+        try:
+            last = 0
+            while True:
+                got = self.wait_newer(last, timeout)
+                if got is None: continue
+                last, part = got
+                yield part
+        finally:
+            # Runs when the WSGI server closes the generator (client gone)
+            with self.cond:
+                self.viewers -= 1
@@ -0,0 +1,211 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .frame_source import decode_jpeg
+from .metrics import REGISTRY, count_error
+
+STAGE_SECONDS = REGISTRY.histogram("raiv_stage_seconds", "Time spent processing one frame", ["cam", "stage"])
+STAGE_LAG = REGISTRY.histogram("raiv_stage_lag_seconds", "Capture -> stage done", ["cam", "stage"],
+                               buckets=(0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0))
+STAGE_FRAMES = REGISTRY.counter("raiv_stage_frames_total", "Frames processed by a stage", ["cam", "stage"])
+STAGE_SKIPPED = REGISTRY.counter("raiv_stage_skipped_total", "Frames a stage was too slow for (dropped)", ["cam", "stage"])
+STAGE_TORN = REGISTRY.counter("raiv_stage_torn_total", "Frames the producer overwrote while a stage still read them",
+                              ["cam", "stage"])
+
+# --- LATEST-FRAME RING BUFFER ---
+# The capture thread decodes straight into a preallocated slot (cap.read(slot))
+# and commits it. Consumers never queue: they wake on a newer frame, take the
+# newest one and skip whatever they were too slow for. Oldest slot is reused.
+
+RING_SLOTS = 4
+
+
+class FrameRing(object):
+    def __init__(self, shape=(240, 320, 3), slots=RING_SLOTS, dtype=np.uint8):
+        self.slots = slots
+        self.cond = threading.Condition()
+        self.seq = 0  # last committed sequence number (0 = nothing yet)
+        self._alloc(tuple(shape), dtype)
+
+    def _alloc(self, shape, dtype):
+        self.shape = shape
+        self.buf = np.zeros((self.slots,) + shape, dtype)
+        self.stamps = [0.0] * self.slots
+        self.seqs = [0] * self.slots
+
+    # --- PRODUCER ---
+    def next_slot(self):
+        # Slot the next frame will land in; never the one readers see as newest
+        return self.buf[(self.seq + 1) % self.slots]
+
+    def commit(self, stamp=None, frame=None):
+        # frame: only needed if the decoder did NOT write into next_slot()
+        # (e.g. the camera ignored the requested resolution)
+        with self.cond:
+            if frame is not None and frame.shape != self.shape:
+                self._alloc(frame.shape, frame.dtype)
+            i = (self.seq + 1) % self.slots
+            if frame is not None and frame.ctypes.data != self.buf[i].ctypes.data:
+                np.copyto(self.buf[i], frame)
+            self.seq += 1
+            self.seqs[i] = self.seq
+            self.stamps[i] = stamp if stamp is not None else time.time()
+            self.cond.notify_all()
+
+    # --- CONSUMERS ---
+    def wait_newer(self, after_seq, timeout=None):
+        # -> (seq, capture_time, view) of the newest frame, or None on timeout.
+        # The view stays valid while intact(seq) is True (slots-1 frames ahead)
+        with self.cond:
+            if self.seq <= after_seq:
+                if not self.cond.wait_for(lambda: self.seq > after_seq, timeout): return None
+            i = self.seq % self.slots
+            return self.seq, self.stamps[i], self.buf[i]
+
+    def intact(self, seq):
+        return self.seq - seq < self.slots - 1
+
+    def copy_latest(self, out):
+        # Seqlock-style copy for consumers that hold pixels for a long time;
+        # out of another size gets a resized copy (e.g. a mosaic tile)
+        while True:
+            seq = self.seq
+            if seq == 0: return None
+            i = seq % self.slots
+            stamp = self.stamps[i]
+            if out.shape == self.shape: np.copyto(out, self.buf[i])
+            else: cv2.resize(self.buf[i], (out.shape[1], out.shape[0]), dst=out, interpolation=cv2.INTER_AREA)
+            # The writer only touches slot i once it is slots-1 frames ahead
+            if self.intact(seq): return seq, stamp
+
+
+class JpegRing(FrameRing):
+    # Same ring for passthrough cameras: slots hold the camera's JPEG bytes.
+    # Bytes are immutable, so a view is never overwritten under a reader;
+    # pixels are decoded only when a consumer asks for them.
+    def _alloc(self, shape, dtype):
+        self.shape = shape
+        self.buf = [None] * self.slots
+        self.stamps = [0.0] * self.slots
+        self.seqs = [0] * self.slots
+
+    def next_slot(self): return None
+
+    def commit(self, stamp=None, frame=None):
+        with self.cond:
+            i = (self.seq + 1) % self.slots
+            self.buf[i] = frame
+            self.seq += 1
+            self.seqs[i] = self.seq
+            self.stamps[i] = stamp if stamp is not None else time.time()
+            self.cond.notify_all()
+
+    def intact(self, seq): return True
+
+    def copy_latest(self, out):
+        with self.cond:
+            seq = self.seq
+            if seq == 0: return None
+            i = seq % self.slots
+            jpeg, stamp = self.buf[i], self.stamps[i]
+        if decode_jpeg(jpeg, out, (self.shape[1], self.shape[0])) is None: return None
+        return seq, stamp
+
+
+# --- CONSUMER STAGE ---
+class StageStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.skipped = 0
+        self.lag_ms = 0.0      # capture -> done, smoothed
+        self.max_lag_ms = 0.0
+        self.busy_ms = 0.0     # time spent in the stage callback, smoothed
+        self.torn = 0          # slot rewritten under the callback (see RingStage)
+
+    def record(self, lag_ms, busy_ms, skipped):
+        self.frames += 1
+        self.skipped += skipped
+        self.lag_ms += (lag_ms - self.lag_ms) * 0.1
+        self.busy_ms += (busy_ms - self.busy_ms) * 0.1
+        if lag_ms > self.max_lag_ms: self.max_lag_ms = lag_ms
+
+    def summary(self):
+        s = f"{self.name} lag {self.lag_ms:.0f}ms (max {self.max_lag_ms:.0f}) busy {self.busy_ms:.1f}ms skip {self.skipped}"
+        if self.torn: s += f" TORN {self.torn}"
+        self.max_lag_ms = 0.0
+        return s
+
+
+class RingStage(threading.Thread):
+    # Runs fn(seq, capture_time, frame) on the newest frame, at most max_fps.
+    # cam/stage label the stage's /metrics series.
+    # frame is the ring slot itself, valid while ring.intact(seq): fine for
+    # callbacks that copy it right away. copy=True hands fn a private copy
+    # (copy_latest) instead, for stages that can outlive the slot and whose
+    # result matters (detection, encoding). Either way a slot rewritten under
+    # fn is counted as torn.
+    def __init__(self, ring, name, fn, max_fps=None, cam="", stage="", copy=False):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.ring = ring
+        self.fn = fn
+        self.copy = copy
+        self.own = None
+        self.period = 1.0 / max_fps if max_fps else 0.0
+        self.paused = False
+        self.rate_changed = threading.Event()
+        self.stats = StageStats(name)
+        labels = dict(cam=cam, stage=stage or name)
+        self.m_busy = STAGE_SECONDS.labels(**labels)
+        self.m_lag = STAGE_LAG.labels(**labels)
+        self.m_frames = STAGE_FRAMES.labels(**labels)
+        self.m_skipped = STAGE_SKIPPED.labels(**labels)
+        self.m_torn = STAGE_TORN.labels(**labels)
+
+    def set_fps(self, max_fps):
+        # From any thread, effective at once: a stage sleeping out its period
+        # or paused wakes up and takes the newest frame. None = every frame,
+        # 0 = paused (frames missed while paused are not counted as skipped)
+        self.paused = max_fps == 0
+        self.period = 1.0 / max_fps if max_fps else 0.0
+        self.rate_changed.set()
+
+    def run(self):
+        last = 0
+        next_due = 0.0
+        while True:
+            self.rate_changed.clear()
+            if self.paused:
+                self.rate_changed.wait(1.0)
+                last = 0
+                continue
+            if self.period:
+                wait = min(next_due, time.time() + self.period) - time.time()
+                if wait > 0 and self.rate_changed.wait(wait): continue
+            got = self.ring.wait_newer(last, timeout=1.0)
+            if got is None: continue
+            seq, stamp, frame = got
+            if self.copy:
+                if self.own is None or self.own.shape != self.ring.shape: self.own = np.empty(self.ring.shape, np.uint8)
+                got = self.ring.copy_latest(self.own)
+                if got is None: continue
+                (seq, stamp), frame = got, self.own
+            t0 = time.time()
+            try: self.fn(seq, stamp, frame)
+            except Exception as e: count_error(self.stats.name, e)
+            done = time.time()
+            if not self.copy and not self.ring.intact(seq):
+                self.stats.torn += 1
+                self.m_torn.inc()
+            skipped = seq - last - 1 if last else 0
+            last = seq
+            self.stats.record((done - stamp) * 1000, (done - t0) * 1000, skipped)
+            self.m_busy.observe(done - t0)
+            self.m_lag.observe(done - stamp)
+            self.m_frames.inc()
+            if skipped: self.m_skipped.inc(skipped)
+            if self.period: next_due = t0 + self.period
@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# --- FRAME SOURCES ---
+# Everything that feeds a CameraThread looks like a small VideoCapture:
+# isOpened(), read(image=None) -> (ok, frame), reopen(), release().
+# Sources opened with passthrough=True also have read_jpeg() -> (ok, bytes):
+# the JPEG the camera itself compressed (MJPG with CAP_PROP_CONVERT_RGB=0),
+# no decode in OpenCV and nothing to re-encode for the stream or the archive.
+#
+#   0, 1, "2"                  -> real camera (MSMF on Windows, V4L2 on Linux)
+#   "file:run.mp4"             -> recorded video, paced at its own FPS, looping
+#   "file:run.mp4@max"         -> same, as fast as it decodes
+#   "synthetic" / "synthetic@max" -> generated track scene, no files needed
+
+VIDEO_EXTS = ('.mp4', '.avi', '.mkv', '.mov', '.mjpeg', '.mjpg')
+FALLBACK_QUALITY = 80   # passthrough asked for, but the driver still hands out pixels
+
+
+def default_backend():
+    if sys.platform.startswith('win'): return cv2.CAP_MSMF
+    if sys.platform.startswith('linux'): return cv2.CAP_V4L2
+    return cv2.CAP_ANY
+
+
+def backend_by_name(name):
+    # Config value -> cv2.CAP_* (None = default_backend())
+    if name is None: return None
+    return {"any": cv2.CAP_ANY, "dshow": cv2.CAP_DSHOW, "msmf": cv2.CAP_MSMF,
+            "v4l2": cv2.CAP_V4L2, "ffmpeg": cv2.CAP_FFMPEG}[name.lower()]
+
+
+def is_jpeg(buf):
+    return len(buf) > 3 and buf[0] == 0xFF and buf[1] == 0xD8
+
+
+# IJG (libjpeg) luminance quantization table at quality 50
+STD_LUMA_SUM = sum((16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+                    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+                    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+                    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99))
+
+
+def jpeg_quality(jpeg):
+    # -> IJG-equivalent quality (1-100) of a JPEG from its first (luma)
+    # quantization table, or None if it has none. Only the header is read.
+    i = jpeg.find(b"\xff\xdb", 0, 2048)
+    if i < 0: return None
+    wide = jpeg[i + 4] >> 4          # 16-bit table entries
+    n = 128 if wide else 64
+    table = jpeg[i + 5:i + 5 + n]
+    if len(table) < n: return None
+    total = sum(int.from_bytes(table[k:k + 2], "big") for k in range(0, n, 2)) if wide else sum(table)
+    scale = total * 100.0 / STD_LUMA_SUM
+    quality = (200.0 - scale) / 2.0 if scale <= 100.0 else 5000.0 / scale
+    return int(round(min(max(quality, 1.0), 100.0)))
+
+
+def reduced_decode(src_size, dst_size):
+    # -> (imdecode flag, factor): libjpeg's 1/4 or 1/2 scaled decode when the
+    # target is at most that big, far cheaper than a full decode + resize
+    (sw, sh), (w, h) = src_size, dst_size
+    for f, flag in ((4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if w * f <= sw and h * f <= sh: return flag, f
+    return cv2.IMREAD_COLOR, 1
+
+
+def decode_jpeg(jpeg, out=None, size=None):
+    # Encoded frame -> BGR pixels, only for consumers that need them.
+    # out: resized into it when the frame is not already that size;
+    # size: the frame's (width, height) if known, allows a scaled decode
+    flag = cv2.IMREAD_COLOR
+    if out is not None and size is not None: flag = reduced_decode(size, (out.shape[1], out.shape[0]))[0]
+    img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), flag)
+    if img is None or out is None: return img
+    if img.shape == out.shape: np.copyto(out, img)
+    else: cv2.resize(img, (out.shape[1], out.shape[0]), dst=out, interpolation=cv2.INTER_AREA)
+    return out
+
+
+def open_source(spec, width=320, height=240, fps=30, backend=None, passthrough=False):
+    # passthrough: also provide read_jpeg() (only cameras and synthetic)
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return CameraSource(int(spec), width, height, fps, backend, passthrough)
+    spec = str(spec)
+    realtime = not spec.endswith('@max')
+    name = spec[:-4] if spec.endswith('@max') else spec
+    if name == 'synthetic' or name.startswith('synthetic:'):
+        seed = int(name.split(':', 1)[1]) if ':' in name else 0
+        return SyntheticSource(width, height, fps, realtime, seed, passthrough)
+    if name.startswith('file:'): name = name[5:]
+    if name.lower().endswith(VIDEO_EXTS) or os.path.exists(name):
+        if passthrough: raise ValueError(f"passthrough needs a camera or synthetic source: {spec!r}")
+        return VideoFileSource(name, width, height, realtime)
+    raise ValueError(f"unknown frame source: {spec!r}")
+
+
+class CameraSource(object):
+    def __init__(self, index, width=320, height=240, fps=30, backend=None, passthrough=False):
+        self.index = index
+        self.size = (width, height)
+        self.fps = fps
+        self.passthrough = passthrough
+        self.backend = default_backend() if backend is None else backend
+        self.cap = cv2.VideoCapture(index, self.backend)
+        self.fallback = False   # driver ignored CONVERT_RGB=0: encode in software
+        self._configure()
+
+    def _configure(self):
+        if not self.cap.isOpened(): return
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # Keep the driver queue short, the ring does the buffering
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # MJPG + no RGB conversion: read() returns the compressed frame as a
+        # 1-row byte array (MSMF, V4L2, DirectShow)
+        if self.passthrough: self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+    def isOpened(self): return self.cap.isOpened()
+
+    def read(self, image=None):
+        return self.cap.read(image) if image is not None else self.cap.read()
+
+    def read_jpeg(self):
+        ok, buf = self.cap.read()
+        if not ok or buf is None: return False, None
+        if buf.ndim == 3 or not is_jpeg(buf.ravel()[:4]):
+            # Still pixels (no MJPG mode, or a backend without raw output)
+            if not self.fallback: print(f"[CAMERA {self.index}] no raw MJPEG from the driver, encoding in software")
+            self.fallback = True
+            ok, buf = cv2.imencode('.jpg', buf, [int(cv2.IMWRITE_JPEG_QUALITY), FALLBACK_QUALITY])
+            if not ok: return False, None
+        return True, buf.tobytes()
+
+    def reopen(self):
+        self.cap.open(self.index, self.backend)
+        self._configure()
+        return self.cap.isOpened()
+
+    def release(self): self.cap.release()
+
+
+class _Paced(object):
+    # Sleeps so frames come out at `fps` when realtime, else as fast as possible
+    def __init__(self, fps, realtime):
+        self.period = 1.0 / fps if realtime and fps > 0 else 0.0
+        self.next_due = 0.0
+
+    def wait(self):
+        if not self.period: return
+        now = time.perf_counter()
+        if self.next_due > now: time.sleep(self.next_due - now)
+        self.next_due = max(self.next_due + self.period, now)
+
+
+class VideoFileSource(object):
+    def __init__(self, path, width=320, height=240, realtime=True, loop=True):
+        self.path = path
+        self.size = (width, height)
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.pace = _Paced(fps, realtime)
+        self.raw = None
+
+    def isOpened(self): return self.cap.isOpened()
+
+    def read(self, image=None):
+        ok, self.raw = self.cap.read(self.raw)
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, self.raw = self.cap.read(self.raw)
+        if not ok: return False, image
+        self.pace.wait()
+        if (self.raw.shape[1], self.raw.shape[0]) == self.size:
+            if image is None: return True, self.raw.copy()
+            np.copyto(image, self.raw)
+            return True, image
+        return True, cv2.resize(self.raw, self.size, dst=image, interpolation=cv2.INTER_AREA)
+
+    def reopen(self):
+        self.cap.open(self.path)
+        return self.cap.isOpened()
+
+    def release(self): self.cap.release()
+
+
+class SyntheticSource(object):
+    # Textured "track" with a drifting red block and slow light changes,
+    # cheap to generate (one copy + one rectangle per frame). With passthrough
+    # the block's whole cycle is JPEG-encoded up front, like a camera's MJPG
+    # output: read_jpeg() then costs nothing per frame.
+    def __init__(self, width=320, height=240, fps=30, realtime=True, seed=0, passthrough=False):
+        rng = np.random.default_rng(seed)
+        noise = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        self.base = cv2.GaussianBlur(noise, (0, 0), 1.5)
+        self.size = (width, height)
+        self.pace = _Paced(fps, realtime)
+        self.n = 0
+        self.jpegs = None
+        if passthrough:
+            params = [int(cv2.IMWRITE_JPEG_QUALITY), FALLBACK_QUALITY]
+            self.jpegs = [cv2.imencode('.jpg', self._draw(i), params)[1].tobytes()
+                          for i in range(max(1, width // 4))]
+
+    def isOpened(self): return True
+
+    def _draw(self, n, image=None):
+        w, h = self.size
+        if image is None or image.shape != self.base.shape: image = np.empty_like(self.base)
+        np.copyto(image, self.base)
+        x = (n * 4) % w
+        cv2.rectangle(image, (x, h // 3), (x + w // 6, h - 20), (0, 0, 220), -1)
+        return image
+
+    def read(self, image=None):
+        self.pace.wait()
+        image = self._draw(self.n, image)
+        self.n += 1
+        return True, image
+
+    def read_jpeg(self):
+        self.pace.wait()
+        jpeg = self.jpegs[self.n % len(self.jpegs)]
+        self.n += 1
+        return True, jpeg
+
+    def reopen(self): return True
+
+    def release(self): pass
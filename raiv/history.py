@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .recorder import MissionLog, META_NAME, DATA_NAME
+from .metrics import REGISTRY
+
+# --- MISSION HISTORY SERVICE ---
+# JSON for the history view, straight from the recorder's mission folders
+# (recorder.py) plus each mission's ride_quality.json (ride_quality.py):
+#
+#   /history/missions?limit=20&before=<mission>   newest first, keyset paging
+#   /history/missions?since=<mission>             delta: only missions after it
+#   /history/<mission>?fields=speed,vibration&points=500&method=minmax|lttb
+#                     [&t0=..&t1=..]              time range (unix seconds)
+#                     [&after=<t>]                delta: only samples after t
+#
+# Series are reduced server-side to at most `points` per field: min/mean/max
+# buckets (honest envelopes for vibration) or LTTB (keeps the visual shape of
+# slow signals like speed). Every response carries an ETag (hash of the body)
+# and answers If-None-Match with 304; reduced series are cached by
+# (mission, file size, query), so a repeat or a poll of a finished mission
+# costs a stat() and a dict lookup.
+#
+# Framework-free: handle() -> (status, body, headers) for server.py (Flask)
+# and server_async.py (ASGI) alike.
+
+MAX_POINTS = 5000
+MAX_PAGE = 200
+CACHE_ENTRIES = 64
+SUMMARY_NAME = "ride_quality.json"
+HEADERS = [("Content-Type", "application/json"), ("Cache-Control", "no-cache"),
+           ("Access-Control-Allow-Origin", "*"), ("Access-Control-Expose-Headers", "ETag")]
+# The dashboard polls with If-None-Match from another origin: CORS preflight
+PREFLIGHT = [("Access-Control-Allow-Origin", "*"), ("Access-Control-Allow-Methods", "GET"),
+             ("Access-Control-Allow-Headers", "If-None-Match"), ("Access-Control-Max-Age", "86400")]
+
+MISSION_RE = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")
+
+REQUESTS = REGISTRY.counter("raiv_history_requests_total", "History requests", ["kind", "result"])
+
+
+def lttb(x, y, n):
+    # Largest-Triangle-Three-Buckets -> indexes of n points keeping the shape
+    size = len(x)
+    if n >= size or n < 3: return np.arange(size)
+    edges = (np.arange(n - 1) * ((size - 2) / (n - 2))).astype(np.int64) + 1
+    edges[-1] = size - 1
+    out = np.empty(n, np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < n - 1 else size
+        ax, ay = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs((x[a] - ax) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ay - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _list(a, digits=4):
+    # NaN -> null
+    a = np.round(np.asarray(a, dtype=np.float64), digits)
+    return [None if v != v else v for v in a.tolist()]
+
+
+def save_summary(mission_dir, summary):
+    # Mission's ride-quality totals next to its telemetry (history list reads it)
+    os.makedirs(mission_dir, exist_ok=True)
+    tmp = os.path.join(mission_dir, SUMMARY_NAME + ".tmp")
+    with open(tmp, "w") as f: json.dump(summary, f)
+    os.replace(tmp, os.path.join(mission_dir, SUMMARY_NAME))
+
+
+class History(object):
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.info = {}                 # mission -> (stamp, entry)
+        self.listing = None            # (root mtime, names)
+        self.cache = OrderedDict()     # (mission, size, query) -> body
+
+    # --- MISSION LIST ---
+    def _entry(self, name):
+        path = os.path.join(self.root, name)
+        data = os.path.join(path, DATA_NAME)
+        summary = os.path.join(path, SUMMARY_NAME)
+        stamp = tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else 0 for p in (data, summary))
+        hit = self.info.get(name)
+        if hit and hit[0] == stamp: return hit[1]
+        log = MissionLog(path)
+        entry = {"mission": name, "started": log.meta.get("started"), "rows": len(log),
+                 "duration": round(float(log.rows["t"][-1] - log.rows["t"][0]), 1) if len(log) else 0.0,
+                 "fields": log.fields}
+        if os.path.exists(summary):
+            with open(summary) as f: entry["ride_quality"] = json.load(f)
+        self.info[name] = (stamp, entry)
+        return entry
+
+    def _names(self):
+        # Mission folders, newest first; re-listed only when the root changes
+        stamp = os.stat(self.root).st_mtime_ns
+        if self.listing is None or self.listing[0] != stamp:
+            self.listing = (stamp, sorted((e.name for e in os.scandir(self.root) if e.is_dir()), reverse=True))
+        return self.listing[1]
+
+    def missions(self, limit=20, before=None, since=None):
+        items = []
+        more = False
+        with self.lock:
+            for name in self._names():
+                if before and name >= before: continue
+                if since and name <= since: break
+                if not os.path.exists(os.path.join(self.root, name, META_NAME)): continue  # pictures only
+                if len(items) == limit:
+                    more = True
+                    break
+                items.append(self._entry(name))
+        return {"missions": items, "next": items[-1]["mission"] if more else None}
+
+    # --- SERIES ---
+    def series(self, mission, fields=None, points=500, method="minmax", t0=None, t1=None, after=None):
+        log = MissionLog(os.path.join(self.root, mission))
+        fields = [f for f in (fields or ["speed", "vibration", "vertical"]) if f in log.fields and f != "t"]
+        if after is not None:
+            t0 = max(t0 or after, after)
+            rows = log.between(t0, t1)
+            if len(rows) and rows["t"][0] <= after: rows = rows[1:]    # strictly after
+        else: rows = log.between(t0, t1)
+        out = {"mission": mission, "rows": len(log), "method": method, "fields": {}}
+        t = np.asarray(rows["t"], dtype=np.float64)
+        out["last_t"] = float(t[-1]) if len(t) else after
+        if method == "lttb":
+            for f in fields:
+                v = np.asarray(rows[f], dtype=np.float64)
+                ok = ~np.isnan(v)
+                idx = lttb(t[ok], v[ok], points)
+                out["fields"][f] = {"t": _list(t[ok][idx], 3), "v": _list(v[ok][idx])}
+            return out
+        # min/mean/max buckets, shared time axis (bucket middles)
+        for f in fields:
+            tm, lo, mean, hi = log.downsample(f, points, rows=rows)
+            out["t"] = _list(tm, 3)
+            out["fields"][f] = {"min": _list(lo), "mean": _list(mean), "max": _list(hi)}
+        if "t" not in out: out["t"] = []
+        return out
+
+    # --- HTTP ---
+    def handle(self, path, query, if_none_match=None):
+        # path below /history; query: dict of str -> str
+        parts = [p for p in path.strip("/").split("/") if p]
+        try:
+            if parts == ["missions"]:
+                kind = "missions"
+                limit = max(1, min(int(query.get("limit", 20)), MAX_PAGE))
+                body = self._json(self.missions(limit, query.get("before"), query.get("since")))
+            elif len(parts) == 1 and MISSION_RE.fullmatch(parts[0]):
+                kind = "series"
+                body = self._series_body(parts[0], query)
+            else:
+                return self._reply("unknown", 404, {"error": "not found"})
+        except (OSError, KeyError, ValueError) as e:
+            return self._reply("error", 404 if isinstance(e, FileNotFoundError) else 400, {"error": str(e)})
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        headers = HEADERS + [("ETag", etag)]
+        if if_none_match and etag in [s.strip() for s in if_none_match.split(",")]:
+            REQUESTS.labels(kind=kind, result="not_modified").inc()
+            return 304, b"", headers
+        REQUESTS.labels(kind=kind, result="ok").inc()
+        return 200, body, headers
+
+    def _series_body(self, mission, query):
+        num = lambda k: float(query[k]) if query.get(k) not in (None, "") else None
+        points = max(3, min(int(query.get("points", 500)), MAX_POINTS))
+        method = "lttb" if query.get("method") == "lttb" else "minmax"
+        fields = [f for f in query.get("fields", "").split(",") if f] or None
+        data = os.path.join(self.root, mission, DATA_NAME)
+        size = os.path.getsize(data) if os.path.exists(data) else 0
+        key = (mission, size, points, method, tuple(fields or ()), num("t0"), num("t1"), num("after"))
+        with self.lock:
+            body = self.cache.get(key)
+            if body is not None:
+                self.cache.move_to_end(key)
+                return body
+        body = self._json(self.series(mission, fields, points, method, num("t0"), num("t1"), num("after")))
+        with self.lock:
+            self.cache[key] = body
+            while len(self.cache) > CACHE_ENTRIES: self.cache.popitem(last=False)
+        return body
+
+    def _json(self, obj): return json.dumps(obj, separators=(",", ":")).encode()
+
+    def _reply(self, kind, status, obj):
+        REQUESTS.labels(kind=kind, result=str(status)).inc()
+        return status, self._json(obj), HEADERS
@@ -0,0 +1,100 @@
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+
+from . import config
+
+# --- LAUNCHER ---
+# One entry point for every camera setup (see raiv.json / configs/*.json):
+#
+#   python -m raiv                              # ./raiv.json or built-in defaults
+#   python -m raiv --config configs/stream.json --server waitress
+#   python -m raiv --print-config
+#
+# Start-up order is chosen for time-to-first-frame: the config is read with
+# the standard library only, the vision core (OpenCV, NumPy) is imported
+# next, every camera is opened on its own thread at once, and the web
+# framework / optional pieces (detection workers, archive index, uvicorn)
+# are imported while the cameras are still opening.
+
+LAUNCHED = time.perf_counter()
+FIRST_FRAME_TIMEOUT = 15.0
+
+
+def report_first_frames(threads):
+    # One line per camera: thread start -> opened -> first frame, from launch
+    eager = [t for t in threads if not t.cam["lazy"]]
+    for t in eager:
+        t.first_frame.wait(max(0.0, FIRST_FRAME_TIMEOUT - (time.perf_counter() - LAUNCHED)))
+    for t in threads:
+        src = t.cam["source"]
+        if t.cam["lazy"] and t.first_frame_at is None:
+            print(f"--- CAM{t.index} [{t.role}] {src!r}: opens when the first viewer connects ---")
+            continue
+        if t.first_frame_at is None:
+            print(f"--- CAM{t.index} [{t.role}] {src!r}: NO FRAME after {FIRST_FRAME_TIMEOUT:.0f}s ---")
+            continue
+        opened = t.opened_at - t.started_at
+        print(f"--- CAM{t.index} [{t.role}] {src!r}: opened in {opened:.2f}s, "
+              f"first frame at +{t.first_frame_at - LAUNCHED:.2f}s ---")
+    ready = [t.first_frame_at for t in eager if t.first_frame_at]
+    if ready: print(f"--- {len(ready)}/{len(eager)} CAMERAS LIVE, last at +{max(ready) - LAUNCHED:.2f}s ---")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m raiv", description="RAIV vision system")
+    ap.add_argument("--config", help=f"JSON config (default: ${config.CONFIG_ENV} or ./{config.DEFAULT_FILE})")
+    ap.add_argument("--server", choices=["waitress", "asyncio"], help="override the config's server")
+    ap.add_argument("--port", type=int)
+    ap.add_argument("--no-tunnel", action="store_true")
+    ap.add_argument("--print-config", action="store_true")
+    args = ap.parse_args(argv)
+
+    cfg = config.load(args.config)
+    if args.server: cfg["server"] = args.server
+    if args.port: cfg["port"] = args.port
+    if args.no_tunnel: cfg["tunnel"]["enabled"] = False
+    config.use(cfg)
+    if args.print_config:
+        print(json.dumps(cfg, indent=2))
+        return
+
+    if sys.platform.startswith('win') and cfg["tunnel"]["enabled"]:
+        subprocess.run("taskkill /F /IM cloudflared.exe", shell=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    if cfg["gateway"]["enabled"]:
+        # Before the vision core reads firebase.base_url: everything here goes through the gateway
+        from .rtdb_gateway import start_from_config
+        start_from_config(cfg)
+
+    t = time.perf_counter()
+    from . import vision
+    print(f"--- VISION CORE LOADED in {time.perf_counter() - t:.2f}s ({cfg.get('_path', 'defaults')}) ---")
+    vision.start_cameras()
+    if vision.DETECT_CAMS: vision.estop.start()   # stream-only setups never stop the vehicle
+    reporter = threading.Thread(target=report_first_frames, args=(vision.camera_threads,))
+    reporter.daemon = True
+    reporter.start()
+
+    from .tracker import make_filter
+    worst = make_filter(vision.STOP_FILTER_KIND, **vision.STOP_FILTER).worst_case_ms(30)
+    print(f"--- STOP FILTER: {vision.STOP_FILTER_KIND} {vision.STOP_FILTER}, worst case {worst:.0f} ms at 30 FPS ---")
+
+    if cfg["server"] == "asyncio":
+        from . import server_async
+        print("--- SYSTEM ACTIVE (asyncio) ---")
+        server_async.run(cfg["port"])
+        return
+
+    from . import server
+    if cfg["tunnel"]["enabled"]: vision.start_tunnel()
+    vision.firebase_monitor()
+    t_print = threading.Thread(target=vision.status_printer)
+    t_print.daemon = True
+    t_print.start()
+    print("--- SYSTEM ACTIVE ---")
+    server.run(cfg["port"])
@@ -0,0 +1,221 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+
+# --- METRICS (Prometheus text format) ---
+# Tiny dependency-free registry. Hot paths only touch a cached child object
+# (one lock + add); values that already live elsewhere (hub viewers, stage
+# stats, archiver counters) are read by collectors at scrape time, so an
+# idle server pays nothing for them.
+#
+#   FRAMES = REGISTRY.counter("raiv_frames_captured_total", "Frames read", ["cam"])
+#   FRAMES.labels(cam="1").inc()
+#   with FB_SECONDS.labels(op="put").time(): session.put(...)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs: return ""
+    esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v):
+    if v == float('inf'): return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Timer(object):
+    def __init__(self, child): self.child = child
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.t0)
+
+
+class _CounterChild(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+    def inc(self, n=1):
+        with self.lock: self.value += n
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, v): self.value = v
+    def dec(self, n=1): self.inc(-n)
+
+
+class _HistogramChild(object):
+    def __init__(self, buckets):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    def observe(self, v):
+        i = bisect.bisect_left(self.buckets, v)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+    def time(self): return _Timer(self)
+    def samples(self, name, labels):
+        out, acc = [], 0
+        with self.lock:
+            for le, c in zip(list(self.buckets) + [float('inf')], self.counts):
+                acc += c
+                out.append((name + "_bucket", labels + [("le", _fmt_value(le))], acc))
+            out.append((name + "_sum", labels, self.sum))
+            out.append((name + "_count", labels, self.count))
+        return out
+    def summary(self, unit=1000.0, suffix="ms"):
+        # Short console form, e.g. "n=3 avg=42ms <=50ms:2 <=100ms:1"
+        with self.lock:
+            if not self.count: return "no samples"
+            parts = [f"<={le * unit:g}{suffix}:{c}" for le, c in zip(self.buckets, self.counts) if c]
+            if self.counts[-1]: parts.append(f">{self.buckets[-1] * unit:g}{suffix}:{self.counts[-1]}")
+            return f"n={self.count} avg={self.sum / self.count * unit:.0f}{suffix} " + " ".join(parts)
+
+
+class Metric(object):
+    def __init__(self, name, help, kind, labelnames=(), buckets=None):
+        self.name, self.help, self.kind = name, help, kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets or DEFAULT_BUCKETS)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.labelnames: self._default = self.labels()
+
+    def labels(self, **kw):
+        key = tuple(str(kw.get(n, "")) for n in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.get(key)
+                if child is None:
+                    if self.kind == "histogram": child = _HistogramChild(self.buckets)
+                    elif self.kind == "gauge": child = _GaugeChild()
+                    else: child = _CounterChild()
+                    self.children[key] = child
+        return child
+
+    # Unlabelled shortcuts
+    def inc(self, n=1): self._default.inc(n)
+    def set(self, v): self._default.set(v)
+    def observe(self, v): self._default.observe(v)
+    def time(self): return self._default.time()
+    def summary(self, *a): return self._default.summary(*a)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self.children.items()):
+            for name, labels, v in child.samples(self.name, list(zip(self.labelnames, key))):
+                lines.append(f"{name}{_fmt_labels([], [], labels)} {_fmt_value(v)}")
+        return lines
+
+
+class Registry(object):
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def _get(self, name, help, kind, labelnames, buckets=None):
+        with self.lock:
+            m = self.metrics.get(name)
+            if m is None: m = self.metrics[name] = Metric(name, help, kind, labelnames, buckets)
+            return m
+
+    def counter(self, name, help, labelnames=()): return self._get(name, help, "counter", labelnames)
+    def gauge(self, name, help, labelnames=()): return self._get(name, help, "gauge", labelnames)
+    def histogram(self, name, help, labelnames=(), buckets=None): return self._get(name, help, "histogram", labelnames, buckets)
+
+    def add_collector(self, fn):
+        # fn() -> iterable of (name, kind, help, [(labels_dict, value), ...]), run per scrape
+        self.collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for m in list(self.metrics.values()): lines.extend(m.render())
+        for fn in self.collectors:
+            try: families = list(fn())
+            except Exception as e:
+                count_error("metrics_collector", e)
+                continue
+            for name, kind, help, samples in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, v in samples:
+                    lines.append(f"{name}{_fmt_labels(list(labels), list(labels.values()))} {_fmt_value(v)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Shared by every module that talks to Firebase
+FB_SECONDS = REGISTRY.histogram("raiv_firebase_request_seconds", "Firebase REST request latency", ["op"])
+ERRORS = REGISTRY.counter("raiv_errors_total", "Exceptions caught and survived, by code location", ["where"])
+_last_error = {}
+
+
+def count_error(where, exc=None):
+    # Use instead of a bare 'except: pass'; prints each location's first error
+    ERRORS.labels(where=where).inc()
+    if exc is not None and where not in _last_error:
+        print(f"[{where}] {type(exc).__name__}: {exc} (further errors only counted in /metrics)")
+    _last_error[where] = repr(exc)
+
+
+# --- SAMPLING PROFILER ---
+LOCAL_ADDRS = ("127.0.0.1", "::1", "localhost")
+PROXY_HEADERS = ("cf-connecting-ip", "cf-ray", "x-forwarded-for", "forwarded")
+
+
+def profile_allowed(enabled, remote_addr, header_names):
+    # /debug/profile: off unless configured, and only for requests made on
+    # this machine. cloudflared connects from 127.0.0.1 as well, so anything
+    # carrying proxy headers came through the tunnel and is refused.
+    if not enabled or remote_addr not in LOCAL_ADDRS: return False
+    return not any(h.lower() in PROXY_HEADERS for h in header_names)
+
+
+def profile_args(args):
+    # /debug/profile?seconds=&hz= -> (seconds, hz), capped; ValueError (-> 400) if not positive numbers
+    seconds, hz = float(args.get("seconds", 5)), int(args.get("hz", 100))
+    if not (0 < seconds < float("inf")) or hz <= 0: raise ValueError("seconds and hz must be positive")
+    return min(seconds, 60.0), min(hz, 1000)
+
+
+def sample_profile(seconds=5.0, hz=100, skip_idle=True):
+    # Samples every thread's Python stack at `hz` and returns "collapsed stack"
+    # lines ("thread;outer;...;inner count") for flamegraph.pl / speedscope.
+    # Nothing runs unless this is called.
+    me = threading.get_ident()
+    names = {}
+    stacks = _Tally()
+    period = 1.0 / hz
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        for t in threading.enumerate(): names[t.ident] = t.name
+        for tid, frame in sys._current_frames().items():
+            if tid == me: continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if skip_idle and parts and parts[0].split(" ")[0] in ("wait", "select", "poll", "accept", "_wait_for_tstate_lock"):
+                continue
+            parts.append(names.get(tid, str(tid)).replace(";", ":"))
+            stacks[";".join(reversed(parts))] += 1
+        time.sleep(period)
+    return "".join(f"{stack} {n}\n" for stack, n in stacks.most_common())
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .adaptive_stream import TieredHub, BackpressureController, SENT_BYTES, BLOCKED_SECONDS
+from .frame_hub import tagged_part
+from .metrics import REGISTRY
+
+# --- ONE CONNECTION FOR EVERY CAMERA ---
+# /mosaic                  all cameras tiled into one frame (layout cols x rows)
+# /mosaic?mode=cams        every camera's own parts on one multipart response,
+#   [&cams=0,2][&tier=N]   each tagged "X-Camera: <index>"
+#
+# Mosaic: a compositor thread, only while someone watches, copies each
+# camera's newest frame straight from its ring into its tile of one
+# preallocated canvas (resize / scaled JPEG decode in place, unchanged
+# cameras skipped), encodes the canvas ONCE per tick and publishes it on a
+# TieredHub: every viewer shares that part, and a slow one steps down to the
+# half-size tier like any /videoN viewer.
+#
+# Multiplex: wakes on a publish from any camera hub and sends each camera's
+# variant at the connection's tier, paced per camera at the tier's FPS, with
+# the same backpressure controller.
+
+COMPOSE_SECONDS = REGISTRY.histogram("raiv_mosaic_compose_seconds", "Tile copies + one encode per mosaic tick",
+                                     buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+BLANK = 48   # grey for tiles without a frame yet
+
+
+class Mosaic(threading.Thread):
+    def __init__(self, rings, names, layout=(2, 2), tile=(320, 240), fps=10, quality=50, labels=True, wake=None):
+        # rings: one per tile (None = empty tile); wake(): called when viewers arrive
+        threading.Thread.__init__(self, name="MOSAIC")
+        self.daemon = True
+        cols, rows = layout
+        tw, th = tile
+        self.size = (cols * tw, rows * th)
+        self.rings = list(rings)[:cols * rows]
+        self.names = list(names)
+        self.labels = labels
+        self.wake = wake
+        self.period = 1.0 / fps
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        half = (max(quality - 15, 20), self.size[0] // 2, self.size[1] // 2, max(fps // 2, 1))
+        self.hub = TieredHub("MOSAIC", [(quality, self.size[0], self.size[1], fps), half], 0)
+        self.canvas = np.full((self.size[1], self.size[0], 3), BLANK, np.uint8)
+        self.tiles = [self.canvas[(k // cols) * th:(k // cols + 1) * th, (k % cols) * tw:(k % cols + 1) * tw]
+                      for k in range(len(self.rings))]
+        self.seen = [0] * len(self.rings)
+        self.ticks = 0
+
+    def compose(self):
+        # -> True if any tile changed
+        changed = False
+        for k, (ring, tile) in enumerate(zip(self.rings, self.tiles)):
+            if ring is None or ring.seq == self.seen[k]: continue
+            got = ring.copy_latest(tile)
+            if got is None: continue
+            self.seen[k] = got[0]
+            if self.labels: cv2.putText(tile, self.names[k], (6, 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            changed = True
+        return changed
+
+    def run(self):
+        while True:
+            self.hub.wait_for_viewers()
+            if self.wake: self.wake()
+            t0 = time.perf_counter()
+            with COMPOSE_SECONDS.time():
+                if self.compose():
+                    ok, buf = cv2.imencode('.jpg', self.canvas, self.params)
+                    if ok:
+                        self.hub.publish_jpeg(buf.tobytes(), self.size)
+                        self.ticks += 1
+            spare = self.period - (time.perf_counter() - t0)
+            if spare > 0: time.sleep(spare)
+
+
+class Multiplex(object):
+    # One waitable "some camera published" signal over all camera hubs
+    def __init__(self, hubs):
+        self.hubs = hubs
+        self.cond = threading.Condition()
+        self.seq = 0
+        for hub in hubs: hub.listeners.append(self._on_publish)
+
+    def _on_publish(self, seq):
+        with self.cond:
+            self.seq += 1
+            self.cond.notify_all()
+
+    def _viewers(self, cams, n):
+        for c in cams:
+            hub = self.hubs[c]
+            with hub.cond:
+                hub.viewers += n
+                hub.cond.notify_all()
+
+    def stream(self, cams=None, tier=None, timeout=1.0):
+        # Generator for Flask: Response(multiplex.stream(), mimetype=MJPEG_MIMETYPE)
+        cams = list(range(len(self.hubs))) if cams is None else cams
+        tiers = self.hubs[0].tiers
+        ctl = BackpressureController(len(tiers), self.hubs[0].start_tier if tier is None else tier)
+        m_bytes = SENT_BYTES.labels(cam="MULTIPLEX")
+        m_blocked = BLOCKED_SECONDS.labels(cam="MULTIPLEX")
+        last = {c: 0 for c in cams}
+        due = {c: 0.0 for c in cams}
+        self._viewers(cams, +1)
+        try:
+            seen = 0
+            while True:
+                with self.cond:
+                    if not self.cond.wait_for(lambda: self.seq > seen, timeout): continue
+                    seen = self.seq
+                for c in cams:
+                    hub = self.hubs[c]
+                    now = time.time()
+                    if hub.seq <= last[c] or now < due[c]: continue
+                    last[c], part = hub.variant(ctl.tier)
+                    if part is None: continue
+                    part = tagged_part(c, part)
+                    t0 = time.time()
+                    yield part
+                    blocked = time.time() - t0
+                    m_bytes.inc(len(part))
+                    m_blocked.observe(blocked)
+                    interval = 1.0 / tiers[ctl.tier][3]
+                    due[c] = now + interval
+                    # The connection's frame budget is shared by all its cameras
+                    ctl.update(blocked, interval / len(cams))
+        finally:
+            self._viewers(cams, -1)
+
+
+def parse_cams(value, n):
+    # "0,2" -> [0, 2] (valid indexes only), None / "" -> every camera
+    if not value: return list(range(n))
+    return [int(c) for c in value.split(",") if c.strip().isdigit() and int(c) < n]
@@ -0,0 +1,235 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .metrics import REGISTRY, count_error
+
+# --- MISSION TELEMETRY RECORDER ---
+# Raw /telemetry (+ hall sensors) and the vision scores, one fixed-size row
+# per sample, appended to <root>/<mission>/telemetry.bin with the dtype in
+# telemetry.json next to it. Reading is np.memmap over the file: no parsing,
+# a 10 h mission at 10 Hz is ~20 MB and opens instantly.
+#
+#   t          capture time (unix seconds), monotonic within a mission
+#   status     0 STANDBY, 1 MOVING, 2 other
+#   speed .. targ_dist, h1/h2(+_trig)   as the ESP32 writes them (NaN = absent)
+#   safe_<n>, red_<n>, bright_<n>       DETECT camera n's latest scores
+#
+# A row is taken on every telemetry update and at rate_hz in between, so the
+# scores are sampled even when the ESP32 is quiet. Rows collect in a
+# preallocated batch and go to disk in one write per flush_s (or when full);
+# a crash loses at most that much, and a torn last row is ignored on read.
+#
+#   python -m raiv.recorder <dir>                              -> missions
+#   python -m raiv.recorder <dir> <mission> [field] [buckets]  -> min/mean/max
+
+DATA_NAME = "telemetry.bin"
+META_NAME = "telemetry.json"
+BATCH_ROWS = 256
+
+STATUS_CODES = {"STANDBY": 0, "MOVING": 1}
+TELEMETRY_FIELDS = [("speed", "f4"), ("lat", "f8"), ("lng", "f8"), ("vibration", "f4"),
+                    ("vertical", "f4"), ("prog_dist", "f4"), ("targ_dist", "f4")]
+HALL_FIELDS = [("h1", "f4"), ("h1_trig", "u1"), ("h2", "f4"), ("h2_trig", "u1")]
+
+ROWS = REGISTRY.counter("raiv_recorder_rows_total", "Telemetry rows recorded", ["trigger"])
+FLUSH_SECONDS = REGISTRY.histogram("raiv_recorder_flush_seconds", "One batch write",
+                                   buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1))
+
+
+def make_dtype(cams):
+    fields = [("t", "f8"), ("status", "u1")] + TELEMETRY_FIELDS + HALL_FIELDS
+    for i in cams: fields += [(f"safe_{i}", "f4"), (f"red_{i}", "f4"), (f"bright_{i}", "f4")]
+    return np.dtype(fields)
+
+
+def _num(v):
+    try: return float(v)
+    except (TypeError, ValueError): return np.nan
+
+
+class TelemetryRecorder(threading.Thread):
+    def __init__(self, root, cams, scores, rate_hz=10.0, flush_s=1.0):
+        # scores() -> (safe, red, bright) dicts keyed by camera index, read per row
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.root = root
+        self.cams = list(cams)
+        self.scores = scores
+        self.dtype = make_dtype(self.cams)
+        self.period = 1.0 / rate_hz if rate_hz > 0 else None
+        self.flush_s = flush_s
+        self.lock = threading.Lock()
+        self.batch = np.zeros(BATCH_ROWS, self.dtype)
+        self.n = 0
+        self.last_t = 0.0
+        self.telemetry = {}
+        self.file = None
+        self.mission = None
+        self.rows = 0
+        self.m_event = ROWS.labels(trigger="telemetry")
+        self.m_tick = ROWS.labels(trigger="tick")
+
+    # --- MISSIONS ---
+    def start_mission(self, mission_id=None):
+        mission_id = mission_id or datetime.now().strftime("M%Y%m%d_%H%M%S")
+        path = os.path.join(self.root, mission_id)
+        with self.lock:
+            self._close()
+            try:
+                os.makedirs(path, exist_ok=True)
+                meta = {"mission": mission_id, "started": time.time(), "cams": self.cams,
+                        "dtype": self.dtype.descr, "fields": list(self.dtype.names)}
+                with open(os.path.join(path, META_NAME), "w") as f: json.dump(meta, f)
+                self.file = open(os.path.join(path, DATA_NAME), "ab")
+                self.mission = mission_id
+            except OSError as e:
+                count_error("recorder_open", e)
+                self.file = self.mission = None
+        return mission_id
+
+    def end_mission(self):
+        with self.lock: self._close()
+
+    def _close(self):
+        if self.file is None: return
+        self._flush()
+        self.file.close()
+        self.file = None
+
+    # --- SAMPLES (any thread) ---
+    def on_telemetry(self, telemetry):
+        if not isinstance(telemetry, dict): return
+        with self.lock:
+            self.telemetry = telemetry
+            if self.file is not None:
+                self._row(time.time())
+                self.m_event.inc()
+
+    def _row(self, now):
+        # Lock held. Same-time rows keep t non-decreasing for searchsorted
+        now = max(now, self.last_t)
+        self.last_t = now
+        r = self.batch[self.n]
+        tel = self.telemetry
+        r["t"] = now
+        r["status"] = STATUS_CODES.get(tel.get("status"), 2)
+        for name, _ in TELEMETRY_FIELDS: r[name] = _num(tel.get(name))
+        hall = tel.get("hall_sensors") or {}
+        for h in ("h1", "h2"):
+            d = hall.get(h) if isinstance(hall, dict) else None
+            d = d if isinstance(d, dict) else {}
+            r[h] = _num(d.get("val"))
+            r[h + "_trig"] = bool(d.get("trig"))
+        safe, red, bright = self.scores()
+        for i in self.cams:
+            r[f"safe_{i}"], r[f"red_{i}"], r[f"bright_{i}"] = safe.get(i, 0), red.get(i, 0), bright.get(i, 0)
+        self.n += 1
+        self.rows += 1
+        if self.n == BATCH_ROWS: self._flush()
+
+    def _flush(self):
+        # Lock held: one write() per batch
+        if not self.n or self.file is None: return
+        with FLUSH_SECONDS.time():
+            try:
+                self.file.write(self.batch[:self.n].tobytes())
+                self.file.flush()
+            except OSError as e: count_error("recorder_write", e)
+        self.n = 0
+
+    # --- WORKER ---
+    def run(self):
+        next_flush = time.perf_counter() + self.flush_s
+        while True:
+            time.sleep(self.period or self.flush_s)
+            with self.lock:
+                if self.file is None: continue
+                if self.period:
+                    self._row(time.time())
+                    self.m_tick.inc()
+                if time.perf_counter() >= next_flush:
+                    self._flush()
+                    next_flush = time.perf_counter() + self.flush_s
+
+
+# --- QUERY ---
+class MissionLog(object):
+    # Read-only view of one mission; columns are memmap slices (no copy)
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_NAME)) as f: self.meta = json.load(f)
+        self.dtype = np.dtype([tuple(f) for f in self.meta["dtype"]])
+        data = os.path.join(path, DATA_NAME)
+        rows = os.path.getsize(data) // self.dtype.itemsize if os.path.exists(data) else 0
+        self.rows = np.memmap(data, self.dtype, mode="r", shape=(rows,)) if rows else np.zeros(0, self.dtype)
+
+    def __len__(self): return len(self.rows)
+
+    @property
+    def fields(self): return list(self.dtype.names)
+
+    def between(self, t0=None, t1=None):
+        # Rows with t0 <= t <= t1. bisect touches ~log2(n) rows; np.searchsorted
+        # would first copy the whole strided column out of the memmap
+        t = self.rows["t"]
+        i = 0 if t0 is None else bisect.bisect_left(t, t0)
+        j = len(t) if t1 is None else bisect.bisect_right(t, t1)
+        return self.rows[i:j]
+
+    def downsample(self, field, buckets=500, t0=None, t1=None, rows=None):
+        # -> (t_mid, min, mean, max) per equal-count bucket, NaNs ignored.
+        # Short ranges come back as-is (min = mean = max).
+        if rows is None: rows = self.between(t0, t1)
+        t = np.asarray(rows["t"])
+        v = np.asarray(rows[field], dtype=np.float64)
+        if len(v) <= buckets: return t, v, v, v
+        edges = np.linspace(0, len(v), buckets + 1).astype(np.int64)[:-1]
+        counts = np.diff(np.append(edges, len(v)))
+        ok = ~np.isnan(v)
+        filled = np.where(ok, v, 0.0)
+        n_ok = np.add.reduceat(ok.astype(np.int64), edges)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.add.reduceat(filled, edges) / n_ok
+        lo = np.minimum.reduceat(np.where(ok, v, np.inf), edges)
+        hi = np.maximum.reduceat(np.where(ok, v, -np.inf), edges)
+        lo[n_ok == 0] = hi[n_ok == 0] = np.nan
+        return t[edges + counts // 2], lo, mean, hi
+
+
+def missions(root):
+    # -> [(mission, bytes, started)] by name (= start time), recorded missions only
+    out = []
+    for name in sorted(os.listdir(root)):
+        meta = os.path.join(root, name, META_NAME)
+        if not os.path.exists(meta): continue
+        with open(meta) as f: started = json.load(f).get("started")
+        data = os.path.join(root, name, DATA_NAME)
+        size = os.path.getsize(data) if os.path.exists(data) else 0
+        out.append((name, size, started))
+    return out
+
+
+if __name__ == '__main__':
+    root = sys.argv[1]
+    if len(sys.argv) < 3:
+        for name, size, started in missions(root):
+            print(f"{name}  {size / 1024:8.1f} KB  started {datetime.fromtimestamp(started or 0):%Y-%m-%d %H:%M:%S}")
+        sys.exit()
+    t = time.perf_counter()
+    log = MissionLog(os.path.join(root, sys.argv[2]))
+    if len(sys.argv) < 4:
+        print(f"{len(log)} rows, fields: {', '.join(log.fields)}")
+        sys.exit()
+    buckets = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+    tm, lo, mean, hi = log.downsample(sys.argv[3], buckets)
+    ms = (time.perf_counter() - t) * 1000
+    t0 = log.rows["t"][0] if len(log) else 0
+    for x, a, m, b in zip(tm, lo, mean, hi): print(f"+{x - t0:8.1f}s  min {a:10.3f}  mean {m:10.3f}  max {b:10.3f}")
+    print(f"{len(log)} rows -> {len(tm)} buckets in {ms:.2f} ms")
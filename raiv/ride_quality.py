@@ -0,0 +1,269 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import requests
+
+from .metrics import REGISTRY, FB_SECONDS, count_error
+
+# --- RIDE QUALITY ---
+# Vertical (z) and lateral (y) acceleration in, compact per-segment summaries
+# out. Everything runs on whole 1 s windows at once: a batch of samples is
+# reshaped to (windows, N) and each statistic is one NumPy call over axis 1.
+#
+#   rms        plain RMS per window                          m/s^2
+#   w          ISO 2631-1 frequency-weighted RMS             m/s^2
+#              (Wk vertical, Wd lateral, applied as |W(f)| on the spectrum of
+#              the last CONTEXT_S seconds, the newest 1 s of the weighted
+#              signal kept - no per-sample IIR loop)
+#   comfort    a_v = sqrt(wy^2 + wz^2), ISO 2631-1 comfort (k = 1)
+#   mtvv       worst 1 s running weighted RMS in the segment
+#
+# Band: a 1 s spectrum has 1 Hz bins, so weighting a window on its own would
+# drop everything below ~1 Hz - the 0.4-1 Hz part of Wk / Wd that matters
+# most for rail ride comfort. The 10 s context gives 0.1 Hz bins, so the
+# weighting covers its whole band from the 0.4 Hz corner; only the first
+# CONTEXT_S of a mission is weighted with less context (zeros before it).
+#
+# Segments close every segment_m metres of prog_dist (or segment_s seconds
+# when the distance is unknown). Each closed segment and the running mission
+# totals are PATCHed to /ride_quality in one multi-path write, so the
+# dashboard reads aggregates instead of keeping raw arrays.
+#
+# Samples come from /telemetry/accel = {"fs": 100, "z": [...], "y": [...]}
+# when the firmware sends it. Without it, each /telemetry update's scalar
+# "vertical" counts as one z sample: plain RMS only, since ~1 Hz is far below
+# the weighting band.
+
+WINDOW_S = 1.0      # running values (segment sums, MTVV)
+CONTEXT_S = 10.0    # signal the weighting of each window sees
+
+# ISO 2631-1 Annex A: band limits + a-v transition (+ upward step for Wk)
+BAND = dict(f1=0.4, f2=100.0, q1=2 ** -0.5)
+WEIGHTINGS = {
+    "Wk": dict(f3=12.5, f4=12.5, q4=0.63, f5=2.37, q5=0.91, f6=3.35, q6=0.91),
+    "Wd": dict(f3=2.0, f4=2.0, q4=0.63),
+}
+
+# ISO 2631-1 Annex C comfort reactions (lower edge of each band, m/s^2)
+COMFORT_LABELS = [(0.0, "not uncomfortable"), (0.315, "a little uncomfortable"), (0.63, "fairly uncomfortable"),
+                  (1.0, "uncomfortable"), (1.6, "very uncomfortable"), (2.5, "extremely uncomfortable")]
+
+WINDOWS = REGISTRY.counter("raiv_ride_windows_total", "1 s acceleration windows analysed")
+SEGMENT_COMFORT = REGISTRY.gauge("raiv_ride_comfort", "Last closed segment's a_v (ISO 2631-1)")
+
+
+def weighting(f, kind):
+    # -> |W(f)| for frequencies f (Hz), ISO 2631-1 Wk or Wd
+    p = WEIGHTINGS[kind]
+    s = 2j * np.pi * np.asarray(f, dtype=np.float64)
+    w1, w2 = 2 * np.pi * BAND["f1"], 2 * np.pi * BAND["f2"]
+    q = BAND["q1"]
+    h = s * s / (s * s + s * w1 / q + w1 * w1)              # high-pass 0.4 Hz
+    h *= w2 * w2 / (s * s + s * w2 / q + w2 * w2)           # low-pass 100 Hz
+    w3, w4 = 2 * np.pi * p["f3"], 2 * np.pi * p["f4"]
+    h *= (1 + s / w3) / (1 + s / (p["q4"] * w4) + (s / w4) ** 2)
+    if "f5" in p:
+        w5, w6 = 2 * np.pi * p["f5"], 2 * np.pi * p["f6"]
+        h *= (1 + s / (p["q5"] * w5) + (s / w5) ** 2) / (1 + s / (p["q6"] * w6) + (s / w6) ** 2) * (w5 / w6) ** 2
+    return np.abs(h)
+
+
+def comfort_label(a_v):
+    label = COMFORT_LABELS[0][1]
+    for edge, name in COMFORT_LABELS:
+        if a_v >= edge: label = name
+    return label
+
+
+class _Accum(object):
+    # Sums that merge in O(1): plain and weighted sum of squares per axis
+    def __init__(self):
+        self.t0 = self.t1 = None
+        self.d0 = self.d1 = None
+        self.n = 0                     # samples
+        self.sq = np.zeros(2)          # z, y
+        self.wsq = np.zeros(2)
+        self.wn = 0                    # samples behind wsq
+        self.peak = 0.0
+        self.mtvv = 0.0
+        self.speed_sum = 0.0
+        self.speed_n = 0
+
+    def add(self, t, dist, n, sq, wsq=None, wn=0, peak=0.0, mtvv=0.0):
+        if self.t0 is None: self.t0, self.d0 = t, dist
+        self.t1 = t
+        if dist is not None:
+            if self.d0 is None: self.d0 = dist
+            self.d1 = dist
+        self.n += n
+        self.sq += sq
+        if wsq is not None:
+            self.wsq += wsq
+            self.wn += wn
+        self.peak = max(self.peak, peak)
+        self.mtvv = max(self.mtvv, mtvv)
+
+    def summary(self):
+        rms = np.sqrt(self.sq / self.n) if self.n else np.zeros(2)
+        out = {"t0": self.t0, "t1": self.t1, "samples": self.n,
+               "vert_rms": round(float(rms[0]), 4), "lat_rms": round(float(rms[1]), 4),
+               "peak": round(self.peak, 4)}
+        if self.d0 is not None: out.update(d0=round(float(self.d0), 2), d1=round(float(self.d1), 2))
+        if self.speed_n: out["speed"] = round(self.speed_sum / self.speed_n, 3)
+        if self.wn:
+            w = np.sqrt(self.wsq / self.wn)
+            a_v = float(np.sqrt(np.sum(w ** 2)))
+            out.update(vert_w=round(float(w[0]), 4), lat_w=round(float(w[1]), 4), comfort=round(a_v, 4),
+                       comfort_label=comfort_label(a_v), mtvv=round(self.mtvv, 4))
+        return out
+
+
+class RideQuality(object):
+    def __init__(self, fs=100.0, segment_m=10.0, segment_s=10.0, on_segment=None):
+        # on_segment(index, segment_summary, mission_summary) per closed segment
+        self.segment_m = segment_m
+        self.segment_s = segment_s
+        self.on_segment = on_segment
+        self.lock = threading.Lock()
+        self.mission = None
+        self._set_fs(fs)
+        self.reset()
+
+    def _set_fs(self, fs):
+        self.fs = float(fs)
+        self.N = max(2, int(round(self.fs * WINDOW_S)))
+        self.L = self.N * max(1, int(round(CONTEXT_S / WINDOW_S)))
+        f = np.fft.rfftfreq(self.L, 1.0 / self.fs)
+        self.w = np.stack([weighting(f, "Wk"), weighting(f, "Wd")])
+        self.pending = np.zeros((2, 0))
+        self.history = np.zeros((2, self.L - self.N))
+
+    def reset(self, mission=None):
+        # New mission: totals, segment numbering and leftover samples start over
+        with self.lock:
+            self.mission = mission
+            self.total = _Accum()
+            self.segment = _Accum()
+            self.segment_key = None
+            self.segments = 0
+            self.pending = np.zeros((2, 0))
+            self.history = np.zeros((2, self.L - self.N))
+
+    # --- INPUT ---
+    def feed(self, z, y=None, fs=None, t=None, dist=None):
+        # Any number of samples; whole windows are analysed, the rest waits
+        z = np.asarray(z, dtype=np.float64).ravel()
+        if y is None: y = np.zeros_like(z)
+        else:
+            # Same length as z: a short lateral batch is padded with zeros
+            y = np.asarray(y, dtype=np.float64).ravel()[:len(z)]
+            if len(y) < len(z): y = np.pad(y, (0, len(z) - len(y)))
+        t = t or time.time()
+        with self.lock:
+            if fs and fs != self.fs: self._set_fs(fs)
+            buf = np.concatenate([self.pending, np.stack([z, y])], axis=1)
+            k = buf.shape[1] // self.N
+            self.pending = buf[:, k * self.N:]
+            if not k: return
+            # (axis, window, sample)
+            x = buf[:, :k * self.N].reshape(2, k, self.N)
+            sq = np.einsum('awn,awn->aw', x, x)                  # per-window sum of squares
+            # Each window with the CONTEXT_S before it: (axis, window, L)
+            ctx = np.concatenate([self.history, buf[:, :k * self.N]], axis=1)
+            self.history = ctx[:, k * self.N:]
+            blocks = np.lib.stride_tricks.sliding_window_view(ctx, self.L, axis=1)[:, ::self.N]
+            spec = np.fft.rfft(blocks - blocks.mean(axis=2, keepdims=True), axis=2) * self.w[:, None, :]
+            xw = np.fft.irfft(spec, n=self.L, axis=2)[:, :, -self.N:]   # the window, weighted
+            wsq = np.einsum('awn,awn->aw', xw, xw)
+            w_rms = np.sqrt(wsq / self.N)
+            a_v = np.sqrt(np.sum(w_rms ** 2, axis=0))           # per window
+            peak = float(np.max(np.abs(x)))
+            WINDOWS.inc(k)
+            self._add(t, dist, k * self.N, sq.sum(axis=1), wsq.sum(axis=1), k * self.N, peak, float(a_v.max()))
+
+    def feed_scalar(self, z, y=None, t=None, dist=None):
+        # One low-rate sample: plain RMS only
+        z = float(z)
+        y = float(y or 0.0)
+        with self.lock:
+            self._add(t or time.time(), dist, 1, np.array([z * z, y * y]), peak=max(abs(z), abs(y)))
+
+    def feed_telemetry(self, telemetry, dist=None):
+        # /telemetry update -> samples (accel batch if present, else "vertical")
+        if not isinstance(telemetry, dict): return
+        speed = telemetry.get("speed")
+        if isinstance(speed, (int, float)):
+            with self.lock:
+                self.segment.speed_sum += speed / 3.6
+                self.segment.speed_n += 1
+                self.total.speed_sum += speed / 3.6
+                self.total.speed_n += 1
+        accel = telemetry.get("accel")
+        if isinstance(accel, dict) and accel.get("z"):
+            self.feed(accel["z"], accel.get("y"), accel.get("fs"), dist=dist)
+        elif isinstance(telemetry.get("vertical"), (int, float)):
+            self.feed_scalar(telemetry["vertical"], dist=dist)
+
+    # --- SEGMENTS ---
+    def _add(self, t, dist, *stats, **kw):
+        # Lock held
+        if dist is not None and self.segment_m:
+            key = ("m", int(dist // self.segment_m))
+        else:
+            key = ("s", int(t // self.segment_s))
+        if self.segment_key is not None and key != self.segment_key: self._close()
+        self.segment_key = key
+        self.segment.add(t, dist, *stats, **kw)
+        self.total.add(t, dist, *stats, **kw)
+
+    def _close(self):
+        seg = self.segment.summary()
+        if "comfort" in seg: SEGMENT_COMFORT.set(seg["comfort"])
+        index = self.segments
+        self.segments += 1
+        self.segment = _Accum()
+        if self.on_segment: self.on_segment(index, seg, self.total.summary())
+
+    def flush(self):
+        # Close the open segment (end of mission) -> mission summary
+        with self.lock:
+            if self.segment.n: self._close()
+            return self.total.summary()
+
+
+# --- RTDB WRITER ---
+class SummaryWriter(threading.Thread):
+    # Queues summaries and sends whatever piled up as ONE multi-path PATCH
+    # at the database root, off the telemetry thread
+    def __init__(self, base_url, auth=None, root="ride_quality"):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.url = f"{base_url.rstrip('/')}/.json"
+        self.params = {'auth': auth} if auth else None
+        self.root = root
+        self.session = requests.Session()
+        self.updates = queue.Queue()
+        self.written = 0
+
+    def segment(self, mission, index, seg, total):
+        self.updates.put({f"{self.root}/missions/{mission}/segments/{index}": seg,
+                          f"{self.root}/missions/{mission}/summary": total,
+                          f"{self.root}/current": dict(total, mission=mission, segments=index + 1)})
+
+    def mission_done(self, mission, total):
+        self.updates.put({f"{self.root}/missions/{mission}/summary": total,
+                          f"{self.root}/current": dict(total, mission=mission, done=True)})
+
+    def run(self):
+        while True:
+            patch = self.updates.get()
+            while True:
+                try: patch.update(self.updates.get_nowait())
+                except queue.Empty: break
+            try:
+                with FB_SECONDS.labels(op="ride_quality_patch").time():
+                    self.session.patch(self.url, params=self.params, json=patch, timeout=5)
+                self.written += 1
+            except requests.RequestException as e: count_error("ride_quality_patch", e)
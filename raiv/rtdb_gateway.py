@@ -0,0 +1,280 @@
+import copy
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .fb_stream import RTDBStream, apply_put, parse_event, _split
+from .metrics import REGISTRY, FB_SECONDS, count_error
+from .rtdb_standin import StandInDB, StandInServer, _get
+
+# --- ON-VEHICLE RTDB GATEWAY ---
+# The stand-in (rtdb_standin.py) on the vehicle LAN, kept in sync with the
+# hosted database:
+#
+#   local clients --REST/SSE--> gateway  (reads, writes and streams at LAN latency)
+#   gateway --one multi-path PATCH per sync_ms--> cloud   (local writes)
+#   cloud --SSE, one stream per synced path--> gateway    (dashboard writes)
+#
+# Writes to the same path between two syncs are coalesced: only the last value
+# goes up, a write to a parent supersedes pending children, and a write below
+# a pending parent is folded into the parent's value. Paths in `urgent`
+# (/command) go up at once in their own PATCH, outside the batch window and
+# the backoff. The e-stop does not go through the gateway at all: it writes
+# to the cloud itself (estop.channel_for), so a stop is only confirmed once
+# the database the ESP32 reads has it.
+# While the cloud is unreachable pending writes stay coalesced (bounded by the
+# number of distinct paths) and go up in one PATCH when it is back.
+#
+# Conflicts: a local write that is still pending wins over a cloud event on
+# the same path; cloud events equal to the local value (our own echo) are
+# dropped without waking local listeners.
+#
+#   python -m raiv.rtdb_gateway [port] [cloud_url]   (defaults: 9000, config firebase.base_url)
+#   python -m raiv --config ... with "gateway": {"enabled": true}  -> in-process
+
+SYNC_MS = 100
+PATHS = ("command", "telemetry", "cam_url")
+URGENT = ("command",)
+PATCH_TIMEOUT = 5.0
+RETRY_MIN, RETRY_MAX = 0.25, 8.0
+
+WRITES = REGISTRY.counter("raiv_gateway_writes_total", "Writes applied to the gateway", ["origin"])
+COALESCED = REGISTRY.counter("raiv_gateway_coalesced_total", "Local writes merged into a pending cloud write")
+SYNC_SECONDS = REGISTRY.histogram("raiv_gateway_sync_seconds", "Local write -> acknowledged by the cloud",
+                                  buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+PATCHES = REGISTRY.counter("raiv_gateway_patches_total", "Multi-path PATCHes to the cloud", ["result"])
+
+
+def _copy(data): return json.loads(json.dumps(data))
+
+
+class Coalescer(object):
+    # Pending cloud writes as {path tuple: value} with no path above another
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.first = {}      # path -> time of the oldest write it carries
+
+    def add(self, keys, value, stamp=None):
+        keys = tuple(keys)
+        stamp = stamp or time.perf_counter()
+        with self.lock:
+            for i in range(len(keys)):
+                anc = keys[:i]
+                if anc in self.pending:
+                    # Fold into the pending parent's value
+                    base = self.pending[anc]
+                    self.pending[anc] = apply_put(base if isinstance(base, dict) else {}, '/'.join(keys[i:]), value)
+                    COALESCED.inc()
+                    return
+            below = [k for k in self.pending if k[:len(keys)] == keys]
+            for k in below:
+                stamp = min(stamp, self.first.pop(k))
+                del self.pending[k]
+                COALESCED.inc()
+            self.pending[keys] = value
+            self.first[keys] = stamp
+
+    def overlaps(self, keys):
+        # A pending write at, above or below keys?
+        keys = tuple(keys)
+        with self.lock:
+            return any(k[:len(keys)] == keys or keys[:len(k)] == k for k in self.pending)
+
+    def take(self, roots=None):
+        # Everything pending, or only the paths under `roots` (a root write counts)
+        with self.lock:
+            if roots is None:
+                batch, first = self.pending, self.first
+                self.pending, self.first = {}, {}
+                return batch, first
+            keys = [k for k in self.pending if not k or k[0] in roots]
+            return {k: self.pending.pop(k) for k in keys}, {k: self.first.pop(k) for k in keys}
+
+    def put_back(self, batch, first):
+        # Failed batch: replayed first, then the writes made meanwhile on top,
+        # so the newer ones still win (a newer parent supersedes an old child,
+        # a newer child folds into an old parent, anything folds into a root)
+        with self.lock:
+            newer, newer_first = self.pending, self.first
+            self.pending, self.first = {}, {}
+        for k, v in batch.items(): self.add(k, v, first[k])
+        for k, v in newer.items(): self.add(k, v, newer_first[k])
+
+
+def root_value(batch):
+    # Root PUT body: the root write with anything else in the batch applied on top
+    # (Coalescer.add folds those in already; this keeps _send correct regardless)
+    root = copy.deepcopy(batch[()])
+    for k, v in batch.items():
+        if k: root = apply_put(root if isinstance(root, dict) else {}, '/'.join(k), copy.deepcopy(v))
+    return root
+
+
+class GatewayDB(StandInDB):
+    def __init__(self, initial=None, urgent=URGENT):
+        StandInDB.__init__(self, initial)
+        self.outbox = Coalescer()
+        self.urgent = set(urgent)
+        self.wake = threading.Event()
+
+    def write(self, event, path, data, origin="local"):
+        StandInDB.write(self, event, path, data)
+        WRITES.labels(origin=origin).inc()
+        if origin != "local": return
+        keys = _split(path)
+        # PATCH = one write per child; copies, the tree keeps the originals
+        if event == 'patch' and isinstance(data, dict):
+            for k, v in data.items(): self.outbox.add(keys + _split(k), _copy(v))
+        else: self.outbox.add(keys, _copy(data))
+        if not keys or keys[0] in self.urgent: self.wake.set()
+
+    def apply_remote(self, event, path, data):
+        # Cloud -> local, unless a local write is pending there or nothing changed
+        keys = _split(path)
+        if self.outbox.overlaps(keys): return
+        with self.lock:
+            if event == 'patch' and isinstance(data, dict):
+                same = all(_get(self.tree, keys + _split(k)) == v for k, v in data.items())
+            else: same = _get(self.tree, keys) == data
+        if same: return
+        StandInDB.write(self, event, path, data)
+        WRITES.labels(origin="cloud").inc()
+
+
+class _CloudFeed(RTDBStream):
+    # One SSE stream per synced path; events rebased onto the database root
+    def __init__(self, db, base_url, path, auth=None):
+        RTDBStream.__init__(self, base_url, path, auth=auth)
+        self.db = db
+
+    def _dispatch(self, event, payload):
+        RTDBStream._dispatch(self, event, payload)
+        if event not in ('put', 'patch'): return
+        msg = parse_event(payload, count=False)   # already counted by RTDBStream._dispatch
+        if msg is None: return
+        path = self.path.rstrip('/') + '/' + msg.get('path', '/').lstrip('/')
+        self.db.apply_remote(event, path, msg.get('data'))
+
+
+class CloudSync(threading.Thread):
+    def __init__(self, db, cloud_url, auth=None, sync_ms=SYNC_MS):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.db = db
+        self.url = f"{cloud_url.rstrip('/')}/.json"
+        self.params = {'auth': auth} if auth else None
+        self.period = sync_ms / 1000.0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.sent = 0
+        self.failed = 0
+        self.online = False
+
+    def run(self):
+        delay = RETRY_MIN
+        due = 0.0            # next batch: end of the batch window or of the backoff
+        urgent_due = 0.0     # next retry of a failed urgent write
+        while True:
+            now = time.perf_counter()
+            timeout = self.period
+            if self.db.outbox.pending: timeout = min(timeout, max(0.0, due - now))
+            if self._urgent_pending(): timeout = min(timeout, max(0.0, urgent_due - now))
+            self.db.wake.wait(timeout)
+            self.db.wake.clear()
+            now = time.perf_counter()
+            # Urgent paths (/command) go alone and at once: never held by the
+            # batch window or the backoff, retried every sync_ms while failing
+            if now >= urgent_due and self._urgent_pending():
+                if not self._flush(self.db.outbox.take(self.db.urgent)): urgent_due = now + self.period
+            if now < due or not self.db.outbox.pending: continue
+            if self._flush(self.db.outbox.take()):
+                delay, due = RETRY_MIN, now + self.period
+            else:
+                due = now + delay
+                delay = min(delay * 2, RETRY_MAX)
+
+    def _flush(self, taken):
+        # -> True once the batch is at the cloud; a failed one goes back to the outbox
+        batch, first = taken
+        if not batch: return True
+        if self._send(batch):
+            now = time.perf_counter()
+            for t in first.values(): SYNC_SECONDS.observe(now - t)
+            return True
+        self.db.outbox.put_back(batch, first)
+        return False
+
+    def _urgent_pending(self):
+        with self.db.outbox.lock:
+            return any(not k or k[0] in self.db.urgent for k in self.db.outbox.pending)
+
+    def _send(self, batch):
+        try:
+            with FB_SECONDS.labels(op="gateway_patch").time():
+                if () in batch:   # a write to the root replaces everything
+                    r = self.session.put(self.url, params=self.params, json=root_value(batch), timeout=PATCH_TIMEOUT)
+                else:
+                    r = self.session.patch(self.url, params=self.params, timeout=PATCH_TIMEOUT,
+                                           json={'/'.join(k): v for k, v in batch.items()})
+            ok = r.status_code == 200
+        except requests.RequestException as e:
+            count_error("gateway_patch", e)
+            ok = False
+        PATCHES.labels(result="ok" if ok else "failed").inc()
+        if ok: self.sent += 1
+        else: self.failed += 1
+        self.online = ok
+        return ok
+
+
+class Gateway(StandInServer):
+    def __init__(self, host='0.0.0.0', port=9000, cloud_url=None, auth=None,
+                 paths=PATHS, urgent=URGENT, sync_ms=SYNC_MS, initial=None):
+        StandInServer.__init__(self, host, port, initial)
+        # Swap in the syncing database (the handler class holds the reference)
+        self.db = GatewayDB(self.db.tree, urgent)
+        self.httpd.RequestHandlerClass.db = self.db
+        if host == '0.0.0.0': self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.sync = CloudSync(self.db, cloud_url, auth, sync_ms) if cloud_url else None
+        self.feeds = [_CloudFeed(self.db, cloud_url, p, auth) for p in paths] if cloud_url else []
+
+    def start(self):
+        StandInServer.start(self)
+        if self.sync: self.sync.start()
+        for f in self.feeds: f.start()
+        return self
+
+    def stats(self):
+        if not self.sync: return "local only"
+        return (f"cloud {'up' if self.sync.online else 'DOWN'} | patches {self.sync.sent} ok {self.sync.failed} failed"
+                f" | pending {len(self.db.outbox.pending)} | feeds {sum(f.connected.is_set() for f in self.feeds)}/{len(self.feeds)}")
+
+
+def start_from_config(cfg):
+    # Launcher: start the gateway and point this process's Firebase URL at it.
+    # cloud_url / cloud_auth keep the hosted database for the e-stop (estop.channel_for)
+    gw = cfg["gateway"]
+    fb = cfg["firebase"]
+    gateway = Gateway(gw["host"], gw["port"], fb["base_url"], fb["auth"], gw["paths"], gw["urgent"], gw["sync_ms"])
+    gateway.start()
+    print(f"--- RTDB GATEWAY ON {gateway.url} -> {fb['base_url']} ---")
+    cfg["firebase"] = dict(fb, cloud_url=fb["base_url"], cloud_auth=fb["auth"], base_url=gateway.url, auth=None)
+    return gateway
+
+
+if __name__ == '__main__':
+    import sys
+    from . import config
+    cfg = copy.deepcopy(config.current())
+    if len(sys.argv) > 1: cfg["gateway"]["port"] = int(sys.argv[1])
+    if len(sys.argv) > 2: cfg["firebase"]["base_url"] = sys.argv[2]
+    gateway = start_from_config(cfg)
+    while True:
+        time.sleep(5)
+        print(f"[GATEWAY] {gateway.stats()}")
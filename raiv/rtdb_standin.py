@@ -0,0 +1,161 @@
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .fb_stream import apply_put, apply_patch, _split
+
+# --- LOCAL RTDB STAND-IN ---
+# Tiny in-memory copy of the Firebase RTDB REST API: GET/PUT/PATCH/DELETE on
+# "<path>.json" plus "Accept: text/event-stream" streaming. Lets the vision
+# server and its stream subscriber run (and be timed) with no internet.
+
+KEEPALIVE_EVERY = 30.0
+
+
+def _get(tree, keys):
+    node = tree
+    for k in keys:
+        if not isinstance(node, dict) or k not in node: return None
+        node = node[k]
+    return node
+
+
+class StandInDB(object):
+    def __init__(self, initial=None):
+        self.lock = threading.Lock()
+        self.tree = initial or {}
+        self.listeners = []  # (keys, queue)
+
+    def read(self, path):
+        with self.lock:
+            return json.loads(json.dumps(_get(self.tree, _split(path))))
+
+    def write(self, event, path, data):
+        with self.lock:
+            if event == 'put': self.tree = apply_put(self.tree, path, data)
+            else: self.tree = apply_patch(self.tree, path, data)
+            if not isinstance(self.tree, dict): self.tree = {}
+            self._notify(event, _split(path), data)
+
+    def subscribe(self, path):
+        keys = _split(path)
+        q = queue.Queue()
+        with self.lock:
+            q.put(('put', '/', json.loads(json.dumps(_get(self.tree, keys)))))
+            self.listeners.append((keys, q))
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.listeners = [l for l in self.listeners if l[1] is not q]
+
+    def _notify(self, event, keys, data):
+        for lkeys, q in self.listeners:
+            n = len(lkeys)
+            if keys[:n] == lkeys:
+                # Change at or below the listener: report relative to it
+                q.put((event, '/' + '/'.join(keys[n:]), data))
+            elif lkeys[:len(keys)] == keys:
+                # Change above the listener: resend its whole subtree
+                q.put(('put', '/', json.loads(json.dumps(_get(self.tree, lkeys)))))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes: without this, Nagle holds the
+    # body until the client's delayed ACK (~40 ms per keep-alive request)
+    disable_nagle_algorithm = True
+    db = None
+
+    def log_message(self, *a): pass
+
+    def _path(self):
+        p = urlsplit(self.path).path
+        return p[:-5] if p.endswith('.json') else p
+
+    def _body(self):
+        n = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(n) or b'null')
+
+    def _reply(self, obj, code=200):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if 'text/event-stream' not in (self.headers.get('Accept') or ''):
+            return self._reply(self.db.read(self._path()))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        q = self.db.subscribe(self._path())
+        try:
+            while True:
+                try:
+                    event, path, data = q.get(timeout=KEEPALIVE_EVERY)
+                    msg = json.dumps({'path': path, 'data': data})
+                except queue.Empty:
+                    event, msg = 'keep-alive', 'null'
+                if event is None: break
+                self.wfile.write(f"event: {event}\ndata: {msg}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError): pass
+        finally:
+            self.db.unsubscribe(q)
+
+    def do_PUT(self):
+        data = self._body()
+        self.db.write('put', self._path(), data)
+        self._reply(data)
+
+    def do_PATCH(self):
+        data = self._body()
+        self.db.write('patch', self._path(), data)
+        self._reply(data)
+
+    def do_DELETE(self):
+        self.db.write('put', self._path(), None)
+        self._reply(None)
+
+
+class StandInServer(object):
+    def __init__(self, host='127.0.0.1', port=0, initial=None):
+        self.db = StandInDB(initial)
+        handler = type('Handler', (_Handler,), {'db': self.db})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def start(self):
+        t = threading.Thread(target=self.httpd.serve_forever)
+        t.daemon = True
+        t.start()
+        return self
+
+    def drop_streams(self):
+        # Simulates the server cutting every stream (tests reconnect)
+        with self.db.lock:
+            for _, q in self.db.listeners: q.put((None, None, None))
+
+    def stop(self):
+        self.drop_streams()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == '__main__':
+    import sys
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9000
+    srv = StandInServer('0.0.0.0', port, {'command': 'STOP', 'telemetry': {'status': 'STANDBY'}})
+    print(f"--- RTDB STAND-IN ON {srv.url} ---")
+    srv.httpd.serve_forever()
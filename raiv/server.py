@@ -0,0 +1,61 @@
+from flask import Flask, Response, request
+
+from . import vision
+from .history import History, PREFLIGHT
+from .frame_hub import MJPEG_MIMETYPE
+from .mosaic import parse_cams
+from .metrics import REGISTRY, CONTENT_TYPE, sample_profile, profile_allowed, profile_args
+from .wsgi_server import serve
+
+# --- THREADED (WSGI) FRONT END ---
+# /videoN for camera N-1, /mosaic for all of them, served by waitress (wsgi_server.py); see
+# server_async.py for the event-loop variant.
+
+app = Flask(__name__)
+history = History(vision.MISSION_DIR)
+
+# --- STREAM GENERATOR ---
+# Viewers at the same tier share one encode through the camera hub
+def gen(cam_idx):
+    return vision.frame_hubs[cam_idx].stream()
+
+# --- ROUTES ---
+@app.route('/')
+def index(): return "RAIV VISION SYSTEM ONLINE"
+
+@app.route('/metrics')
+def metrics(): return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/debug/profile')
+def debug_profile():
+    # /debug/profile?seconds=10&hz=100 -> collapsed stacks (flamegraph.pl / speedscope)
+    if not profile_allowed(vision.CFG["debug_profile"], request.remote_addr, request.headers.keys()):
+        return "not found", 404
+    try: seconds, hz = profile_args(request.args)
+    except ValueError as e: return str(e), 400
+    return Response(sample_profile(seconds, hz), mimetype="text/plain")
+
+@app.route('/history/<path:sub>', methods=['GET', 'OPTIONS'])
+def history_json(sub):
+    if request.method == 'OPTIONS': return Response(status=204, headers=PREFLIGHT)
+    status, body, headers = history.handle(sub, request.args, request.headers.get("If-None-Match"))
+    return Response(body, status=status, headers=headers)
+
+@app.route('/mosaic')
+def mosaic_feed():
+    # ?mode=cams: every camera on this one connection, parts tagged X-Camera
+    if request.args.get("mode") == "cams":
+        cams = parse_cams(request.args.get("cams"), len(vision.frame_hubs))
+        tier = request.args.get("tier", type=int)
+        return Response(vision.multiplex.stream(cams, tier), mimetype=MJPEG_MIMETYPE)
+    if vision.mosaic is None: return "mosaic disabled", 404
+    return Response(vision.mosaic.hub.stream(), mimetype=MJPEG_MIMETYPE)
+
+@app.route('/video<int:n>')
+def video_feed(n):
+    if not 1 <= n <= len(vision.frame_hubs): return "no such camera", 404
+    return Response(gen(n - 1), mimetype=MJPEG_MIMETYPE)
+
+
+def run(port=None):
+    serve(app, port=port or vision.PORT, threads=vision.CFG["server_threads"])
@@ -0,0 +1,120 @@
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from . import vision
+from .async_stream import AsyncHub, send_mjpeg, send_stream, stream_multiplex, send_body, serve_asgi
+from .fb_stream import AsyncRTDBStream
+from .history import History, PREFLIGHT
+from .mosaic import parse_cams
+from .metrics import REGISTRY, CONTENT_TYPE, sample_profile, profile_allowed, profile_args, count_error
+
+# --- ASYNCIO (ASGI) FRONT END ---
+# Same cameras, detection, archive, e-stop and routes as server.py, but every
+# viewer is a coroutine on one event loop instead of a server thread:
+#   - capture / detect / archive stay in vision.CameraThread's threads
+#   - /videoN is fed by one AsyncHub per camera (async broadcast)
+#   - the Firebase stream runs on the loop; its changes are handled on one
+#     worker thread (mission folders, summaries: file I/O), in arrival order
+#   - the e-stop and the tunnel supervisor (tunnel.py) keep their own threads, on purpose
+#
+#   python -m raiv   (the default; uvicorn if installed, else the built-in server)
+#   bench: python -m benchmarks.bench_mjpeg --server asgi --viewers 10,50,100
+
+hubs = []   # AsyncHub per camera, made on the loop in start()
+mosaic_hub = None
+history = History(vision.MISSION_DIR)
+
+
+# One thread keeps the events in order (a STOP after a MOVE stays after it)
+changes = ThreadPoolExecutor(1, thread_name_prefix="rtdb-change")
+
+
+def _handle_change(roots, stream):
+    try: vision.on_firebase_change(roots, stream)
+    except Exception as e: count_error("rtdb_change", e)
+
+
+def on_change(roots, stream):
+    # AsyncRTDBStream callback: must not block the loop. The handler sees the
+    # mirror as of this event, not whatever arrived while it was queued
+    changes.submit(_handle_change, roots, stream.snapshot())
+
+
+def _query(scope):
+    return dict(parse_qsl(scope["query_string"].decode()))
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http": return
+    path = scope["path"]
+    m = re.fullmatch(r"/video([0-9]+)", path)
+    if m and 1 <= int(m.group(1)) <= len(hubs):
+        await send_mjpeg(hubs[int(m.group(1)) - 1], receive, send)
+    elif path == "/mosaic":
+        q = _query(scope)
+        if q.get("mode") == "cams":
+            tier = int(q["tier"]) if q.get("tier", "").isdigit() else None
+            await send_stream(stream_multiplex(hubs, parse_cams(q.get("cams"), len(hubs)), send, tier), receive, send)
+        elif mosaic_hub: await send_mjpeg(mosaic_hub, receive, send)
+        else: await send_body(send, "mosaic disabled", status=404)
+    elif path == "/":
+        await send_body(send, "RAIV VISION SYSTEM ONLINE (asyncio)")
+    elif path == "/metrics":
+        await send_body(send, REGISTRY.render(), CONTENT_TYPE)
+    elif path.startswith("/history/") and scope["method"] == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204,
+                    "headers": [(k.lower().encode(), v.encode()) for k, v in PREFLIGHT]})
+        await send({"type": "http.response.body", "body": b""})
+    elif path.startswith("/history/"):
+        inm = dict(scope["headers"]).get(b"if-none-match", b"").decode("latin-1") or None
+        # File reads + NumPy reduction: off the loop
+        status, body, headers = await asyncio.get_running_loop().run_in_executor(
+            None, history.handle, path[len("/history/"):], _query(scope), inm)
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(k.lower().encode(), v.encode()) for k, v in headers]
+                               + [(b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+    elif path == "/debug/profile" and not profile_allowed(vision.CFG["debug_profile"], (scope.get("client") or ("",))[0],
+                                                         [k.decode("latin-1") for k, _ in scope["headers"]]):
+        await send_body(send, "not found", status=404)
+    elif path == "/debug/profile":
+        try: seconds, hz = profile_args(_query(scope))
+        except ValueError as e: return await send_body(send, str(e), status=400)
+        text = await asyncio.get_running_loop().run_in_executor(None, sample_profile, seconds, hz)
+        await send_body(send, text)
+    else:
+        await send_body(send, "not found", status=404)
+
+
+async def start():
+    # Cameras are already running (launcher); this adds the loop-side parts
+    loop = asyncio.get_running_loop()
+    global mosaic_hub
+    hubs[:] = [AsyncHub(h, loop) for h in vision.frame_hubs]
+    if vision.mosaic: mosaic_hub = AsyncHub(vision.mosaic.hub, loop)
+
+    stream = AsyncRTDBStream(vision.FIREBASE_BASE_URL, watch=("telemetry", "command"), on_change=on_change,
+                             auth=vision.CFG["firebase"]["auth"])
+    vision.fb_stream = stream   # /metrics collector + status line
+    tasks = [asyncio.ensure_future(stream.run())]
+    if vision.CFG["tunnel"]["enabled"]: vision.start_tunnel()
+
+    t_print = threading.Thread(target=vision.status_printer)
+    t_print.daemon = True
+    t_print.start()
+    return tasks
+
+
+async def main(port=None):
+    tasks = await start()
+    try:
+        await serve_asgi(app, port=port or vision.PORT)
+    finally:
+        for t in tasks: t.cancel()
+
+
+def run(port=None):
+    asyncio.run(main(port))
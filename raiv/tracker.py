@@ -0,0 +1,140 @@
+import math
+import time
+from collections import deque
+
+# --- TEMPORAL STOP FILTERS ---
+# The old trigger fired after 4 consecutive danger frames, so the reaction time
+# was 4 frame periods (133 ms at 30 FPS, 400 ms at 10 FPS) and a single clean
+# frame threw the evidence away. These filters integrate danger over *time*
+# (frame stamps), so the time-to-stop is the same at any FPS, and one missed
+# detection only costs a little confidence.
+#
+#   f = make_filter("ema", tau_ms=50, threshold=0.9)
+#   if f.update(is_danger, stamp): stop()
+#   f.worst_case_ms(fps=30)   # danger onset -> stop, upper bound
+#
+# Every filter: update(danger, stamp) -> bool, reset(), worst_case_ms(fps),
+# .confidence (0..1, for the status line / metrics).
+#
+# A sample stands for the time since the previous one. The first sample after
+# reset() has none, so it is credited the frame period: the last one measured
+# (kept across reset()), else period_ms (the camera's nominal rate). That is
+# what worst_case_ms assumes; with neither known the first frame counts nothing.
+
+
+def _frames_needed(seconds, fps, max_gap):
+    return math.ceil(seconds / min(1.0 / fps, max_gap) - 1e-9)
+
+
+class _Clock(object):
+    # Time each sample stands for: since the previous sample, capped at max_gap
+    def __init__(self, max_gap, period_ms=None):
+        self.max_gap = max_gap
+        self.period = None if period_ms is None else period_ms / 1000.0
+        self.last = None
+
+    def reset(self):
+        self.last = None   # the measured period stays
+
+    def step(self, stamp):
+        if self.last is None: dt = self.period or 0.0
+        else: dt = self.period = max(stamp - self.last, 0.0)
+        self.last = stamp
+        return min(dt, self.max_gap)
+
+
+class EmaFilter(object):
+    # Time-constant exponential smoothing of the 0/1 danger signal. Each sample
+    # stands for the time since the previous one (capped at max_gap_ms, so a
+    # stalled camera can't turn one frame into a long stretch of evidence).
+    # Continuous danger from zero crosses `threshold` after
+    # tau * ln(1 / (1 - threshold)), whatever the frame rate. O(1) per frame.
+    def __init__(self, tau_ms=50.0, threshold=0.9, max_gap_ms=100.0, period_ms=None):
+        self.tau = tau_ms / 1000.0
+        self.threshold = threshold
+        self.max_gap = max_gap_ms / 1000.0
+        self.clock = _Clock(self.max_gap, period_ms)
+        self.reset()
+
+    def reset(self):
+        self.confidence = 0.0
+        self.clock.reset()
+
+    def update(self, danger, stamp=None):
+        dt = self.clock.step(time.time() if stamp is None else stamp)
+        target = 1.0 if danger else 0.0
+        self.confidence = target + (self.confidence - target) * math.exp(-dt / self.tau)
+        return self.confidence >= self.threshold
+
+    def worst_case_ms(self, fps):
+        # Onset -> stop. The first danger frame lands within one period of the
+        # onset and is credited that period, so this is frames * period. Below
+        # 1000 / max_gap_ms FPS a frame is credited less than its real period
+        # (i.e. a minimum number of frames is required) and the bound grows.
+        need = self.tau * math.log(1.0 / (1.0 - self.threshold))
+        return _frames_needed(need, fps, self.max_gap) * 1000.0 / fps
+
+
+class WindowVote(object):
+    # Fires when danger covers >= `ratio` of the last `window_ms`, weighting each
+    # sample by the time it stands for (capped like EmaFilter). Samples enter and
+    # leave the window once, so update() is amortised O(1); memory is bounded by
+    # FPS * window.
+    def __init__(self, window_ms=150.0, ratio=0.75, max_gap_ms=100.0, period_ms=None):
+        self.window = window_ms / 1000.0
+        self.ratio = ratio
+        self.max_gap = max_gap_ms / 1000.0
+        self.clock = _Clock(self.max_gap, period_ms)
+        self.reset()
+
+    def reset(self):
+        self.samples = deque()   # (weight, danger), newest last
+        self.total = 0.0
+        self.danger = 0.0
+        self.clock.reset()
+        self.confidence = 0.0
+
+    def update(self, danger, stamp=None):
+        w = self.clock.step(time.time() if stamp is None else stamp)
+        self.samples.append((w, danger))
+        self.total += w
+        if danger: self.danger += w
+        # Keep just enough of the newest samples to cover the window
+        while self.total - self.samples[0][0] >= self.window:
+            ow, od = self.samples.popleft()
+            self.total -= ow
+            if od: self.danger -= ow
+        self.confidence = self.danger / self.window
+        return self.danger >= self.ratio * self.window - 1e-9
+
+    def worst_case_ms(self, fps):
+        return _frames_needed(self.ratio * self.window, fps, self.max_gap) * 1000.0 / fps
+
+
+class ConsecutiveFrames(object):
+    # The original counter (fires on the (n)th danger frame in a row, any clean
+    # frame resets). Kept for benchmarks/bench_tracker.py.
+    def __init__(self, frames=4, period_ms=None):
+        self.frames = frames
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.confidence = 0.0
+
+    def update(self, danger, stamp=None):
+        self.count = self.count + 1 if danger else 0
+        self.confidence = min(1.0, self.count / float(self.frames))
+        return self.count >= self.frames
+
+    def worst_case_ms(self, fps):
+        return self.frames * 1000.0 / fps
+
+
+FILTERS = {"ema": EmaFilter, "window": WindowVote, "frames": ConsecutiveFrames}
+
+
+def make_filter(kind="ema", **kw):
+    try: cls = FILTERS[kind]
+    except KeyError: raise ValueError(f"unknown stop filter {kind!r}, expected one of {sorted(FILTERS)}")
+    return cls(**kw)
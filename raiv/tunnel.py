@@ -0,0 +1,218 @@
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+
+import requests
+
+from .devices import Backoff
+from .metrics import REGISTRY, FB_SECONDS, count_error
+
+# --- TUNNEL SUPERVISOR ---
+# Runs cloudflared (or any command that prints its public URL) and keeps it
+# alive:
+#
+#   - its output is read until the process exits, so the pipe never fills
+#     and stalls it; the last lines are kept for the log when it dies
+#   - a new URL is only published once GET <url>/ returns what the local
+#     server returns (quick-tunnel DNS takes a few seconds to resolve)
+#   - then every health_s: fail_after failed checks in a row, an exit, or no
+#     URL within url_timeout_s -> cam_url is cleared, cloudflared is killed
+#     and restarted with jittered backoff. A check while the LOCAL server is
+#     down does not count against the tunnel.
+#
+# cam_url and /tunnel change together in one multi-path PATCH, so the
+# dashboard never sees a new URL with an old state or the reverse.
+#
+#   python -m benchmarks.fake_cloudflared --help   # stand-in for testing
+
+URL_PATTERN = r"https://[a-zA-Z0-9-]+\.trycloudflare\.com"
+LOG_LINES = 40
+
+URL_SECONDS = REGISTRY.histogram("raiv_tunnel_url_seconds", "cloudflared start -> public URL healthy",
+                                 buckets=(1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+DOWN_SECONDS = REGISTRY.histogram("raiv_tunnel_down_episode_seconds", "Published URL lost -> next one healthy",
+                                  buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0))
+RESTARTS = REGISTRY.counter("raiv_tunnel_restarts_total", "cloudflared restarts", ["reason"])
+CHECKS = REGISTRY.counter("raiv_tunnel_checks_total", "Public URL health checks", ["result"])
+
+
+class TunnelSupervisor(threading.Thread):
+    def __init__(self, command, local_url, base_url, auth=None, url_pattern=URL_PATTERN, health_s=15.0,
+                 health_timeout_s=10.0, fail_after=3, url_timeout_s=60.0, retry_min_s=2.0, retry_max_s=120.0):
+        threading.Thread.__init__(self, name="TUNNEL")
+        self.daemon = True
+        self.command = list(command) if isinstance(command, (list, tuple)) else [command]
+        self.local_url = local_url.rstrip('/')
+        self.db_url = f"{base_url.rstrip('/')}/.json"
+        self.params = {'auth': auth} if auth else None
+        self.pattern = re.compile(url_pattern)
+        self.health_s = health_s
+        self.timeout = health_timeout_s
+        self.fail_after = fail_after
+        self.url_timeout = url_timeout_s
+        self.backoff = Backoff(retry_min_s, retry_max_s)
+        self.session = requests.Session()
+        self.proc = None
+        self.found = None            # URL printed by the current process
+        self.found_event = threading.Event()
+        self.lines = deque(maxlen=LOG_LINES)
+        self.url = None              # published (healthy) URL
+        self.started = time.perf_counter()
+        self.first_url_s = None      # supervisor start -> first healthy URL
+        self.down_since = self.started
+        self.down_total = 0.0
+        self.restarts = 0
+        self.halt = threading.Event()
+
+    # --- PROCESS ---
+    def _spawn(self):
+        cmd = self.command + ['tunnel', '--url', self.local_url]
+        self.found, self.proc = None, None
+        self.found_event.clear()
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                                     errors="replace")
+        reader = threading.Thread(target=self._drain, args=(self.proc,), name="TUNNEL LOG")
+        reader.daemon = True
+        reader.start()
+
+    def _drain(self, proc):
+        # Reads to EOF: cloudflared logs forever and would block on a full pipe
+        for line in iter(proc.stdout.readline, ''):
+            self.lines.append(line.rstrip())
+            if self.found is None and proc is self.proc:
+                match = self.pattern.search(line)
+                if match:
+                    self.found = match.group(0)
+                    self.found_event.set()
+        proc.stdout.close()
+        if proc is self.proc: self.found_event.set()   # exited: wake the supervisor
+
+    def _kill(self):
+        proc = self.proc
+        if proc is None or proc.poll() is not None: return
+        proc.terminate()
+        try: proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    def _alive(self): return self.proc is not None and self.proc.poll() is None
+
+    # --- CHECKS ---
+    def _get(self, url):
+        try:
+            r = self.session.get(url + '/', timeout=self.timeout, headers={'Cache-Control': 'no-cache'})
+            return r.content if r.status_code == 200 else None
+        except requests.RequestException:
+            return None
+
+    def check(self, url):
+        # -> True healthy, False broken, None unknown (local server not answering)
+        local = self._get(self.local_url)
+        if local is None:
+            CHECKS.labels(result="local_down").inc()
+            return None
+        ok = self._get(url) == local
+        CHECKS.labels(result="ok" if ok else "failed").inc()
+        return ok
+
+    # --- RTDB ---
+    def _publish(self, url, state):
+        patch = {"cam_url": url, "tunnel/state": state, "tunnel/url": url,
+                 "tunnel/since": time.time(), "tunnel/restarts": self.restarts}
+        try:
+            with FB_SECONDS.labels(op="cam_url_put").time():
+                self.session.patch(self.db_url, params=self.params, json=patch, timeout=5).raise_for_status()
+        except requests.RequestException as e: count_error("tunnel_url_put", e)
+
+    def _up(self, url, spawned):
+        now = time.perf_counter()
+        URL_SECONDS.observe(now - spawned)
+        if self.first_url_s is None: self.first_url_s = now - self.started
+        else: DOWN_SECONDS.observe(now - self.down_since)
+        self.down_total += now - self.down_since
+        self.down_since = None
+        self.url = url
+        self.backoff.reset()
+        self._publish(url, "up")
+        print(f"\n✅ TUNNEL: {url} (in {now - spawned:.1f}s)")
+
+    def _down(self, reason):
+        RESTARTS.labels(reason=reason).inc()
+        self.restarts += 1
+        if self.url is not None:
+            self.down_since = time.perf_counter()
+            self.url = None
+            self._publish(None, "down")
+        tail = " | ".join(list(self.lines)[-3:])
+        print(f"[TUNNEL] {reason}, restarting ({tail})")
+
+    def downtime(self, now=None):
+        # Seconds without a healthy published URL since the supervisor started
+        now = now or time.perf_counter()
+        return self.down_total + (now - self.down_since if self.down_since is not None else 0.0)
+
+    # --- LOOP ---
+    def run(self):
+        while not self.halt.is_set():
+            reason = self._session()
+            self._kill()
+            if self.halt.is_set(): break
+            self._down(reason)
+            self.halt.wait(self.backoff.next())
+
+    def stop(self):
+        # Kills cloudflared and ends the loop (tests; the process just exits)
+        self.halt.set()
+        self._kill()
+
+    def _session(self):
+        # One cloudflared process, start to failure -> restart reason
+        spawned = time.perf_counter()
+        try: self._spawn()
+        except OSError as e:
+            count_error("tunnel_start", e)
+            return "spawn_failed"
+        self.found_event.wait(self.url_timeout)
+        if self.found is None: return "exited" if not self._alive() else "no_url"
+        url = self.found
+        # Published only once it answers like the local server
+        while self.url is None:
+            if not self._alive(): return "exited"
+            if time.perf_counter() - spawned > self.url_timeout: return "unreachable"
+            if not self.health_s or self.check(url): self._up(url, spawned)
+            else: time.sleep(1.0)
+        failures = 0
+        while True:
+            try:
+                self.proc.wait(self.health_s or None)
+                return "exited"
+            except subprocess.TimeoutExpired: pass
+            ok = self.check(url)
+            if ok is False: failures += 1
+            elif ok: failures = 0
+            if failures >= self.fail_after: return "unhealthy"
+
+    def stats(self):
+        state = f"up {self.url}" if self.url else "DOWN"
+        return f"{state} | restarts {self.restarts} | down {self.downtime():.0f}s total"
+
+
+def collect_tunnel(sup):
+    yield ("raiv_tunnel_up", "gauge", "1 while a healthy URL is published", [({}, int(sup.url is not None))])
+    yield ("raiv_tunnel_down_seconds_total", "counter", "Time without a healthy published URL", [({}, sup.downtime())])
+    if sup.first_url_s is not None:
+        yield ("raiv_tunnel_first_url_seconds", "gauge", "Supervisor start -> first healthy URL", [({}, sup.first_url_s)])
+
+
+def start(cfg, port, base_url):
+    # Launcher / server_async: supervisor from the "tunnel" config section
+    t = cfg["tunnel"]
+    sup = TunnelSupervisor(t["command"], f"http://127.0.0.1:{port}", base_url, cfg["firebase"]["auth"],
+                           t["url_pattern"], t["health_s"], t["health_timeout_s"], t["fail_after"],
+                           t["url_timeout_s"], t["retry_min_s"], t["retry_max_s"])
+    REGISTRY.add_collector(lambda: collect_tunnel(sup))
+    sup.start()
+    return sup
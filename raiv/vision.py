@@ -0,0 +1,451 @@
+import os
+import threading
+import time
+
+from . import config
+from .fb_stream import RTDBStream, parse_direction
+from .frame_ring import FrameRing, JpegRing, RingStage
+from .adaptive_stream import TieredHub
+from .detection import DetectionEngine
+from .estop import channel_for
+from .archive_index import Odometer
+from .devices import DeviceManager
+from .frame_source import open_source, backend_by_name
+from .metrics import REGISTRY, count_error
+from .tracker import make_filter
+
+# --- RAIV VISION CORE ---
+# Cameras, detection + stop logic, archive, e-stop and Firebase state, shared
+# by the threaded (server.py) and the asyncio (server_async.py) front ends.
+# Everything comes from config.current(); nothing opens a camera or a socket
+# at import time (detection worker processes import this module too).
+
+CFG = config.current()
+CAMERAS = CFG["cameras"]
+PORT = CFG["port"]
+
+FIREBASE_BASE_URL = CFG["firebase"]["base_url"].rstrip("/")
+COMMAND_ENDPOINT = f"{FIREBASE_BASE_URL}/command.json"
+TELEMETRY_ENDPOINT = f"{FIREBASE_BASE_URL}/telemetry.json"
+
+STOP_FILTER = dict(CFG["stop_filter"])
+STOP_FILTER_KIND = STOP_FILTER.pop("kind")
+
+STREAM_TIERS = [tuple(t) for t in CFG["stream"]["tiers"]]
+STREAM_FPS = CFG["stream"]["fps"]    # raw frames handed to the stream hub (best tier's FPS)
+ARCHIVE_FPS = CFG["archive"]["fps"]  # the archiver keeps at most one frame per archive.interval
+SAVE_DIR = CFG["archive"]["dir"]
+MISSION_DIR = CFG["recorder"]["dir"] or SAVE_DIR   # telemetry + ride summaries, served by /history
+BLACKBOX_FPS = CFG["blackbox"]["fps"]
+
+# --- GLOBAL STATE ---
+vehicle_status = "STANDBY"
+vehicle_direction = "UNKNOWN"
+stop_signal_sent_for_current_move = False
+
+frame_hubs = [TieredHub(f"CAM{i}", STREAM_TIERS, CFG["stream"]["start_tier"]) for i in range(len(CAMERAS))]
+DETECT_CAMS = [i for i, c in enumerate(CAMERAS) if c["role"] == "DETECT"]
+current_safe_scores = {i: 0 for i in DETECT_CAMS}
+current_red_scores = {i: 0.0 for i in DETECT_CAMS}
+current_brightness_scores = {i: 0.0 for i in DETECT_CAMS}
+
+# --- METRICS ---
+FRAMES_CAPTURED = REGISTRY.counter("raiv_frames_captured_total", "Frames read from the camera", ["cam"])
+READ_FAILURES = REGISTRY.counter("raiv_capture_failures_total", "Failed camera reads / reopen attempts", ["cam", "kind"])
+
+# --- EMERGENCY SENDER ---
+# Dedicated pre-warmed connection; one idempotent stop, retried until confirmed
+# by the cloud database (never the gateway)
+estop = channel_for(CFG["firebase"])
+
+def send_emergency_stop_now(reason="", cam=None):
+    sent = estop.trigger(reason)
+    # What the cameras saw around the stop, cut and written in the background
+    if blackbox: blackbox.trigger(reason, cam, {"status": vehicle_status, "direction": vehicle_direction})
+    return sent
+
+# --- CAMERA PROCESSOR ---
+# Capture only grabs frames into the ring; detection, encoding and archiving
+# are separate consumers that each take the newest frame at their own pace.
+# Passthrough cameras ring the camera's JPEG bytes instead of pixels: the
+# stream and the archive send / write them unchanged.
+class CameraThread(threading.Thread):
+    def __init__(self, index, cam):
+        threading.Thread.__init__(self)
+        self.index = index
+        self.cam = cam
+        self.role = cam["role"]
+        self.daemon = True
+        self.passthrough = cam["passthrough"]
+        self.ring = (JpegRing if self.passthrough else FrameRing)((cam["height"], cam["width"], 3))
+        self.stages = []
+        # The first frame after a reset is credited the camera's nominal period
+        self.stop_filter = make_filter(STOP_FILTER_KIND, period_ms=1000.0 / cam["fps"], **STOP_FILTER)
+        det = CFG["detection"]
+        self.engine = DetectionEngine(det["roi"], det["scale"], det["mode"])
+        self.cap = None
+        self.device = devices.add(f"CAM{index}", cam["source"], label=str(index))
+        # Startup timing (perf_counter), see launcher.py
+        self.started_at = None
+        self.opened_at = None
+        self.first_frame_at = None
+        self.first_frame = threading.Event()
+
+    def open(self):
+        # Runs on this thread, so all cameras open in parallel
+        cam = self.cam
+        if self.cap is not None: self.cap.reopen()
+        elif self.device.present:
+            self.cap = open_source(cam["source"], cam["width"], cam["height"], cam["fps"], backend_by_name(cam["backend"]),
+                                   passthrough=self.passthrough)
+        ok = self.cap is not None and self.cap.isOpened()
+        self.device.opened_ok(ok)
+        if self.opened_at is None:
+            self.opened_at = time.perf_counter()
+            if not ok: print(f"[CAM{self.index}] could not open {cam['source']!r}, retrying")
+        elif ok: print(f"[CAM{self.index}] reconnected {cam['source']!r}")
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        label = str(self.index)
+        if self.role == "DETECT":
+            self.stages.append(RingStage(self.ring, f"CAM{self.index} DETECT", self.detect, cam=label, stage="detect",
+                                         copy=True))
+            if schedule: schedule.attach(self.index, self.stages[-1])
+        elif self.role == "CAPTURE":
+            self.stages.append(RingStage(self.ring, f"CAM{self.index} ARCHIVE", self.archive, ARCHIVE_FPS, cam=label, stage="archive"))
+        self.stages.append(RingStage(self.ring, f"CAM{self.index} STREAM", self.stream_frame, STREAM_FPS, cam=label, stage="stream"))
+        if blackbox:
+            self.stages.append(RingStage(self.ring, f"CAM{self.index} BLACKBOX", self.record, BLACKBOX_FPS, cam=label, stage="blackbox",
+                                         copy=not self.passthrough))
+        for stage in self.stages: stage.start()
+        m_frames = FRAMES_CAPTURED.labels(cam=label)
+        m_fail = READ_FAILURES.labels(cam=label, kind="read")
+        m_reopen = READ_FAILURES.labels(cam=label, kind="reopen")
+
+        if self.cam["lazy"]:
+            frame_hubs[self.index].wait_for_viewers()
+        self.device.arm()
+        self.open()
+        failing_since = None
+
+        while True:
+            if self.cap is None or not self.cap.isOpened():
+                # Jittered fast retries; skipped while the device is unplugged
+                if self.device.wait_retry():
+                    m_reopen.inc()
+                    self.open()
+                continue
+
+            # Decode straight into the next preallocated slot (or keep the JPEG)
+            if self.passthrough: success, frame = self.cap.read_jpeg()
+            else: success, frame = self.cap.read(self.ring.next_slot())
+            if not success:
+                m_fail.inc()
+                if failing_since is None: failing_since = time.perf_counter()
+                # Unplugged, or reads failing too long: close and reconnect
+                if not self.device.present or self.device.failing_for(failing_since):
+                    self.cap.release()
+                    failing_since = None
+                else: time.sleep(0.01)
+                continue
+            failing_since = None
+            self.ring.commit(time.time(), frame)
+            self.device.frame()
+            m_frames.inc()
+            if self.first_frame_at is None:
+                self.first_frame_at = time.perf_counter()
+                self.first_frame.set()
+
+    # --- OBSTACLE DETECTION ---
+    def detect(self, seq, stamp, frame):
+        if schedule: schedule.analysed(self.index, seq)
+        # 1. SAFE SCORE, BRIGHTNESS & RED % (preallocated buffers, see detection.py)
+        if detect_pool is not None and detect_pool.usable(self.index, frame):
+            # Scores come back through on_pool_result; busy = skip this frame
+            detect_pool.submit(self.index, frame, seq, stamp)
+            return
+        blur, mean_brightness, red_pct = self.engine.analyse(frame)
+        self.apply_scores(blur, mean_brightness, red_pct, stamp)
+
+    def apply_scores(self, blur, mean_brightness, red_pct, stamp=None):
+        current_safe_scores[self.index] = int(blur)
+        current_brightness_scores[self.index] = mean_brightness
+        current_red_scores[self.index] = red_pct
+
+        # --- STOP LOGIC ---
+        is_danger = False
+        reason = ""
+
+        if red_pct > self.cam["red_pct"]:
+            is_danger = True
+            reason = f"RED {red_pct:.1f}%"
+        elif blur < self.cam["safe_score"]:
+            is_danger = True
+            reason = f"SCORE {int(blur)}"
+        elif mean_brightness < self.cam["brightness"]:
+            is_danger = True
+            reason = f"DARK {int(mean_brightness)}"
+
+        # Check if we should stop (danger held long enough, by capture time)
+        if self.stop_filter.update(is_danger, stamp):
+            if self.request_stop(f"CAM OBSTACLE ({reason})", reason): self.stop_filter.reset()
+
+    def request_stop(self, what, reason):
+        # Logic: Only stop if we haven't already sent a stop for this specific move action
+        # AND if the direction matches the camera view
+        global stop_signal_sent_for_current_move
+        should_stop = (not stop_signal_sent_for_current_move
+                       and self.cam["stops_when"] is not None
+                       and vehicle_direction == self.cam["stops_when"])
+        if not should_stop: return False
+
+        cam_label = self.cam["view"] or f"CAM{self.index}"
+        print(f"\n[⛔ STOP] {cam_label} {what} -> STOPPING")
+
+        # USE EMERGENCY SENDER (Instant)
+        send_emergency_stop_now(f"{cam_label} {reason}", self.index)
+
+        stop_signal_sent_for_current_move = True
+        return True
+
+    # --- IMAGE CAPTURE ---
+    def archive(self, seq, stamp, frame):
+        if vehicle_status == "MOVING" and archiver.due(self.index, stamp):
+            self.save_img(frame, stamp)
+
+    # --- STREAM ---
+    # Viewers encode on demand at their own tier (once per frame per tier)
+    def stream_frame(self, seq, stamp, frame):
+        hub = frame_hubs[self.index]
+        if not hub.has_viewers(): return  # nobody watching, skip the copy
+        if self.passthrough: hub.publish_jpeg(frame, (self.cam["width"], self.cam["height"]), stamp)
+        else: hub.publish_raw(frame, stamp)
+
+    # --- BLACK BOX ---
+    def record(self, seq, stamp, frame):
+        i = self.index
+        scores = (current_safe_scores[i], current_red_scores[i], current_brightness_scores[i]) if self.role == "DETECT" else None
+        blackbox.add(i, stamp, frame, scores)
+
+    def save_img(self, frame, stamp=None):
+        # Copies and queues; encode + write + index happen on the archiver's workers
+        stamp = stamp or time.time()
+        if self.passthrough: return archiver.submit_jpeg(self.index, frame, stamp, odometer.at(stamp))
+        return archiver.submit(self.index, frame, stamp, odometer.at(stamp))
+
+# Start Camera Threads
+# Called by the launcher only: detection worker processes re-import this file
+camera_threads = []
+devices = None
+recorder = None
+ride = None
+ride_writer = None
+detect_pool = None
+archiver = None
+blackbox = None
+schedule = None     # detection rate per DETECT camera (detect_schedule.py)
+mosaic = None       # /mosaic compositor
+multiplex = None    # /mosaic?mode=cams
+odometer = Odometer()  # prog_dist from /telemetry, extrapolated between updates
+
+def on_pool_result(cam, seq, stamp, blur, brightness, red_pct):
+    camera_threads[cam].apply_scores(blur, brightness, red_pct, stamp)
+
+def on_camera_blind(device, seconds):
+    # A DETECT camera that sees nothing is treated like a blocked one
+    cam = next(c for c in camera_threads if c.device is device)
+    if cam.role == "DETECT": cam.request_stop(f"CAM BLIND {seconds:.1f}s", f"BLIND {seconds:.1f}s")
+
+def start_cameras():
+    global detect_pool, archiver, devices, recorder, ride, ride_writer, blackbox, mosaic, multiplex, schedule
+    devices = DeviceManager(CFG["devices"], on_blind=on_camera_blind)
+    bb = CFG["blackbox"]
+    if bb["enabled"]:
+        # Before the camera threads: they add their black-box stage on start
+        from .blackbox import BlackBox
+        blackbox = BlackBox(bb["dir"] or MISSION_DIR, range(len(CAMERAS)), bb["pre_s"], bb["post_s"],
+                            bb["quality"], bb["max_mb"])
+    # Cameras first: opening them is the slow part and happens on their own threads
+    for i, cam in enumerate(CAMERAS): camera_threads.append(CameraThread(i, cam))
+    if CFG["detect_schedule"]["enabled"] and DETECT_CAMS:
+        # Before the camera threads start: their detect stages attach on start
+        from . import detect_schedule
+        schedule = detect_schedule.start(CFG, [camera_threads[i] for i in DETECT_CAMS])
+    devices.probe()   # one listing up front: unplugged cameras are not opened at all
+    for t in camera_threads: t.start()
+    devices.start()
+
+    from .mosaic import Mosaic, Multiplex
+    multiplex = Multiplex(frame_hubs)
+    mc = CFG["mosaic"]
+    if mc["enabled"]:
+        order = mc["cams"] if mc["cams"] is not None else range(len(CAMERAS))
+        tiles = [camera_threads[i] if 0 <= i < len(CAMERAS) else None for i in order]
+        lazy = [frame_hubs[i] for i, c in enumerate(CAMERAS) if c["lazy"]]
+        mosaic = Mosaic([t.ring if t else None for t in tiles], [CAMERAS[t.index]["view"] or f"CAM{t.index}" if t else "" for t in tiles],
+                        mc["layout"], mc["tile"], mc["fps"], mc["quality"], mc["labels"],
+                        wake=lambda: [hub.want() for hub in lazy])
+        mosaic.start()
+
+    if any(c["role"] == "CAPTURE" for c in CAMERAS):
+        from .archiver import ImageArchiver
+        from .archive_index import ArchiveIndex
+        try: os.makedirs(SAVE_DIR, exist_ok=True)
+        except OSError as e: count_error("save_dir", e)
+        arc = CFG["archive"]
+        archiver = ImageArchiver(SAVE_DIR, arc["interval"], quota_bytes=int(arc["quota_gb"] * 1024 ** 3),
+                                 index=ArchiveIndex(SAVE_DIR))
+    rec = CFG["recorder"]
+    if rec["enabled"]:
+        from .recorder import TelemetryRecorder
+        scores = lambda: (current_safe_scores, current_red_scores, current_brightness_scores)
+        recorder = TelemetryRecorder(MISSION_DIR, DETECT_CAMS, scores, rec["rate_hz"], rec["flush_s"])
+        recorder.start()
+    rq = CFG["ride_quality"]
+    if rq["enabled"]:
+        from .ride_quality import RideQuality, SummaryWriter
+        ride_writer = SummaryWriter(FIREBASE_BASE_URL, auth=CFG["firebase"]["auth"])
+        ride_writer.start()
+        ride = RideQuality(rq["fs"], rq["segment_m"], rq["segment_s"],
+                           on_segment=lambda i, seg, total: ride_writer.segment(ride.mission, i, seg, total))
+    det = CFG["detection"]
+    if det["workers"] > 0 and DETECT_CAMS:
+        from .detect_pool import DetectionPool
+        shape = (CAMERAS[DETECT_CAMS[0]]["height"], CAMERAS[DETECT_CAMS[0]]["width"], 3)
+        detect_pool = DetectionPool(det["workers"], len(CAMERAS), shape, on_pool_result,
+                                    roi=det["roi"], scale=det["scale"], mode=det["mode"])
+
+# --- MONITOR (Status & Direction) ---
+# One long-lived RTDB stream instead of polling /telemetry + /command at 2 Hz
+last_known_status = "STANDBY"
+
+def _feed(what, fn, *args):
+    # Analytics hooks: a bad telemetry value must not abort the stop logic
+    try: fn(*args)
+    except Exception as e: count_error(what, e)
+
+def on_firebase_change(roots, stream):
+    global vehicle_status, vehicle_direction, stop_signal_sent_for_current_move, last_known_status
+
+    # Safety first: e-stop confirmation, direction and rate schedule
+    if "command" in roots:
+        estop.on_command(stream.get("command"))
+        direction = parse_direction(stream.get("command"))
+        if direction: vehicle_direction = direction
+        # A move command ramps the camera facing travel to full rate at once
+        if schedule: schedule.on_command(direction)
+
+    if "telemetry" in roots:
+        telemetry = stream.get("telemetry")
+        status = stream.get("telemetry", "status")
+        started = ended = False
+        if status:
+            vehicle_status = status
+            if schedule: schedule.on_status(status)
+            started = vehicle_status == "MOVING" and last_known_status != "MOVING"
+            ended = vehicle_status != "MOVING" and last_known_status == "MOVING"
+            # RESET LATCH ON NEW MOVE
+            if started: stop_signal_sent_for_current_move = False
+            last_known_status = vehicle_status
+
+        _feed("odometer", odometer.update, telemetry)
+        if started:
+            # Each move gets its own archive folder (pictures + telemetry)
+            mission = archiver.new_mission() if archiver else time.strftime("M%Y%m%d_%H%M%S")
+            if recorder: _feed("recorder", recorder.start_mission, mission)
+            if ride: _feed("ride_quality", ride.reset, mission)
+            if blackbox: _feed("blackbox", blackbox.new_mission, mission)
+        if recorder: _feed("recorder", recorder.on_telemetry, telemetry)
+        if blackbox: _feed("blackbox", blackbox.on_telemetry, telemetry)
+        if ride and vehicle_status == "MOVING": _feed("ride_quality", ride.feed_telemetry, telemetry, odometer.at(time.time()))
+        if ended:
+            if recorder: _feed("recorder", recorder.end_mission)
+            if ride and ride.mission: _feed("ride_quality", lambda: finish_ride(ride.mission, ride.flush()))
+
+def finish_ride(mission, total):
+    ride_writer.mission_done(mission, total)
+    from .history import save_summary
+    try: save_summary(os.path.join(MISSION_DIR, mission), total)
+    except OSError as e: count_error("ride_summary_save", e)
+
+fb_stream = None
+
+def firebase_monitor():
+    global fb_stream
+    fb_stream = RTDBStream(FIREBASE_BASE_URL, watch=("telemetry", "command"), on_change=on_firebase_change,
+                           auth=CFG["firebase"]["auth"])
+    fb_stream.start()
+    return fb_stream
+
+# --- STATUS PRINTER ---
+def status_printer():
+    print("--- STATUS PRINTER STARTED ---")
+    while True:
+        time.sleep(1.0)
+        scores = " | ".join(
+            f"{CAMERAS[i]['view'] or 'CAM'} (CAM {i}): Score {current_safe_scores[i]} / Red {current_red_scores[i]:.1f}% / Bright {current_brightness_scores[i]:.0f}"
+            for i in DETECT_CAMS)
+        print(f"📊 STATUS [{vehicle_direction}] | {scores}")
+        if estop.sent: print(f"   ⛔ ESTOP ACK | {estop.latency.summary()} | lost {estop.lost}")
+        if devices: print(f"   🎥 CAMS | {devices.stats()}")
+        if archiver: print(f"   💾 ARCHIVE {archiver.mission} | {archiver.stats()}")
+        if recorder and recorder.file: print(f"   📈 TELEMETRY {recorder.mission} | {recorder.rows} rows")
+        if tunnel: print(f"   🌐 TUNNEL | {tunnel.stats()}")
+        if schedule: print(f"   🧮 DETECT | {schedule.stats()}")
+        if blackbox and blackbox.written: print(f"   🎞 BLACKBOX | {blackbox.written} clips")
+        print("   ⏱ LAG | " + " | ".join(st.stats.summary() for cam in camera_threads for st in cam.stages))
+
+# --- METRIC COLLECTORS (read at scrape time only) ---
+def collect_vision():
+    yield ("raiv_stream_viewers", "gauge", "Connected MJPEG viewers",
+           [({"cam": str(i)}, hub.viewers) for i, hub in enumerate(frame_hubs)])
+    yield ("raiv_camera_first_frame_seconds", "gauge", "Camera thread start -> first frame",
+           [({"cam": str(c.index)}, c.first_frame_at - c.started_at) for c in camera_threads if c.first_frame_at])
+    if devices:
+        now = time.perf_counter()
+        yield ("raiv_camera_blind", "gauge", "1 while no frame for blind_after_ms",
+               [({"cam": str(c.index)}, int(c.device.blind_since is not None)) for c in camera_threads])
+        yield ("raiv_camera_blind_seconds_total", "counter", "Time without frames since start",
+               [({"cam": str(c.index)}, c.device.blind_seconds(now)) for c in camera_threads])
+        yield ("raiv_camera_device_present", "gauge", "Device node present (hot-plug watcher)",
+               [({"cam": str(c.index)}, int(c.device.present)) for c in camera_threads])
+    yield ("raiv_safe_score", "gauge", "Latest blur (Laplacian variance) score",
+           [({"cam": str(i)}, v) for i, v in current_safe_scores.items()])
+    yield ("raiv_red_percent", "gauge", "Latest red coverage %",
+           [({"cam": str(i)}, v) for i, v in current_red_scores.items()])
+    yield ("raiv_brightness", "gauge", "Latest mean brightness",
+           [({"cam": str(i)}, float(v)) for i, v in current_brightness_scores.items()])
+    yield ("raiv_stop_confidence", "gauge", "Stop filter confidence (fires at its threshold)",
+           [({"cam": str(c.index)}, c.stop_filter.confidence) for c in camera_threads if c.role == "DETECT"])
+    yield ("raiv_vehicle_moving", "gauge", "1 while /telemetry status is MOVING",
+           [({"direction": vehicle_direction}, int(vehicle_status == "MOVING"))])
+    if archiver:
+        yield ("raiv_archive_frames_total", "counter", "Archiver outcomes", [
+            ({"result": "saved"}, archiver.saved), ({"result": "dropped_busy"}, archiver.dropped_busy),
+            ({"result": "dropped_quota"}, archiver.dropped_quota), ({"result": "error"}, archiver.errors)])
+        yield ("raiv_archive_queue", "gauge", "Frames waiting to be written", [({}, archiver.jobs.qsize())])
+    if blackbox:
+        yield ("raiv_blackbox_bytes", "gauge", "Encoded frames held for black-box clips",
+               [({"cam": str(cam)}, ring.bytes) for cam, ring in blackbox.rings.items()])
+    if detect_pool:
+        yield ("raiv_detect_pool_jobs_total", "counter", "Detection pool jobs",
+               [({"state": "submitted"}, detect_pool.submitted), ({"state": "completed"}, detect_pool.completed),
+                ({"state": "timed_out"}, detect_pool.timeouts), ({"state": "late_dropped"}, detect_pool.late)])
+    if fb_stream:
+        yield ("raiv_firebase_stream_connected", "gauge", "1 while the RTDB stream is open", [({}, int(fb_stream.connected.is_set()))])
+        yield ("raiv_firebase_stream_events_total", "counter", "put/patch events applied", [({}, fb_stream.events)])
+        yield ("raiv_firebase_stream_reconnects_total", "counter", "Stream reconnects", [({}, fb_stream.reconnects)])
+
+REGISTRY.add_collector(collect_vision)
+
+# --- TUNNEL ---
+tunnel = None
+
+def start_tunnel():
+    # cloudflared under a supervisor (tunnel.py): drained, health-checked, restarted
+    global tunnel
+    from . import tunnel as tunnel_mod
+    print("--- STARTING TUNNEL ---")
+    tunnel = tunnel_mod.start(CFG, PORT, FIREBASE_BASE_URL)
+    return tunnel
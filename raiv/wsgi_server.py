@@ -0,0 +1,35 @@
+# --- PRODUCTION WSGI SERVER ---
+# Flask's dev server (threaded=True) starts a new thread per request, writes
+# each chunk with its own flush and has no limit on connections. waitress
+# (pure Python, runs on the Windows laptop) keeps a fixed pool of worker
+# threads, does the socket I/O on one async loop and hands slow viewers
+# backpressure once OUTBUF_HIGH bytes are queued for them, which is what the
+# adaptive stream tiers react to.
+#
+#   pip install waitress
+#   serve(app, port=5000)    # falls back to the dev server if it's missing
+#
+# Every open /videoN viewer holds one worker thread, so THREADS bounds the
+# number of simultaneous viewers: the next one, and any request behind it
+# (/, /history, /metrics), waits until a viewer leaves. That is why the
+# launcher defaults to server_async.py; this one is "server": "waitress".
+
+THREADS = 48
+OUTBUF_HIGH = 256 * 1024      # bytes queued for one client before its yield blocks
+CONNECTION_LIMIT = 200
+
+
+def serve(app, host='0.0.0.0', port=5000, threads=THREADS):
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        print("--- waitress not installed, using the Flask dev server (pip install waitress) ---")
+        app.run(host=host, port=port, threaded=True)
+        return
+    print(f"--- SERVING ON {host}:{port} (waitress, {threads} threads) ---")
+    waitress_serve(app, host=host, port=port, threads=threads,
+                   connection_limit=CONNECTION_LIMIT,
+                   outbuf_high_watermark=OUTBUF_HIGH,
+                   # keep queued frames in memory, never spill to temp files
+                   outbuf_overflow=OUTBUF_HIGH * 4,
+                   channel_timeout=30, ident="RAIV")
@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+
+from raiv.adaptive_stream import DEFAULT_TIERS, TieredHub
+from raiv.frame_hub import mjpeg_part
+
+
+def camera_jpeg(w=640, h=480, quality=85):
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), (9, 9), 0)
+    return cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])[1].tobytes()
+
+
+def test_native_tier_serves_the_camera_bytes():
+    # Default tiers are all below the camera's quality and size
+    jpeg = camera_jpeg()
+    hub = TieredHub("CAM0", DEFAULT_TIERS)
+    gen = hub.stream(lo=0, hi=0)
+    hub.publish_jpeg(jpeg, (640, 480))
+    assert next(gen) == mjpeg_part(jpeg)
+    gen.close()
+    assert hub.encodes == 0
+
+
+def test_lower_tiers_still_reencode():
+    jpeg = camera_jpeg()
+    hub = TieredHub("CAM0", DEFAULT_TIERS)
+    hub.publish_jpeg(jpeg, (640, 480))
+    for tier in range(1, len(DEFAULT_TIERS)):
+        part = hub.variant(tier)[1]
+        assert len(part) < len(jpeg)
+        img = cv2.imdecode(np.frombuffer(part.split(b'\r\n\r\n', 1)[1][:-2], np.uint8), cv2.IMREAD_COLOR)
+        assert img.shape[1::-1] == DEFAULT_TIERS[tier][1:3]
+    assert hub.encodes == len(DEFAULT_TIERS) - 1
+
+
+def test_raw_cameras_encode_the_best_tier():
+    hub = TieredHub("CAM0", DEFAULT_TIERS)
+    hub.publish_raw(np.zeros((480, 640, 3), np.uint8))
+    part = hub.variant(0)[1]
+    img = cv2.imdecode(np.frombuffer(part.split(b'\r\n\r\n', 1)[1][:-2], np.uint8), cv2.IMREAD_COLOR)
+    assert img.shape == (240, 320, 3)
@@ -0,0 +1,35 @@
+import os
+import time
+
+import numpy as np
+
+from raiv.archiver import ImageArchiver
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.01)
+    return False
+
+
+def test_no_folder_until_the_first_frame(tmp_path):
+    arch = ImageArchiver(str(tmp_path), interval=0.0)
+    arch.new_mission("M20260101_120000")
+    assert os.listdir(tmp_path) == []
+    path = arch.submit(0, np.zeros((8, 8, 3), np.uint8))
+    assert wait_for(lambda: os.path.exists(path))
+    assert os.listdir(tmp_path) == ["M20260101_120000"]
+
+
+def test_quota_keeps_folders_that_are_not_missions(tmp_path):
+    (tmp_path / "notes").mkdir()
+    (tmp_path / "notes" / "big.bin").write_bytes(b"x" * 4096)
+    (tmp_path / "M20250101_000000").mkdir()
+    (tmp_path / "M20250101_000000" / "old.jpg").write_bytes(b"x" * 4096)
+    arch = ImageArchiver(str(tmp_path), interval=0.0, quota_bytes=2048)
+    arch.new_mission("M20260101_120000")
+    path = arch.submit_jpeg(0, b"\xff\xd8" + b"x" * 1000)
+    assert wait_for(lambda: os.path.exists(path) and not (tmp_path / "M20250101_000000").exists())
+    assert (tmp_path / "notes" / "big.bin").exists()
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+
+from raiv import detect_pool
+from raiv.detect_pool import DetectionPool
+
+SHAPE = (24, 32, 3)
+
+
+class StallingEngine(object):
+    # Stands in for DetectionEngine: a frame whose first pixel is 255 hangs the
+    # worker for 1 s; the "scores" are the frame's first pixel
+    def __init__(self, **kw): pass
+
+    def analyse(self, frame):
+        v = float(frame[0, 0, 0])
+        if v == 255: time.sleep(1.0)
+        return v, v, v
+
+
+def frame(v):
+    return np.full(SHAPE, v, np.uint8)
+
+
+def wait_for(cond, timeout=10.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.01)
+    return False
+
+
+def test_late_result_of_a_stalled_job_is_dropped(monkeypatch):
+    monkeypatch.setattr(detect_pool, "RETRY_S", 0.0)
+    results = []
+    pool = DetectionPool(2, 1, SHAPE, lambda cam, seq, stamp, blur, *_: results.append((seq, blur)),
+                         deadline_s=0.3, engine=StallingEngine)
+    try:
+        assert pool.submit(0, frame(1), 1, 0.0)        # warms up a worker
+        assert wait_for(lambda: results == [(1, 1.0)])
+
+        assert pool.submit(0, frame(255), 2, 0.0)      # this worker stalls
+        time.sleep(0.4)
+        assert not pool.submit(0, frame(3), 3, 0.0)    # still busy ...
+        assert pool.usable(0, frame(3))                # ... until usable() gives the job up
+        assert pool.timeouts == 1
+        assert pool.submit(0, frame(7), 4, 0.0)        # the other worker takes this one
+        assert wait_for(lambda: (4, 7.0) in results)
+
+        time.sleep(1.2)                                # the stalled job is over by now
+        assert results == [(1, 1.0), (4, 7.0)]
+        assert not pool.busy[0]
+        assert pool.submit(0, frame(9), 5, 0.0)
+        assert wait_for(lambda: (5, 9.0) in results)
+    finally:
+        pool.close()
+
+
+def test_result_of_a_given_up_job_never_frees_its_successor():
+    pool = DetectionPool(0, 1, SHAPE)
+    try:
+        assert pool.submit(0, frame(1), 1, 0.0)
+        gen = int(pool.gens[0])
+        pool._expire(0, time.perf_counter())
+        pool.down_until = 0.0
+        assert pool.submit(0, frame(2), 2, 0.0)
+        # The first job's worker reports anyway (written before it saw the new generation)
+        row = pool.table[0, 0]
+        row[detect_pool.GEN], row[detect_pool.SEQ] = gen, 1
+        pool.done.put((0, 0, gen))
+        assert wait_for(lambda: pool.late == 1)
+        assert pool.busy[0] and pool.completed == 0
+    finally:
+        pool.close()
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from raiv.fb_stream import RTDBStream, apply_patch, apply_put
+from raiv.rtdb_standin import StandInServer
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.01)
+    return False
+
+
+# --- PUT / PATCH ---
+def test_root_put_replaces_everything():
+    tree = {"command": "STOP", "telemetry": {"status": "MOVING"}}
+    assert apply_put(tree, "/", {"cam_url": "a"}) == {"cam_url": "a"}
+
+
+def test_root_put_null_clears_the_tree():
+    assert apply_put({"command": "STOP"}, "/", None) == {}
+
+
+def test_nested_put_creates_missing_parents():
+    assert apply_put({}, "/telemetry/odometer/km", 3) == {"telemetry": {"odometer": {"km": 3}}}
+
+
+def test_put_replaces_a_non_dict_on_the_way():
+    assert apply_put({"telemetry": "offline"}, "/telemetry/speed", 2) == {"telemetry": {"speed": 2}}
+
+
+def test_null_put_deletes_the_key():
+    tree = {"telemetry": {"status": "MOVING", "speed": 2}}
+    assert apply_put(tree, "/telemetry/speed", None) == {"telemetry": {"status": "MOVING"}}
+
+
+def test_null_put_under_a_missing_path_changes_nothing():
+    tree = {"command": "STOP"}
+    assert apply_put(tree, "/telemetry/speed", None) == {"command": "STOP"}
+
+
+def test_nested_patch_touches_only_the_given_children():
+    tree = {"telemetry": {"status": "STANDBY", "speed": 0, "odometer": 12}}
+    out = apply_patch(tree, "/telemetry/", {"status": "MOVING", "speed": 4})
+    assert out == {"telemetry": {"status": "MOVING", "speed": 4, "odometer": 12}}
+
+
+def test_patch_with_null_deletes_that_child():
+    tree = {"telemetry": {"status": "MOVING", "speed": 4}}
+    assert apply_patch(tree, "/telemetry", {"speed": None}) == {"telemetry": {"status": "MOVING"}}
+
+
+def test_patch_with_a_path_per_key():
+    tree = {"telemetry": {"status": "MOVING"}}
+    out = apply_patch(tree, "/", {"telemetry/speed": 5, "command": "FWD_1"})
+    assert out == {"telemetry": {"status": "MOVING", "speed": 5}, "command": "FWD_1"}
+
+
+def test_patch_with_a_scalar_is_a_put():
+    assert apply_patch({"command": "STOP"}, "/command", "FWD_1") == {"command": "FWD_1"}
+
+
+# --- STREAM (against the local stand-in) ---
+@pytest.fixture
+def standin():
+    srv = StandInServer(initial={"command": "STOP", "telemetry": {"status": "STANDBY"}}).start()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def stream(standin):
+    changes = []
+    s = RTDBStream(standin.url, "/", watch=["command", "telemetry"],
+                   on_change=lambda roots, m: changes.append(roots), backoff_min=0.01, backoff_max=0.05)
+    s.changes = changes
+    s.start()
+    assert s.ready.wait(5)
+    yield s
+    s.stop()
+
+
+def test_stream_mirrors_the_first_snapshot(stream):
+    assert stream.get("command") == "STOP"
+    assert stream.get("telemetry", "status") == "STANDBY"
+
+
+def test_stream_applies_put_patch_and_delete(standin, stream):
+    standin.db.write("put", "/command", "FWD_1")
+    standin.db.write("patch", "/telemetry", {"status": "MOVING", "speed": 3})
+    assert wait_for(lambda: stream.get("telemetry", "speed") == 3)
+    standin.db.write("put", "/telemetry/speed", None)
+    assert wait_for(lambda: stream.get("telemetry") == {"status": "MOVING"})
+    assert stream.get("command") == "FWD_1"
+    assert {"command"} in stream.changes and {"telemetry"} in stream.changes
+
+
+def test_stream_ignores_unwatched_children(standin, stream):
+    standin.db.write("put", "/cam_url", "http://x")
+    standin.db.write("put", "/command", "BWD_1")
+    assert wait_for(lambda: stream.get("command") == "BWD_1")
+    assert stream.get("cam_url") is None
+
+
+def test_stream_reconnects_and_resyncs(standin, stream):
+    standin.drop_streams()
+    assert wait_for(lambda: stream.reconnects >= 1)
+    # Written while the stream may still be down: the new snapshot carries it
+    standin.db.write("put", "/command", "FWD_2")
+    assert wait_for(lambda: stream.connected.is_set() and stream.get("command") == "FWD_2")
+    standin.db.write("patch", "/telemetry", {"status": "MOVING"})
+    assert wait_for(lambda: stream.get("telemetry", "status") == "MOVING")
+
+
+# --- MALFORMED EVENTS ---
+def test_malformed_events_are_dropped_without_dropping_the_stream():
+    s = RTDBStream("http://127.0.0.1:1", "/")
+    for payload in ('{not json', 'null', '[1, 2]', '42', '"path"', '{"path": 7, "data": 1}'):
+        s._dispatch("put", payload)
+    s._dispatch("put", '{"path": "/command", "data": "FWD_1"}')
+    assert s.mirror == {"command": "FWD_1"}
+    assert s.events == 1
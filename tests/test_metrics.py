@@ -0,0 +1,22 @@
+import pytest
+
+from raiv.metrics import profile_allowed, profile_args
+
+
+def test_profile_args_defaults_and_caps():
+    assert profile_args({}) == (5.0, 100)
+    assert profile_args({"seconds": "600", "hz": "5000"}) == (60.0, 1000)
+
+
+@pytest.mark.parametrize("args", [{"seconds": "abc"}, {"seconds": "-1"}, {"seconds": "0"}, {"seconds": "nan"},
+                                  {"seconds": "inf"}, {"hz": "x"}, {"hz": "-5"}])
+def test_profile_args_rejects_bad_values(args):
+    with pytest.raises(ValueError):
+        profile_args(args)
+
+
+def test_profile_only_local_and_not_through_the_tunnel():
+    assert not profile_allowed(False, "127.0.0.1", [])
+    assert profile_allowed(True, "127.0.0.1", ["Host"])
+    assert not profile_allowed(True, "192.168.1.20", [])
+    assert not profile_allowed(True, "127.0.0.1", ["Host", "Cf-Connecting-Ip"])
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from raiv.ride_quality import RideQuality, weighting
+
+FS = 100
+
+
+def mission_summary(z, y=None, batch=FS):
+    rq = RideQuality(FS, segment_m=0, segment_s=1e9)
+    rq.reset("M20260101_000000")
+    for i in range(0, len(z), batch):
+        rq.feed(z[i:i + batch], None if y is None else y[i:i + batch], t=1.0)
+    return rq.flush()
+
+
+@pytest.mark.parametrize("f0", [0.5, 0.8, 2.0, 8.0])
+def test_weighted_rms_of_a_tone_matches_the_weighting(f0):
+    # Including the 0.4-1 Hz part of the band a 1 s window cannot resolve
+    t = np.arange(0, 120, 1.0 / FS)
+    out = mission_summary(np.sin(2 * np.pi * f0 * t))
+    assert out["vert_w"] == pytest.approx(weighting(f0, "Wk") / np.sqrt(2), rel=0.03)
+    assert out["vert_rms"] == pytest.approx(1 / np.sqrt(2), rel=0.01)
+
+
+def test_lateral_uses_wd_and_short_batches_are_padded():
+    t = np.arange(0, 60, 1.0 / FS)
+    y = np.sin(2 * np.pi * 0.6 * t)
+    out = mission_summary(np.zeros_like(t), y)
+    assert out["lat_w"] == pytest.approx(weighting(0.6, "Wd") / np.sqrt(2), rel=0.05)
+    rq = RideQuality(FS)
+    rq.feed(np.zeros(FS), np.ones(FS // 2))           # y shorter than z
+    assert rq.flush()["samples"] == FS
+
+
+def test_zero_vertical_is_a_sample():
+    rq = RideQuality(FS)
+    rq.feed_telemetry({"vertical": 0})
+    assert rq.flush()["samples"] == 1
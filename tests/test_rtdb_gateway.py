@@ -0,0 +1,197 @@
+import copy
+import socket
+import time
+
+from raiv import config, estop
+from raiv.rtdb_gateway import CloudSync, Coalescer, GatewayDB, _CloudFeed, root_value, start_from_config
+from raiv.rtdb_standin import StandInServer
+
+
+def pending(c):
+    return {'/'.join(k): v for k, v in c.pending.items()}
+
+
+# --- COALESCING ---
+def test_last_write_to_a_path_wins():
+    c = Coalescer()
+    c.add(("command",), "FWD_1")
+    c.add(("command",), "STOP")
+    assert pending(c) == {"command": "STOP"}
+
+
+def test_parent_write_supersedes_pending_children():
+    c = Coalescer()
+    c.add(("telemetry", "speed"), 3)
+    c.add(("telemetry", "status"), "MOVING")
+    c.add(("telemetry",), {"status": "STANDBY"})
+    assert pending(c) == {"telemetry": {"status": "STANDBY"}}
+
+
+def test_child_write_folds_into_pending_parent():
+    c = Coalescer()
+    c.add(("telemetry",), {"status": "MOVING", "speed": 1})
+    c.add(("telemetry", "speed"), 2)
+    c.add(("telemetry", "status"), None)     # null deletes
+    assert pending(c) == {"telemetry": {"speed": 2}}
+
+
+def test_root_write_absorbs_everything():
+    c = Coalescer()
+    c.add(("command",), "FWD_1")
+    c.add((), {"cam_url": "a"})
+    c.add(("command",), "STOP")
+    assert c.pending == {(): {"cam_url": "a", "command": "STOP"}}
+
+
+def test_oldest_stamp_is_kept_when_children_are_superseded():
+    c = Coalescer()
+    c.add(("telemetry", "speed"), 1, stamp=1.0)
+    c.add(("telemetry",), {}, stamp=5.0)
+    assert c.first[("telemetry",)] == 1.0
+
+
+# --- PUT BACK (failed batch + writes made meanwhile) ---
+def test_put_back_old_parent_then_newer_child():
+    c = Coalescer()
+    c.add(("telemetry",), {"status": "MOVING", "speed": 1})
+    batch, first = c.take()
+    c.add(("telemetry", "speed"), 2)
+    c.put_back(batch, first)
+    assert pending(c) == {"telemetry": {"status": "MOVING", "speed": 2}}
+
+
+def test_put_back_old_child_then_newer_parent():
+    c = Coalescer()
+    c.add(("telemetry", "speed"), 1)
+    batch, first = c.take()
+    c.add(("telemetry",), {"status": "STANDBY"})
+    c.put_back(batch, first)
+    assert pending(c) == {"telemetry": {"status": "STANDBY"}}
+
+
+def test_put_back_old_root_then_newer_sibling():
+    c = Coalescer()
+    c.add((), {"command": "FWD_1", "cam_url": "a"})
+    batch, first = c.take()
+    c.add(("command",), "STOP")
+    c.put_back(batch, first)
+    assert c.pending == {(): {"command": "STOP", "cam_url": "a"}}
+    assert root_value(c.pending) == {"command": "STOP", "cam_url": "a"}
+
+
+def test_put_back_same_path_newer_value_wins():
+    c = Coalescer()
+    c.add(("command",), "FWD_1")
+    batch, first = c.take()
+    c.add(("command",), "STOP")
+    c.put_back(batch, first)
+    assert pending(c) == {"command": "STOP"}
+
+
+def test_root_value_applies_siblings_without_touching_the_batch():
+    batch = {(): {"command": "FWD_1"}, ("command",): "STOP", ("cam_url",): "b"}
+    assert root_value(batch) == {"command": "STOP", "cam_url": "b"}
+    assert batch[()] == {"command": "FWD_1"}
+
+
+# --- LOCAL / CLOUD ---
+def test_local_patch_queues_one_write_per_child():
+    db = GatewayDB({"telemetry": {"status": "STANDBY"}})
+    db.write("patch", "/telemetry", {"status": "MOVING", "speed": 4}, origin="local")
+    assert pending(db.outbox) == {"telemetry/status": "MOVING", "telemetry/speed": 4}
+
+
+def test_cloud_event_under_a_pending_local_write_is_ignored():
+    db = GatewayDB({"command": "STOP"})
+    db.write("put", "/command", "FWD_1", origin="local")
+    db.apply_remote("put", "/command", "BWD_1")
+    assert db.tree["command"] == "FWD_1"
+
+
+def test_malformed_cloud_event_is_dropped():
+    db = GatewayDB({"command": "STOP"})
+    feed = _CloudFeed(db, "http://127.0.0.1:1", "/command")
+    for payload in ("{not json", "null", "[1]", "7", '{"path": null}'):
+        feed._dispatch("put", payload)
+    feed._dispatch("put", '{"path": "/", "data": "FWD_1"}')
+    assert db.tree["command"] == "FWD_1"
+
+
+def test_take_urgent_leaves_the_rest_pending():
+    c = Coalescer()
+    c.add(("command",), "STOP")
+    c.add(("telemetry", "speed"), 3)
+    batch, first = c.take(("command",))
+    assert batch == {("command",): "STOP"} and set(first) == {("command",)}
+    assert pending(c) == {"telemetry/speed": 3}
+
+
+# --- URGENT WRITES / E-STOP ---
+def wait_for(cond, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.01)
+    return False
+
+
+def test_command_skips_the_backoff_of_a_failing_batch():
+    db = GatewayDB({})
+    sync = CloudSync(db, "http://127.0.0.1:1", sync_ms=50)
+    sent = []
+
+    def send(batch):
+        # The cloud refuses telemetry (batch backs off), takes the command
+        sent.append(set(batch))
+        return ("telemetry",) not in batch
+    sync._send = send
+    sync.start()
+    db.write("put", "/telemetry", {"speed": 1})
+    assert wait_for(lambda: len(sent) >= 3)      # backoff now 1 s and growing
+    t0 = time.time()
+    db.write("put", "/command", "STOP")
+    assert wait_for(lambda: {("command",)} in sent, timeout=0.5)
+    assert time.time() - t0 < 0.2
+    assert ("command",) not in db.outbox.pending
+
+
+def closed_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def gateway_cfg(cloud_url):
+    cfg = copy.deepcopy(config.DEFAULTS)
+    cfg["firebase"]["base_url"] = cloud_url
+    cfg["gateway"].update(enabled=True, host="127.0.0.1", port=0)
+    return cfg
+
+
+def test_estop_is_not_confirmed_by_the_gateway_when_the_cloud_is_down(monkeypatch):
+    monkeypatch.setattr(estop, "RETRY_FOR", 0.5)
+    cfg = gateway_cfg(f"http://127.0.0.1:{closed_port()}")
+    gateway = start_from_config(cfg)
+    try:
+        channel = estop.channel_for(cfg["firebase"])
+        assert not channel.url.startswith(gateway.url)
+        channel._deliver("STOP_EMERGENCY_1", time.perf_counter(), "test")
+        assert channel.confirmed == 0 and channel.lost == 1
+    finally:
+        gateway.stop()
+
+
+def test_estop_is_confirmed_by_the_cloud_behind_the_gateway():
+    cloud = StandInServer(initial={"command": "FWD_1"}).start()
+    cfg = gateway_cfg(cloud.url)
+    gateway = start_from_config(cfg)
+    try:
+        channel = estop.channel_for(cfg["firebase"])
+        channel._deliver("STOP_EMERGENCY_2", time.perf_counter(), "test")
+        assert channel.confirmed == 1 and channel.confirmed_id == "STOP_EMERGENCY_2"
+        assert cloud.db.read("/command") == "STOP_EMERGENCY_2"
+    finally:
+        gateway.stop()
+        cloud.stop()
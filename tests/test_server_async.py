@@ -0,0 +1,96 @@
+import asyncio
+import socket
+import threading
+import time
+
+import numpy as np
+import requests
+
+from raiv import server_async, vision, wsgi_server
+from raiv.adaptive_stream import TieredHub
+from raiv.async_stream import AsyncHub, serve_asgi
+from raiv.fb_stream import RTDBMirror
+
+
+def test_rtdb_changes_run_off_the_loop_in_order(monkeypatch):
+    seen, release = [], threading.Event()
+
+    def slow_handler(roots, stream):
+        release.wait(5)                      # mission folder on a slow disk
+        seen.append(stream.get("telemetry", "status"))
+    monkeypatch.setattr(vision, "on_firebase_change", slow_handler)
+
+    stream = RTDBMirror("http://127.0.0.1:1")
+    t0 = time.perf_counter()
+    for status in ("MOVING", "STANDBY"):
+        stream.mirror = {"telemetry": {"status": status}}
+        server_async.on_change({"telemetry"}, stream)
+    assert time.perf_counter() - t0 < 0.1    # the loop did not wait
+    release.set()
+    server_async.changes.submit(lambda: None).result(5)
+    assert seen == ["MOVING", "STANDBY"]     # each handler saw its own event
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.05)
+    return False
+
+
+def connects(port):
+    try: socket.create_connection(("127.0.0.1", port), timeout=1).close()
+    except OSError: return False
+    return True
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_index_answers_with_more_viewers_than_waitress_threads(monkeypatch):
+    # One viewer per waitress worker thread, plus one: the threaded server
+    # would queue / behind them, the asyncio one must not
+    hub = TieredHub("LOAD", [(50, 64, 48, 25)], 0)
+    stop = threading.Event()
+
+    def camera():
+        frame = np.zeros((48, 64, 3), np.uint8)
+        while not stop.is_set():
+            hub.publish_raw(frame)
+            time.sleep(0.04)
+
+    port, loop = free_port(), asyncio.new_event_loop()
+
+    async def serve():
+        monkeypatch.setattr(server_async, "hubs", [AsyncHub(hub, loop)])
+        await serve_asgi(server_async.app, "127.0.0.1", port)
+    task = loop.create_task(serve())
+
+    def run_loop():
+        try: loop.run_until_complete(task)
+        except asyncio.CancelledError: pass
+    server = threading.Thread(target=run_loop, daemon=True)
+    server.start()
+    threading.Thread(target=camera, daemon=True).start()
+    viewers = []
+    try:
+        assert wait_for(lambda: connects(port))
+        for _ in range(wsgi_server.THREADS + 1):
+            s = socket.create_connection(("127.0.0.1", port), timeout=5)
+            viewers.append(s)
+            s.sendall(b"GET /video1 HTTP/1.1\r\nHost: test\r\n\r\n")
+        for s in viewers:                    # every viewer is being streamed to
+            got = b""
+            while b"--frame" not in got: got += s.recv(65536)
+        r = requests.get(f"http://127.0.0.1:{port}/", timeout=5)
+        assert r.status_code == 200 and r.text == "RAIV VISION SYSTEM ONLINE (asyncio)"
+    finally:
+        stop.set()
+        for s in viewers: s.close()
+        wait_for(lambda: hub.viewers == 0)
+        loop.call_soon_threadsafe(task.cancel)
+        server.join(5)
@@ -0,0 +1,60 @@
+import math
+
+import pytest
+
+from raiv.tracker import make_filter
+
+FILTERS = [("ema", dict(tau_ms=50, threshold=0.9)), ("ema", dict(tau_ms=80, threshold=0.9)),
+           ("window", dict(window_ms=150, ratio=0.75))]
+RATES = [10, 15, 30, 60]
+
+
+def replay(filt, fps, danger_from, danger_to=math.inf, start=0.0, seconds=3.0):
+    # Frames at start + k / fps; -> stamp of the first frame that fires, or None
+    for k in range(int(seconds * fps)):
+        t = start + k / fps
+        if filt.update(danger_from <= t < danger_to, t): return t
+    return None
+
+
+@pytest.mark.parametrize("kind,kw", FILTERS)
+@pytest.mark.parametrize("fps", RATES)
+def test_danger_step_stops_within_the_bound(kind, kw, fps):
+    filt = make_filter(kind, period_ms=1000.0 / fps, **kw)
+    # Worst phase: the danger starts just after a frame
+    onset = 1.0 + 1e-6
+    fired = replay(filt, fps, onset)
+    assert fired is not None
+    assert (fired - onset) * 1000 <= filt.worst_case_ms(fps) + 1e-6
+
+
+@pytest.mark.parametrize("kind,kw", FILTERS)
+@pytest.mark.parametrize("fps", RATES)
+def test_first_frame_after_reset_counts(kind, kw, fps):
+    # After a stop the filter is reset; danger that is already there must
+    # still stop within the bound, the first frame included
+    filt = make_filter(kind, period_ms=1000.0 / fps, **kw)
+    assert replay(filt, fps, 0.0) is not None
+    filt.reset()
+    start = 10.0
+    fired = replay(filt, fps, start, start=start)
+    onset = start - 1.0 / fps + 1e-6        # at worst just after the frame before
+    assert (fired - onset) * 1000 <= filt.worst_case_ms(fps) + 1e-6
+
+
+@pytest.mark.parametrize("kind,kw", FILTERS)
+@pytest.mark.parametrize("fps", RATES)
+def test_single_frame_glitch_never_stops(kind, kw, fps):
+    filt = make_filter(kind, period_ms=1000.0 / fps, **kw)
+    glitch = 1.0 + 0.5 / fps                 # one frame of danger
+    assert replay(filt, fps, glitch, glitch + 1.0 / fps) is None
+
+
+@pytest.mark.parametrize("kind,kw", FILTERS)
+@pytest.mark.parametrize("fps", RATES)
+def test_glitch_shorter_than_the_bound_never_stops(kind, kw, fps):
+    # One frame fewer than worst_case_ms needs must not be enough
+    filt = make_filter(kind, period_ms=1000.0 / fps, **kw)
+    frames = round(filt.worst_case_ms(fps) * fps / 1000.0) - 1
+    start = 1.0 + 0.5 / fps
+    assert replay(filt, fps, start, start + frames / fps) is None
@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from raiv.rtdb_standin import StandInServer
+from raiv.tunnel import TunnelSupervisor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE = [sys.executable, "-m", "benchmarks.fake_cloudflared", "--log-rate", "200"]
+LOCAL_URL = r"http://127\.0\.0\.1:[0-9]+"
+
+
+class _Origin(BaseHTTPRequestHandler):
+    def log_message(self, *a): pass
+
+    def do_GET(self):
+        body = b"RAIV VISION SYSTEM ONLINE"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def wait_for(cond, timeout=15.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def origin():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Origin)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def rtdb():
+    srv = StandInServer(initial={"cam_url": None}).start()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def supervise(origin, rtdb, monkeypatch):
+    # The fake is run as `python -m benchmarks.fake_cloudflared` from the repo root
+    monkeypatch.chdir(ROOT)
+    sups = []
+
+    def make(*args, **kw):
+        kw = dict(dict(url_pattern=LOCAL_URL, health_s=0.3, health_timeout_s=0.5, fail_after=2,
+                       url_timeout_s=10.0, retry_min_s=0.05, retry_max_s=0.4), **kw)
+        sup = TunnelSupervisor(FAKE + list(args), origin, rtdb.url, **kw)
+        sup.reasons, down = [], sup._down
+        sup._down = lambda reason: (sup.reasons.append(reason), down(reason))
+        sups.append(sup)
+        return sup
+    yield make
+    for sup in sups: sup.stop()
+
+
+def test_url_is_picked_up_checked_and_published(supervise, rtdb):
+    sup = supervise("--delay", "0.3")
+    sup.start()
+    assert wait_for(lambda: sup.url is not None)
+    assert requests.get(sup.url + "/", timeout=2).content == b"RAIV VISION SYSTEM ONLINE"
+    assert wait_for(lambda: rtdb.db.read("/cam_url") == sup.url)
+    assert rtdb.db.read("/tunnel/state") == "up"
+    assert sup.restarts == 0
+
+
+def test_failed_health_checks_restart_the_tunnel(supervise, rtdb):
+    sup = supervise("--delay", "0.2", "--hang-after", "1.5")
+    sup.start()
+    assert wait_for(lambda: sup.url is not None)
+    first = sup.url
+    # The fake stops forwarding but keeps running: only the health check notices
+    assert wait_for(lambda: sup.restarts >= 1)
+    assert sup.reasons[0] == "unhealthy"
+    assert wait_for(lambda: sup.url is not None and sup.url != first)
+    assert wait_for(lambda: rtdb.db.read("/cam_url") == sup.url)
+    assert sup.downtime() > 0
+
+
+def test_restart_backoff_grows_and_resets_on_a_healthy_url(supervise):
+    sup = supervise("--delay", "0", "--die-after", "0")     # exits as soon as it starts
+    caps, next_delay = [], sup.backoff.next
+
+    def record():
+        caps.append(min(sup.backoff.hi, sup.backoff.lo * 2 ** sup.backoff.n))
+        return next_delay()
+    sup.backoff.next = record
+    sup.start()
+    assert wait_for(lambda: len(caps) >= 5, timeout=30)
+    assert set(sup.reasons) <= {"exited", "unreachable"}
+    assert caps[:5] == pytest.approx([0.05, 0.1, 0.2, 0.4, 0.4])
+    sup.stop()
+
+    sup = supervise("--delay", "0.2")
+    sup.backoff.n = 4
+    sup.start()
+    assert wait_for(lambda: sup.url is not None)
+    assert sup.backoff.n == 0